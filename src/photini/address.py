@@ -27,6 +27,7 @@ import requests
 from photini.metadata import Location
 from photini.photinimap import LatLongDisplay
 from photini.pyqt import catch_all, Qt, QtCore, QtGui, QtWidgets, SingleLineEdit
+from photini.selection import SelectionValues, ValueCounter
 
 logger = logging.getLogger(__name__)
 translate = QtCore.QCoreApplication.translate
@@ -129,6 +130,11 @@ class TabWidget(QtWidgets.QWidget):
         self.location_info.setMovable(True)
         self.location_info.setEnabled(False)
         self.layout().addWidget(self.location_info, stretch=1)
+        # values of selected images
+        self.selection_values = SelectionValues({
+            'location_taken': lambda image: image.metadata.location_taken,
+            'location_shown': lambda image: image.metadata.location_shown,
+            })
         # other init
         self.image_list.image_list_changed.connect(self.image_list_changed)
 
@@ -140,7 +146,9 @@ class TabWidget(QtWidgets.QWidget):
         self.display_location()
 
     def refresh(self):
-        pass
+        # metadata may have been changed by another tab
+        self.selection_values.reset()
+        self.coords.refresh()
 
     def do_not_close(self):
         return False
@@ -258,13 +266,18 @@ class TabWidget(QtWidgets.QWidget):
 
     @QtCore.pyqtSlot()
     @catch_all
-    def display_location(self):
-        images = self.image_list.get_selected_images()
+    def display_location(self, recount=True):
+        if recount:
+            self.selection_values.set_selection(
+                self.image_list.get_selected_images())
+            self.selection_values.recount()
+        images = self.selection_values.images
+        location_shown = self.selection_values.values('location_shown')
         # get required number of tabs
         count = 0
-        for image in images:
-            if image.metadata.location_shown:
-                count = max(count, len(image.metadata.location_shown))
+        for value in location_shown:
+            if value:
+                count = max(count, len(value))
         count += 2
         # add or remove tabs
         if self.location_info.currentIndex() >= count:
@@ -286,21 +299,26 @@ class TabWidget(QtWidgets.QWidget):
         for idx in range(count):
             widget = self.location_info.widget(idx)
             if images:
-                values = defaultdict(list)
-                for image in images:
-                    location = self._get_location(image, idx) or {}
+                if idx == 0:
+                    locations = self.selection_values.values('location_taken')
+                else:
+                    locations = [x[idx - 1] if x and idx <= len(x) else None
+                                 for x in location_shown]
+                counters = defaultdict(ValueCounter)
+                for location in locations:
+                    location = location or {}
                     for key in widget.members:
                         value = None
                         if key in location:
                             value = location[key]
-                        if value not in values[key]:
-                            values[key].append(value)
+                        counters[key].add(value)
                 for key in widget.members:
-                    if len(values[key]) > 1:
+                    values = counters[key].values()
+                    if len(values) > 1:
                         widget.members[key].set_multiple(
-                            choices=filter(None, values[key]))
+                            choices=filter(None, values))
                     else:
-                        widget.members[key].set_value(values[key][0])
+                        widget.members[key].set_value(values[0])
             else:
                 for key in widget.members:
                     widget.members[key].set_value(None)
@@ -308,10 +326,11 @@ class TabWidget(QtWidgets.QWidget):
     @QtCore.pyqtSlot(list)
     @catch_all
     def new_selection(self, selection):
+        self.selection_values.set_selection(selection)
         self.location_info.setEnabled(bool(selection))
-        self.coords.refresh()
+        self.coords.refresh(selection)
         self.auto_location.setEnabled(bool(self.coords.get_value()))
-        self.display_location()
+        self.display_location(recount=False)
 
     @QtCore.pyqtSlot()
     @catch_all
@@ -0,0 +1,248 @@
+##  Photini - a simple photo metadata editor.
+##  http://github.com/jim-easterbrook/Photini
+##  Copyright (C) 2020  Jim Easterbrook  jim@jim-easterbrook.me.uk
+##
+##  This program is free software: you can redistribute it and/or
+##  modify it under the terms of the GNU General Public License as
+##  published by the Free Software Foundation, either version 3 of the
+##  License, or (at your option) any later version.
+##
+##  This program is distributed in the hope that it will be useful,
+##  but WITHOUT ANY WARRANTY; without even the implied warranty of
+##  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+##  General Public License for more details.
+##
+##  You should have received a copy of the GNU General Public License
+##  along with this program.  If not, see
+##  <http://www.gnu.org/licenses/>.
+
+"""Set metadata of many files from the command line, without the GUI.
+
+"""
+
+from __future__ import unicode_literals
+
+from datetime import timedelta
+import glob
+import logging
+from multiprocessing import cpu_count, Pool
+from optparse import OptionParser
+import os
+import re
+import sys
+import time
+
+import six
+
+from photini import __version__
+from photini.configstore import BaseConfigStore
+from photini.metadata import Metadata
+from photini.pyqt import image_types_lower, QtCore, video_types_lower
+
+logger = logging.getLogger(__name__)
+translate = QtCore.QCoreApplication.translate
+
+
+def parse_offset(value):
+    # convert [-]H:MM[:SS] to a timedelta
+    match = re.match(r'([-+]?)(\d+):(\d{2})(?::(\d{2}))?$', value.strip())
+    if not match:
+        raise ValueError('invalid time offset "{}"'.format(value))
+    sign, hours, minutes, seconds = match.groups()
+    result = timedelta(hours=int(hours), minutes=int(minutes),
+                       seconds=int(seconds or 0))
+    if sign == '-':
+        result = -result
+    return result
+
+
+def find_files(args, recursive):
+    # expand glob patterns and directories to a list of image files
+    file_types = ['.' + x for x in image_types_lower() + video_types_lower()]
+    result = []
+    for arg in args:
+        paths = glob.glob(os.path.expanduser(arg)) or [arg]
+        for path in sorted(paths):
+            if os.path.isfile(path):
+                result.append(path)
+                continue
+            if not os.path.isdir(path):
+                logger.error('%s: not found', path)
+                continue
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if os.path.splitext(name)[1].lower() in file_types:
+                        result.append(os.path.join(root, name))
+                if not recursive:
+                    break
+    return result
+
+
+def apply_changes(metadata, changes):
+    # changes is a dict of simple Python types, so it can be sent to
+    # another process. Returns names of the fields that were changed.
+    overwrite = changes['overwrite']
+    fields = ['keywords', 'creator', 'copyright', 'latlong']
+    if changes['date_offset']:
+        fields += ['date_taken', 'date_digitised', 'date_modified']
+    old_values = dict((x, getattr(metadata, x)) for x in fields)
+    if changes['keywords']:
+        keywords = []
+        if not overwrite and metadata.keywords:
+            keywords = list(metadata.keywords)
+        # only add keywords that aren't already there
+        for keyword in changes['keywords']:
+            if keyword not in keywords:
+                keywords.append(keyword)
+        metadata.keywords = keywords
+    for name in ('creator', 'copyright', 'latlong'):
+        value = changes[name]
+        if value is not None and (overwrite or not getattr(metadata, name)):
+            setattr(metadata, name, value)
+    offset = changes['date_offset']
+    if offset:
+        for name in ('date_taken', 'date_digitised', 'date_modified'):
+            value = getattr(metadata, name)
+            if not value:
+                continue
+            value = dict(value)
+            value['datetime'] += offset
+            setattr(metadata, name, value)
+    return [x for x in fields if getattr(metadata, x) != old_values[x]]
+
+
+def process_file(args):
+    path, changes, save_options = args
+    start = time.time()
+    try:
+        metadata = Metadata(path)
+        changed = apply_changes(metadata, changes)
+        if not changed:
+            return path, True, 'unchanged'
+        if changes['dry_run']:
+            return path, True, 'would change ' + ', '.join(changed)
+        file_times = None
+        if save_options['preserve_timestamps']:
+            file_times = metadata.file_times
+        OK = metadata.save(
+            if_mode=save_options['if_mode'], sc_mode=save_options['sc_mode'],
+            force_iptc=save_options['force_iptc'], file_times=file_times,
+            verify=save_options['verify'])
+    except Exception as ex:
+        return path, False, str(ex)
+    if not OK:
+        return path, False, 'save failed'
+    return path, True, 'saved in {:.3f} s'.format(time.time() - start)
+
+
+def main(argv=None):
+    if argv:
+        sys.argv = argv
+    parser = OptionParser(
+        usage=six.text_type(translate(
+            'CLIHelp', 'Usage: %prog [options] file_or_dir [...]')),
+        version='Photini ' + __version__,
+        description=six.text_type(translate(
+            'CLIHelp', 'Set metadata of many image files at once. File'
+            ' names may include wildcards.')))
+    parser.add_option(
+        '-k', '--keyword', action='append', default=[],
+        help=six.text_type(translate(
+            'CLIHelp', 'add a keyword (may be used more than once)')))
+    parser.add_option(
+        '-c', '--creator',
+        help=six.text_type(translate('CLIHelp', 'set creator')))
+    parser.add_option(
+        '--copyright',
+        help=six.text_type(translate('CLIHelp', 'set copyright')))
+    parser.add_option(
+        '-l', '--latlong',
+        help=six.text_type(translate(
+            'CLIHelp', 'set latitude & longitude, e.g. "51.5,-0.1"')))
+    parser.add_option(
+        '-d', '--date-offset',
+        help=six.text_type(translate(
+            'CLIHelp', 'adjust all dates & times by [-]H:MM[:SS]')))
+    parser.add_option(
+        '-o', '--overwrite', action='store_true',
+        help=six.text_type(translate(
+            'CLIHelp', 'replace existing values instead of merging')))
+    parser.add_option(
+        '-r', '--recursive', action='store_true',
+        help=six.text_type(translate(
+            'CLIHelp', 'include files in sub-directories')))
+    parser.add_option(
+        '-j', '--jobs', type='int', default=cpu_count(),
+        help=six.text_type(translate(
+            'CLIHelp', 'number of files to process at once')))
+    parser.add_option(
+        '-n', '--dry-run', action='store_true',
+        help=six.text_type(translate(
+            'CLIHelp', 'show which files would be changed')))
+    parser.add_option(
+        '-v', '--verbose', action='count', default=0,
+        help=six.text_type(translate(
+            'CLIHelp', 'increase number of logging messages')))
+    options, args = parser.parse_args()
+    if not args:
+        parser.error('no files given')
+    logging.basicConfig(
+        level=logging.WARNING - (options.verbose * 10),
+        format='%(name)s: %(levelname)s: %(message)s')
+    changes = {
+        'keywords'   : options.keyword,
+        'creator'    : options.creator,
+        'copyright'  : options.copyright,
+        'latlong'    : None,
+        'date_offset': None,
+        'overwrite'  : bool(options.overwrite),
+        'dry_run'    : bool(options.dry_run),
+        }
+    try:
+        if options.latlong:
+            changes['latlong'] = [
+                float(x) for x in options.latlong.replace(',', ' ').split()]
+            if len(changes['latlong']) != 2:
+                raise ValueError('invalid latlong "{}"'.format(options.latlong))
+        if options.date_offset:
+            changes['date_offset'] = parse_offset(options.date_offset)
+    except ValueError as ex:
+        parser.error(str(ex))
+    # use the GUI's file saving options
+    config_store = BaseConfigStore('editor')
+    save_options = {
+        'if_mode'    : eval(config_store.get('files', 'image', 'True')),
+        'sc_mode'    : config_store.get('files', 'sidecar', 'auto'),
+        'force_iptc' : eval(config_store.get('files', 'force_iptc', 'False')),
+        'preserve_timestamps': eval(
+            config_store.get('files', 'preserve_timestamps', 'False')),
+        'verify'     : config_store.get('files', 'verify', 'full'),
+        }
+    paths = find_files(args, options.recursive)
+    logger.info('processing %d files', len(paths))
+    start = time.time()
+    failed = 0
+    jobs = [(path, changes, save_options) for path in paths]
+    pool = Pool(max(options.jobs, 1))
+    try:
+        for path, OK, message in pool.imap_unordered(
+                process_file, jobs, chunksize=8):
+            if OK and changes['dry_run'] and message != 'unchanged':
+                # dry run results are the whole point, so always show them
+                print('{}: {}'.format(path, message))
+            elif OK:
+                logger.info('%s: %s', path, message)
+            else:
+                failed += 1
+                logger.error('%s: %s', path, message)
+    finally:
+        pool.close()
+        pool.join()
+    logger.warning('%d files processed in %.1f s, %d failed',
+                   len(paths), time.time() - start, failed)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+##  Photini - a simple photo metadata editor.
+##  http://github.com/jim-easterbrook/Photini
+##  Copyright (C) 2020  Jim Easterbrook  jim@jim-easterbrook.me.uk
+##
+##  This program is free software: you can redistribute it and/or
+##  modify it under the terms of the GNU General Public License as
+##  published by the Free Software Foundation, either version 3 of the
+##  License, or (at your option) any later version.
+##
+##  This program is distributed in the hope that it will be useful,
+##  but WITHOUT ANY WARRANTY; without even the implied warranty of
+##  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+##  General Public License for more details.
+##
+##  You should have received a copy of the GNU General Public License
+##  along with this program.  If not, see
+##  <http://www.gnu.org/licenses/>.
+
+from __future__ import unicode_literals
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import appdirs
+
+logger = logging.getLogger(__name__)
+
+
+def file_stamp(path, sidecar=False):
+    """Return a string that changes whenever a file is modified.
+
+    If sidecar is set the modification time of any XMP sidecar file
+    is included as well.
+
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    mtime = stat.st_mtime
+    if sidecar:
+        for base in (os.path.splitext(path)[0], path):
+            for ext in ('.xmp', '.XMP', '.Xmp'):
+                try:
+                    mtime = max(mtime, os.path.getmtime(base + ext))
+                except OSError:
+                    pass
+    return '{:d}:{!r}'.format(stat.st_size, mtime)
+
+
+class BaseCacheStore(object):
+    """Size limited store of binary data in an SQLite database file in
+    the user's cache directory.
+
+    Each entry has a key (e.g. a file path) and a "stamp" (e.g. from
+    file_stamp()). An entry is discarded if it is read with a different
+    stamp. When the total data size exceeds max_size the least recently
+    used entries are removed.
+
+    The store can be used from several threads at once, each has its
+    own database connection.
+
+    If the database can't be opened (e.g. the cache directory is read
+    only) the store is disabled: get() returns None and put() does
+    nothing.
+
+    """
+    # how old an entry's "last used" time can get before reading the
+    # entry updates it, to avoid a database write on every read
+    used_refresh = 3600.0
+
+    def __init__(self, name, max_size, *arg, **kw):
+        super(BaseCacheStore, self).__init__(*arg, **kw)
+        self.max_size = max_size
+        self.enabled = False
+        self._local = threading.local()
+        cache_dir = appdirs.user_cache_dir('photini')
+        self.file_name = os.path.join(cache_dir, name + '.db')
+        try:
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            connection = self._connection()
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS cache '
+                               '(key TEXT PRIMARY KEY, stamp TEXT, '
+                               'data BLOB, used REAL)')
+            connection.commit()
+        except (sqlite3.Error, OSError) as ex:
+            logger.error('%s: %s, cache disabled', self.file_name, str(ex))
+            return
+        self.enabled = True
+
+    def _connection(self):
+        if not hasattr(self._local, 'connection'):
+            self._local.connection = sqlite3.connect(
+                self.file_name, timeout=30)
+        return self._local.connection
+
+    def get(self, key, stamp):
+        if not self.enabled:
+            return None
+        try:
+            connection = self._connection()
+            row = connection.execute(
+                'SELECT stamp, data, used FROM cache WHERE key = ?',
+                (key,)).fetchone()
+            if not row:
+                return None
+            if row[0] != stamp:
+                connection.execute('DELETE FROM cache WHERE key = ?', (key,))
+                connection.commit()
+                return None
+            now = time.time()
+            if now - row[2] > self.used_refresh:
+                connection.execute('UPDATE cache SET used = ? WHERE key = ?',
+                                   (now, key))
+                connection.commit()
+            return bytes(row[1])
+        except sqlite3.Error as ex:
+            logger.error('%s: %s', self.file_name, str(ex))
+            return None
+
+    def put(self, key, stamp, data):
+        self.put_many([(key, stamp, data)])
+
+    def put_many(self, items):
+        if not self.enabled:
+            return
+        now = time.time()
+        try:
+            connection = self._connection()
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)',
+                [(key, stamp, sqlite3.Binary(data), now)
+                 for (key, stamp, data) in items])
+            connection.commit()
+        except sqlite3.Error as ex:
+            logger.error('%s: %s', self.file_name, str(ex))
+
+    def remove(self, key):
+        if not self.enabled:
+            return
+        try:
+            connection = self._connection()
+            connection.execute('DELETE FROM cache WHERE key = ?', (key,))
+            connection.commit()
+        except sqlite3.Error as ex:
+            logger.error('%s: %s', self.file_name, str(ex))
+
+    def evict(self):
+        if not self.enabled:
+            return
+        try:
+            connection = self._connection()
+            total = connection.execute(
+                'SELECT SUM(LENGTH(data)) FROM cache').fetchone()[0] or 0
+            if total <= self.max_size:
+                return
+            # remove least recently used entries to get down to 90%
+            excess = total - (self.max_size * 9 // 10)
+            cut_off = None
+            for used, size in connection.execute(
+                    'SELECT used, LENGTH(data) FROM cache ORDER BY used'
+                    ).fetchall():
+                cut_off = used
+                excess -= size
+                if excess <= 0:
+                    break
+            connection.execute('DELETE FROM cache WHERE used <= ?', (cut_off,))
+            connection.commit()
+        except sqlite3.Error as ex:
+            logger.error('%s: %s', self.file_name, str(ex))
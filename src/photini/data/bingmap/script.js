@@ -18,6 +18,7 @@
 
 var map;
 var markerLayer;
+var markers = {};
 var trackLayer;
 
 function loadMap(lat, lng, zoom)
@@ -108,8 +109,9 @@ function fitPoints(points)
         map.setView({center: bounds.center});
 }
 
-function plotTrack(latlngs)
+function plotTrack(latlngs, fit)
 {
+    trackLayer.clear();
     var lines = [];
     for (var j = 0; j < latlngs.length; j++)
     {
@@ -120,7 +122,19 @@ function plotTrack(latlngs)
         lines.push(new Microsoft.Maps.Polyline(locations, {strokeColor: 'red'}));
     }
     trackLayer.add(lines);
-    map.setView({bounds: Microsoft.Maps.LocationRect.fromShapes(lines)});
+    if (fit && lines.length)
+        map.setView({bounds: Microsoft.Maps.LocationRect.fromShapes(lines)});
+}
+
+function updateMarkers(added, deleted, enabled)
+{
+    for (var i = 0; i < deleted.length; i++)
+        delMarker(deleted[i]);
+    for (var i = 0; i < added.length; i++)
+        addMarker(added[i][0], added[i][1], added[i][2], added[i][3],
+                  added[i][4]);
+    for (var i = 0; i < enabled.length; i++)
+        enableMarker(enabled[i][0], enabled[i][1]);
 }
 
 function enableMarker(id, active)
@@ -138,25 +152,29 @@ function enableMarker(id, active)
 
 function findMarker(id)
 {
-    var markers = markerLayer.getPrimitives();
-    for (var i = 0; i < markers.length; i++)
-        if (markers[i].metadata == id)
-            return markers[i];
+    return markers[id];
 }
 
-function addMarker(id, lat, lng, active)
+function addMarker(id, lat, lng, active, count)
 {
+    // a marker with count > 1 is a cluster of several locations
     var marker = new Microsoft.Maps.Pushpin(
         new Microsoft.Maps.Location(lat, lng), {
             anchor   : new Microsoft.Maps.Point(11, 35),
             icon     : '../map_pin_grey.png',
-            draggable: true
+            text     : count > 1 ? String(count) : '',
+            draggable: count <= 1
         });
     markerLayer.add(marker);
     marker.metadata = id;
-    Microsoft.Maps.Events.addHandler(marker, 'dragstart', markerClick);
-    Microsoft.Maps.Events.addHandler(marker, 'drag', markerDrag);
-    Microsoft.Maps.Events.addHandler(marker, 'dragend', markerDragEnd);
+    markers[id] = marker;
+    // clicks on any marker are handled by markerLayer's handler
+    if (count <= 1)
+    {
+        Microsoft.Maps.Events.addHandler(marker, 'dragstart', markerClick);
+        Microsoft.Maps.Events.addHandler(marker, 'drag', markerDrag);
+        Microsoft.Maps.Events.addHandler(marker, 'dragend', markerDragEnd);
+    }
     enableMarker(id, active);
 }
 
@@ -191,4 +209,5 @@ function delMarker(id)
 {
     var marker = findMarker(id)
     markerLayer.remove(marker);
+    delete markers[id];
 }
@@ -18,6 +18,7 @@
 
 var map;
 var markers = {};
+var trackLines = [];
 var icon_on;
 var icon_off;
 
@@ -97,8 +98,11 @@ function fitPoints(points)
         map.panTo(bounds.getCenter());
 }
 
-function plotTrack(latlngs)
+function plotTrack(latlngs, fit)
 {
+    for (var j = 0; j < trackLines.length; j++)
+        trackLines[j].setMap(null);
+    trackLines = [];
     var bounds = new google.maps.LatLngBounds();
     for (var j = 0; j < latlngs.length; j++)
     {
@@ -115,8 +119,21 @@ function plotTrack(latlngs)
             path: path,
             strokeColor: 'red',
             });
+        trackLines.push(line);
     }
-    map.fitBounds(bounds);
+    if (fit && latlngs.length)
+        map.fitBounds(bounds);
+}
+
+function updateMarkers(added, deleted, enabled)
+{
+    for (var i = 0; i < deleted.length; i++)
+        delMarker(deleted[i]);
+    for (var i = 0; i < added.length; i++)
+        addMarker(added[i][0], added[i][1], added[i][2], added[i][3],
+                  added[i][4]);
+    for (var i = 0; i < enabled.length; i++)
+        enableMarker(enabled[i][0], enabled[i][1]);
 }
 
 function enableMarker(id, active)
@@ -128,27 +145,32 @@ function enableMarker(id, active)
         marker.setOptions({icon: icon_off, zIndex: 0});
 }
 
-function addMarker(id, lat, lng, active)
+function addMarker(id, lat, lng, active, count)
 {
+    // a marker with count > 1 is a cluster of several locations
     var marker = new google.maps.Marker({
         icon: icon_off,
         position: new google.maps.LatLng(lat, lng),
         map: map,
-        draggable: true,
+        draggable: count <= 1,
         });
+    if (count > 1)
+        marker.setLabel(String(count));
     markers[id] = marker;
+    marker.photini_id = id;
     google.maps.event.addListener(marker, 'click', markerClick);
-    google.maps.event.addListener(marker, 'dragstart', markerClick);
-    google.maps.event.addListener(marker, 'drag', markerDrag);
-    google.maps.event.addListener(marker, 'dragend', markerDragEnd);
+    if (count <= 1)
+    {
+        google.maps.event.addListener(marker, 'dragstart', markerClick);
+        google.maps.event.addListener(marker, 'drag', markerDrag);
+        google.maps.event.addListener(marker, 'dragend', markerDragEnd);
+    }
     enableMarker(id, active)
 }
 
 function markerToId(marker)
 {
-    for (var id in markers)
-        if (markers[id] == marker)
-            return id;
+    return marker.photini_id;
 }
 
 function markerClick(event)
@@ -1,6 +1,6 @@
 //  Photini - a simple photo metadata editor.
 //  http://github.com/jim-easterbrook/Photini
-//  Copyright (C) 2012-19  Jim Easterbrook  jim@jim-easterbrook.me.uk
+//  Copyright (C) 2012-20  Jim Easterbrook  jim@jim-easterbrook.me.uk
 //
 //  This program is free software: you can redistribute it and/or
 //  modify it under the terms of the GNU General Public License as
@@ -19,6 +19,7 @@
 var drag_id = -1;
 var map;
 var markers = {};
+var trackLine;
 var icon_on;
 var icon_off;
 
@@ -75,15 +76,30 @@ function fitPoints(points)
         maxZoom: map.getZoom(), animate: true});
 }
 
-function plotTrack(latlngs)
+function plotTrack(latlngs, fit)
 {
-    var polyline = L.polyline(latlngs, {color: 'red'}).addTo(map);
-    var bounds = polyline.getBounds();
+    if (trackLine)
+        map.removeLayer(trackLine);
+    trackLine = L.polyline(latlngs, {color: 'red'}).addTo(map);
+    if (!fit || !latlngs.length)
+        return;
+    var bounds = trackLine.getBounds();
     if (map.getBounds().contains(bounds))
         return;
     map.fitBounds(bounds);
 }
 
+function updateMarkers(added, deleted, enabled)
+{
+    for (var i = 0; i < deleted.length; i++)
+        delMarker(deleted[i]);
+    for (var i = 0; i < added.length; i++)
+        addMarker(added[i][0], added[i][1], added[i][2], added[i][3],
+                  added[i][4]);
+    for (var i = 0; i < enabled.length; i++)
+        enableMarker(enabled[i][0], enabled[i][1]);
+}
+
 function enableMarker(id, active)
 {
     var marker = markers[id];
@@ -100,23 +116,30 @@ function enableMarker(id, active)
     }
 }
 
-function addMarker(id, lat, lng, active)
+function addMarker(id, lat, lng, active, count)
 {
-    var marker = L.marker([lat, lng], {draggable: true, autoPan: true});
+    // a marker with count > 1 is a cluster of several locations
+    var marker = L.marker(
+        [lat, lng], {draggable: count <= 1, autoPan: true});
+    if (count > 1)
+        marker.bindTooltip(String(count), {
+            permanent: true, direction: 'top', offset: [0, -36]});
     marker.addTo(map);
     markers[id] = marker;
+    marker.photini_id = id;
     marker.on('click', markerClick);
-    marker.on('dragstart', markerDragStart);
-    marker.on('drag', markerDrag);
-    marker.on('dragend', markerDragEnd);
+    if (count <= 1)
+    {
+        marker.on('dragstart', markerDragStart);
+        marker.on('drag', markerDrag);
+        marker.on('dragend', markerDragEnd);
+    }
     enableMarker(id, active)
 }
 
 function markerToId(marker)
 {
-    for (var id in markers)
-        if (markers[id] == marker)
-            return id;
+    return marker.photini_id;
 }
 
 function markerClick(event)
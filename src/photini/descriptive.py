@@ -28,6 +28,7 @@ import six
 from photini.pyqt import (
     catch_all, ComboBox, multiple_values, MultiLineEdit, Qt, QtCore, QtGui,
     QtWidgets, qt_version_info, SingleLineEdit, Slider)
+from photini.selection import SelectionValues
 
 logger = logging.getLogger(__name__)
 translate = QtCore.QCoreApplication.translate
@@ -273,11 +274,16 @@ class TabWidget(QtWidgets.QWidget):
         self.widgets['creator'].autoComplete.connect(self.auto_creator)
         self.form.addRow(translate(
             'DescriptiveTab', 'Creator / Artist'), self.widgets['creator'])
+        # values of selected images
+        self.selection_values = SelectionValues(dict(
+            (key, lambda image, key=key: getattr(image.metadata, key))
+            for key in self.widgets))
         # disable until an image is selected
         self.setEnabled(False)
 
     def refresh(self):
-        pass
+        # metadata may have been changed by another tab
+        self.selection_values.reset()
 
     def do_not_close(self):
         return False
@@ -372,15 +378,12 @@ class TabWidget(QtWidgets.QWidget):
                 setattr(image.metadata, key, value)
         self._update_widget(key)
 
-    def _update_widget(self, key):
-        images = self.image_list.get_selected_images()
-        if not images:
+    def _update_widget(self, key, recount=True):
+        if not self.selection_values.images:
             return
-        values = []
-        for image in images:
-            value = getattr(image.metadata, key)
-            if value not in values:
-                values.append(value)
+        if recount:
+            self.selection_values.recount(key)
+        values = self.selection_values.values(key)
         if len(values) > 1:
             self.widgets[key].set_multiple(choices=filter(None, values))
         else:
@@ -389,11 +392,12 @@ class TabWidget(QtWidgets.QWidget):
     @QtCore.pyqtSlot(list)
     @catch_all
     def new_selection(self, selection):
+        self.selection_values.set_selection(selection)
         if not selection:
             for key in self.widgets:
                 self.widgets[key].set_value(None)
             self.setEnabled(False)
             return
         for key in self.widgets:
-            self._update_widget(key)
+            self._update_widget(key, recount=False)
         self.setEnabled(True)
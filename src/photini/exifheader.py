@@ -0,0 +1,162 @@
+##  Photini - a simple photo metadata editor.
+##  http://github.com/jim-easterbrook/Photini
+##  Copyright (C) 2020  Jim Easterbrook  jim@jim-easterbrook.me.uk
+##
+##  This program is free software: you can redistribute it and/or
+##  modify it under the terms of the GNU General Public License as
+##  published by the Free Software Foundation, either version 3 of the
+##  License, or (at your option) any later version.
+##
+##  This program is distributed in the hope that it will be useful,
+##  but WITHOUT ANY WARRANTY; without even the implied warranty of
+##  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+##  General Public License for more details.
+##
+##  You should have received a copy of the GNU General Public License
+##  along with this program.  If not, see
+##  <http://www.gnu.org/licenses/>.
+
+from __future__ import unicode_literals
+
+from datetime import datetime
+import logging
+import struct
+
+logger = logging.getLogger(__name__)
+
+# Exif tags read by read_exif_header
+_MODEL = 0x0110
+_DATE_TIME = 0x0132
+_EXIF_IFD = 0x8769
+_DATE_TIME_ORIGINAL = 0x9003
+_DATE_TIME_DIGITIZED = 0x9004
+_SUB_SEC_TIME = 0x9290
+_SUB_SEC_TIME_ORIGINAL = 0x9291
+_SUB_SEC_TIME_DIGITIZED = 0x9292
+_UNIQUE_CAMERA_MODEL = 0xc614
+
+_ASCII = 2
+
+
+class _TiffReader(object):
+    def __init__(self, f, base):
+        self.f = f
+        self.base = base
+        self.f.seek(base)
+        header = self.f.read(8)
+        if header[:4] == b'II*\x00':
+            self.endian = '<'
+        elif header[:4] == b'MM\x00*':
+            self.endian = '>'
+        else:
+            raise ValueError('not TIFF data')
+        self.ifd0 = struct.unpack(self.endian + 'I', header[4:8])[0]
+
+    def _read(self, offset, length):
+        self.f.seek(self.base + offset)
+        data = self.f.read(length)
+        if len(data) < length:
+            raise ValueError('truncated TIFF data')
+        return data
+
+    def read_ifd(self, offset, tags):
+        # return {tag: value} for ASCII and LONG tags in tags
+        result = {}
+        count = struct.unpack(self.endian + 'H', self._read(offset, 2))[0]
+        entries = self._read(offset + 2, count * 12)
+        for n in range(count):
+            tag, type_, length, value = struct.unpack(
+                self.endian + 'HHI4s', entries[n * 12:(n + 1) * 12])
+            if tag not in tags:
+                continue
+            if type_ == _ASCII:
+                if length > 4:
+                    value = self._read(
+                        struct.unpack(self.endian + 'I', value)[0], length)
+                value = value[:length].split(b'\x00')[0]
+                result[tag] = value.decode('utf-8', 'replace').strip()
+            elif type_ in (4, 13):
+                # LONG or IFD
+                result[tag] = struct.unpack(self.endian + 'I', value)[0]
+        return result
+
+
+def _parse_datetime(value, sub_sec):
+    if not value:
+        return None
+    try:
+        result = datetime.strptime(value[:19], '%Y:%m:%d %H:%M:%S')
+    except ValueError:
+        return None
+    if sub_sec and sub_sec.isdigit():
+        result = result.replace(
+            microsecond=int((sub_sec + '000000')[:6]))
+    return result
+
+
+def _find_jpeg_exif(f):
+    # return offset of Exif TIFF header in a JPEG file
+    f.seek(2)
+    while True:
+        marker = f.read(4)
+        if len(marker) < 4 or marker[0:1] != b'\xff':
+            return None
+        code = marker[1:2]
+        length = struct.unpack('>H', marker[2:4])[0]
+        if code in (b'\xda', b'\xd9'):
+            # start of scan or end of image
+            return None
+        segment_start = f.tell()
+        if code == b'\xe1' and f.read(6) == b'Exif\x00\x00':
+            return segment_start + 6
+        f.seek(segment_start + length - 2)
+
+
+def read_exif_header(path):
+    """Read camera model and timestamps directly from a JPEG or TIFF
+    based (e.g. most raw formats) file's Exif data.
+
+    This is much quicker than opening the file with exiv2, but only
+    reads a few tags. Returns None if the file can't be read this way.
+
+    """
+    try:
+        with open(path, 'rb') as f:
+            start = f.read(4)
+            if start[:2] == b'\xff\xd8':
+                base = _find_jpeg_exif(f)
+                if base is None:
+                    return None
+            elif start in (b'II*\x00', b'MM\x00*'):
+                base = 0
+            else:
+                return None
+            reader = _TiffReader(f, base)
+            ifd0 = reader.read_ifd(
+                reader.ifd0, (_MODEL, _DATE_TIME, _DATE_TIME_ORIGINAL,
+                              _EXIF_IFD, _UNIQUE_CAMERA_MODEL))
+            exif = {}
+            if _EXIF_IFD in ifd0:
+                exif = reader.read_ifd(
+                    ifd0[_EXIF_IFD], (
+                        _DATE_TIME_ORIGINAL, _DATE_TIME_DIGITIZED,
+                        _SUB_SEC_TIME, _SUB_SEC_TIME_ORIGINAL,
+                        _SUB_SEC_TIME_DIGITIZED))
+    except (IOError, OSError, ValueError, struct.error) as ex:
+        logger.debug('%s: %s', path, str(ex))
+        return None
+    result = {
+        'camera'        : ifd0.get(_MODEL) or ifd0.get(_UNIQUE_CAMERA_MODEL),
+        'date_taken'    : (
+            _parse_datetime(exif.get(_DATE_TIME_ORIGINAL),
+                            exif.get(_SUB_SEC_TIME_ORIGINAL)) or
+            _parse_datetime(ifd0.get(_DATE_TIME_ORIGINAL),
+                            exif.get(_SUB_SEC_TIME_ORIGINAL))),
+        'date_digitised': _parse_datetime(exif.get(_DATE_TIME_DIGITIZED),
+                                          exif.get(_SUB_SEC_TIME_DIGITIZED)),
+        'date_modified' : _parse_datetime(ifd0.get(_DATE_TIME),
+                                          exif.get(_SUB_SEC_TIME)),
+        }
+    if result['camera'] == 'unknown':
+        result['camera'] = None
+    return result
@@ -22,6 +22,7 @@ import codecs
 import locale
 import logging
 import os
+import time
 
 import six
 
@@ -64,6 +65,9 @@ del data
 
 
 class Exiv2Metadata(GExiv2.Metadata):
+    # ImageMetadata defers IPTC transcoding until it's needed
+    _iptc_ready = True
+
     def __init__(self, path, buf=None):
         super(Exiv2Metadata, self).__init__()
         self._path = path
@@ -303,23 +307,59 @@ class Exiv2Metadata(GExiv2.Metadata):
             value = [x.encode('utf-8') for x in value]
         self.set_tag_multiple(tag, value)
 
-    def save(self, file_times=None, force_iptc=False):
+    # post-save verification modes: 'full' re-reads the saved file and
+    # checks every tag, 'stat' only checks the file was rewritten (and
+    # does a full check if that can't be seen), 'off' does no check
+    verify_modes = ('full', 'stat', 'off')
+
+    def save(self, file_times=None, force_iptc=False, verify='full'):
+        self.write_time = 0.0
+        self.verify_time = 0.0
         self.has_iptc = self.has_iptc or force_iptc
         if self.xmp_only:
             self.clear_exif()
             self.clear_iptc()
         elif not self.has_iptc:
             self.clear_iptc()
+        start = time.time()
         try:
+            old_stat = os.stat(self._path)
             self.save_file(self._path)
+            new_stat = os.stat(self._path)
             if file_times:
                 os.utime(self._path, file_times)
         except Exception as ex:
             logger.exception(ex)
             return False
+        finally:
+            self.write_time = time.time() - start
+        start = time.time()
+        try:
+            return self.verify(verify, old_stat, new_stat)
+        finally:
+            self.verify_time = time.time() - start
+
+    def verify(self, mode, old_stat, new_stat):
         # check that data really was saved
+        if mode == 'off':
+            return True
+        if mode == 'stat':
+            if new_stat.st_size <= 0:
+                logger.warning('file is empty: %s', self._path)
+                return False
+            if ((new_stat.st_size, new_stat.st_mtime, new_stat.st_ctime) !=
+                    (old_stat.st_size, old_stat.st_mtime, old_stat.st_ctime)):
+                return True
+            # unchanged size and times are inconclusive, as file systems
+            # with coarse time stamps (e.g. FAT on memory cards) can't
+            # show a quick rewrite, so do a full check
+            logger.debug('file stat unchanged: %s', self._path)
+        saved = ImageMetadata.open_old(self._path)
+        if not saved:
+            logger.warning('cannot reopen saved file: %s', self._path)
+            return False
         OK = True
-        saved_tags = ImageMetadata.open_old(self._path).get_all_tags()
+        saved_tags = saved.get_all_tags()
         for tag in self.get_all_tags():
             if tag in ('Exif.Image.GPSTag',):
                 # some tags disappear with good reason
@@ -526,6 +566,8 @@ class Exiv2Metadata(GExiv2.Metadata):
                 continue
             if self.xmp_only and not self.is_xmp_tag(tag):
                 continue
+            if not self._iptc_ready and self.is_iptc_tag(tag):
+                self.prepare_iptc()
             try:
                 value = type_.read(self, tag)
             except ValueError as ex:
@@ -546,6 +588,8 @@ class Exiv2Metadata(GExiv2.Metadata):
                 continue
             if self.xmp_only and not self.is_xmp_tag(tag):
                 continue
+            if not self._iptc_ready and self.is_iptc_tag(tag):
+                self.prepare_iptc()
             if ((not value) or (write_mode == 'W0') or
                 (write_mode == 'WX' and not self.xmp_only)):
                 self.clear_value(tag)
@@ -572,6 +616,13 @@ class ImageMetadata(Exiv2Metadata):
             self.using_iptc = False
         else:
             self.using_iptc = self.has_iptc()
+        # IPTC data is converted to utf-8 when first read or written
+        self._iptc_ready = False
+
+    def prepare_iptc(self):
+        if self._iptc_ready:
+            return
+        self._iptc_ready = True
         # convert IPTC data to utf-8
         if self.using_iptc:
             self.transcode_iptc()
@@ -579,6 +630,12 @@ class ImageMetadata(Exiv2Metadata):
         self._set_string('Iptc.Envelope.CharacterSet',
                          self._iptc_encodings['utf-8'][0].decode('ascii'))
 
+    def save_file(self, path):
+        # make sure a copy doesn't get untranscoded IPTC data
+        if path != self._path:
+            self.prepare_iptc()
+        return super(ImageMetadata, self).save_file(path)
+
     def transcode_iptc(self):
         iptc_charset_code = self.get_raw('Iptc.Envelope.CharacterSet')
         for charset, codes in self._iptc_encodings.items():
@@ -693,6 +750,8 @@ class VideoHeaderMetadata(ImageMetadata):
         return result
 
     def merge_segment(self, other):
+        self.prepare_iptc()
+        other.prepare_iptc()
         for tag in other.get_all_tags():
             other_value = other._get_string(tag)
             if not self.has_tag(tag):
@@ -759,4 +818,4 @@ class SidecarMetadata(Exiv2Metadata):
             for mode, tag in self._tag_list[name]:
                 if mode in ('RA.WA', 'RA.W0'):
                     self.clear_value(tag)
-        self.save()
+        self.save(verify='off')
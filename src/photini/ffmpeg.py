@@ -18,11 +18,16 @@
 
 from __future__ import unicode_literals
 
+from collections import OrderedDict
 import json
+from multiprocessing import cpu_count
 import subprocess
+import threading
 
 import six
 
+from photini.cachestore import BaseCacheStore, file_stamp
+
 
 try:
     ffmpeg_version = subprocess.check_output(
@@ -35,7 +40,61 @@ except OSError as ex:
     ffmpeg_version = None
 
 
+class ProbeCache(BaseCacheStore):
+    """Store of ffprobe results, so unchanged videos don't need to be
+    probed again.
+
+    """
+    def __init__(self, max_size, *arg, **kw):
+        super(ProbeCache, self).__init__('ffprobe', max_size, *arg, **kw)
+        self.put_count = 0
+
+    def get_probe(self, path, stamp):
+        data = self.get(path, stamp)
+        if data is None:
+            return None
+        return json.loads(data.decode('utf-8'))
+
+    def put_probe(self, path, stamp, result):
+        self.put(path, stamp, json.dumps(result).encode('utf-8'))
+        self.put_count += 1
+        if self.put_count % 100 == 0:
+            self.evict()
+
+
 class FFmpeg(object):
+    # limit number of ffmpeg & ffprobe processes run at once by
+    # different threads
+    _process_slots = threading.BoundedSemaphore(cpu_count())
+    # results of recent probes, so a video's metadata and dimensions
+    # only need one ffprobe call
+    _probe_cache = OrderedDict()
+    _probe_cache_lock = threading.Lock()
+    _probe_cache_size = 200
+    # results of older probes are stored on disk
+    _disk_cache = None
+    disk_cache_size = 20000000
+
+    @classmethod
+    def _get_disk_cache(cls):
+        with cls._probe_cache_lock:
+            if not cls._disk_cache:
+                cls._disk_cache = ProbeCache(cls.disk_cache_size)
+        return cls._disk_cache
+
+    @classmethod
+    def _run(cls, cmd):
+        with cls._process_slots:
+            p = subprocess.Popen(
+                cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            output, error = p.communicate()
+        if p.returncode:
+            if not six.PY2:
+                error = error.decode('utf-8')
+            error = error.splitlines()[0]
+            raise RuntimeError('{}: {}'.format(cmd[0], error))
+        return output
+
     @staticmethod
     def ffprobe(path, options=['-show_format', '-show_streams']):
         if not ffmpeg_version:
@@ -43,30 +102,53 @@ class FFmpeg(object):
         cmd = ['ffprobe', '-hide_banner', '-loglevel', 'warning']
         cmd += options
         cmd += ['-print_format', 'json', path]
-        p = subprocess.Popen(
-            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        output, error = p.communicate()
-        if p.returncode:
-            if not six.PY2:
-                error = error.decode('utf-8')
-            error = error.splitlines()[0]
-            raise RuntimeError('ffprobe: {}'.format(error))
+        output = FFmpeg._run(cmd)
         if not six.PY2:
             output = output.decode('utf-8')
         return json.loads(output)
 
+    @classmethod
+    def probe(cls, path):
+        # get format and streams info, using recent result if possible
+        if not ffmpeg_version:
+            return {}
+        stamp = file_stamp(path)
+        with cls._probe_cache_lock:
+            if path in cls._probe_cache:
+                result_stamp, result = cls._probe_cache.pop(path)
+                if result_stamp == stamp:
+                    cls._probe_cache[path] = result_stamp, result
+                    return result
+        disk_cache = cls._get_disk_cache()
+        result = disk_cache.get_probe(path, stamp)
+        if result is None:
+            result = cls.ffprobe(path)
+            disk_cache.put_probe(path, stamp, result)
+        with cls._probe_cache_lock:
+            cls._probe_cache[path] = stamp, result
+            while len(cls._probe_cache) > cls._probe_cache_size:
+                cls._probe_cache.popitem(last=False)
+        return result
+
     @staticmethod
     def get_dimensions(path):
         if not ffmpeg_version:
             return {}
-        return FFmpeg.ffprobe(
-            path, options=[
-                '-show_entries', 'stream=width,height,duration',
-                '-select_streams', 'v:0']
-            )['streams'][0]
+        raw = FFmpeg.probe(path)
+        for stream in raw.get('streams', []):
+            if stream.get('codec_type') != 'video':
+                continue
+            result = {'width': stream['width'], 'height': stream['height']}
+            if 'duration' in stream:
+                result['duration'] = stream['duration']
+            elif 'duration' in raw.get('format', {}):
+                result['duration'] = raw['format']['duration']
+            return result
+        return {}
 
     @staticmethod
-    def make_thumbnail(path, w, h, skip, quality):
+    def get_frame(path, w, h, skip):
+        # get one scaled and padded frame, as a PPM image
         if not ffmpeg_version:
             return None
         cmd = ['ffmpeg', '-hide_banner', '-loglevel', 'warning']
@@ -76,13 +158,5 @@ class FFmpeg(object):
         cmd += ['-vf', ('scale={w}:{h}:force_original_aspect_ratio=decrease,'
                         'pad={w}:{h}:(ow-iw)/2:(oh-ih)/2').format(w=w, h=h)]
         cmd += ['-sws_flags', 'sinc', '-f', 'image2pipe',
-                '-vcodec', 'mjpeg', '-q:v', str(quality), 'pipe:1']
-        p = subprocess.Popen(
-            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        output, error = p.communicate()
-        if p.returncode:
-            if not six.PY2:
-                error = error.decode('utf-8')
-            error = error.splitlines()[0]
-            raise RuntimeError('ffmpeg: {}'.format(error))
-        return output
+                '-vcodec', 'ppm', 'pipe:1']
+        return FFmpeg._run(cmd)
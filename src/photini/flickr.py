@@ -18,11 +18,14 @@
 
 from __future__ import unicode_literals
 
+from bisect import bisect_left, bisect_right
 from datetime import datetime, timedelta
 import logging
+from multiprocessing.pool import ThreadPool
 import os
 import requests
 import sys
+import threading
 
 import six
 if sys.version_info >= (3, 4):
@@ -49,10 +52,22 @@ ID_TAG = 'flickr:photo_id'
 
 class FlickrSession(UploaderSession):
     name = 'flickr'
+    # number of API calls made at once after uploading
+    max_requests = 4
+    # number of files whose metadata calls may be unfinished
+    max_pending = 2
+    _sets_lock = threading.Lock()
 
     def __init__(self, *arg, **kwds):
         super(FlickrSession, self).__init__(*arg, **kwds)
         self.api = None
+        self.executor = None
+        # photo info from get_infos, kept while Photini is running
+        self.info_cache = {}
+        # (image, [async results]) of calls made after uploading
+        self.pending = []
+        # (image, error message) of failed calls
+        self.failed = []
 
     def connect(self):
         api_key    = key_store.get('flickr', 'api_key')
@@ -78,6 +93,17 @@ class FlickrSession(UploaderSession):
 
     def disconnect(self):
         self.connection_changed.emit(False)
+        if self.executor:
+            # wait for unfinished calls before closing their pool
+            self.check_pending(0)
+            self.executor.close()
+            self.executor.join()
+            self.executor = None
+        # don't carry results over to the next connection
+        for image, error in self.failed:
+            logger.error('%s: %s', image.path, error)
+        self.pending = []
+        self.failed = []
         if self.api:
             # undocumented way to close Flickr connection cleanly
             self.api.flickr_oauth.session.close()
@@ -160,12 +186,46 @@ class FlickrSession(UploaderSession):
             rsp = self.api.photos.getInfo(photo_id=photo_id)
         except Exception as ex:
             logger.error(str(ex))
-            self.disconnect()
             return None
         if rsp['stat'] != 'ok':
+            logger.error('getInfo %s: %s', photo_id, rsp['stat'])
             return None
         return rsp['photo']
 
+    def get_infos(self, photo_ids, last_updates=None):
+        """Get info for several photos, several at a time.
+
+        Results are cached. A cached result is only used if
+        last_updates (from find_photos) shows the photo hasn't changed
+        since. Returns a {photo_id: info} dict and a list of photo ids
+        whose info couldn't be got.
+
+        """
+        last_updates = last_updates or {}
+        cache = self.info_cache
+        fetch = []
+        failed = []
+        for photo_id in photo_ids:
+            if (photo_id in cache and last_updates.get(photo_id) ==
+                    cache[photo_id]['dates']['lastupdate']):
+                continue
+            fetch.append(photo_id)
+        if fetch:
+            pool = ThreadPool(min(self.max_requests, len(fetch)))
+            try:
+                for photo_id, info in zip(
+                        fetch, pool.imap(self.get_info, fetch)):
+                    if info:
+                        cache[photo_id] = info
+                    else:
+                        failed.append(photo_id)
+            finally:
+                pool.close()
+                pool.join()
+        failed_set = set(failed)
+        return dict((x, cache[x]) for x in photo_ids
+                    if x in cache and x not in failed_set), failed
+
     def find_photos(self, min_taken_date, max_taken_date):
         # search Flickr
         page = 1
@@ -173,7 +233,8 @@ class FlickrSession(UploaderSession):
             with Busy():
                 try:
                     rsp = self.api.people.getPhotos(
-                        user_id='me', page=page, extras='date_taken,url_t',
+                        user_id='me', page=page, per_page=500,
+                        extras='date_taken,last_update,url_t',
                         min_taken_date=min_taken_date.strftime('%Y-%m-%d %H:%M:%S'),
                         max_taken_date=max_taken_date.strftime('%Y-%m-%d %H:%M:%S'))
                     if rsp['stat'] != 'ok' or not rsp['photos']['photo']:
@@ -184,6 +245,8 @@ class FlickrSession(UploaderSession):
                     return
             for photo in rsp['photos']['photo']:
                 yield photo
+            if page >= int(rsp['photos']['pages']):
+                return
             page += 1
 
 
@@ -217,7 +280,10 @@ class FlickrSession(UploaderSession):
             image.metadata.keywords = [keyword]
         elif keyword not in image.metadata.keywords:
             image.metadata.keywords = list(image.metadata.keywords) + [keyword]
-        # set metadata after uploading image
+        # set metadata after uploading image, while the next image is
+        # uploaded. Calls that don't depend on each other are made at
+        # the same time.
+        tasks = []
         for key, function in (('permissions',  'setPerms'),
                               ('content_type', 'setContentType'),
                               ('hidden',       'setSafetyLevel'),
@@ -229,27 +295,75 @@ class FlickrSession(UploaderSession):
                 continue
             kwargs = params[key]
             kwargs['photo_id'] = photo_id
-            rsp = getattr(self.api.photos, function)(**kwargs)
-            status = rsp['stat']
-            if status != 'ok':
-                return function + ' ' + status
+            tasks.append(self.call_async(self.set_data, function, kwargs))
         # existing photo may have a location that needs deleting
         if params['function'] != 'upload' and (
                 'location' in params and not params['location']):
-            rsp = self.api.photos.getInfo(photo_id=photo_id)
+            tasks.append(self.call_async(self.remove_location, photo_id))
+        # add to or remove from sets
+        if 'sets' in params:
+            tasks.append(self.call_async(
+                self.update_sets, photo_id, params['sets'],
+                params['function'] == 'upload'))
+        # if a call fails, retrying doesn't need to upload the image again
+        params['function'] = None
+        params['photo_id'] = photo_id
+        self.pending.append((image, tasks))
+        self.check_pending(self.max_pending)
+        return ''
+
+    def call_async(self, func, *args):
+        if not self.executor:
+            self.executor = ThreadPool(self.max_requests)
+        return self.executor.apply_async(func, args)
+
+    def check_pending(self, max_pending):
+        # wait until no more than max_pending images have unfinished
+        # calls, and collect any errors
+        while self.pending:
+            image, tasks = self.pending[0]
+            if len(self.pending) <= max_pending and not all(
+                    [x.ready() for x in tasks]):
+                break
+            self.pending.pop(0)
+            errors = []
+            for task in tasks:
+                try:
+                    error = task.get()
+                except Exception as ex:
+                    error = str(ex)
+                if error:
+                    errors.append(error)
+            if errors:
+                self.failed.append((image, ', '.join(errors)))
+
+    def flush_uploads(self):
+        self.check_pending(0)
+        failed, self.failed = self.failed, []
+        return failed
+
+    def set_data(self, function, kwargs):
+        rsp = getattr(self.api.photos, function)(**kwargs)
+        status = rsp['stat']
+        if status != 'ok':
+            return function + ' ' + status
+        return ''
+
+    def remove_location(self, photo_id):
+        rsp = self.api.photos.getInfo(photo_id=photo_id)
+        status = rsp['stat']
+        if status != 'ok':
+            return 'getInfo ' + status
+        if 'location' in rsp['photo']:
+            rsp = self.api.photos.geo.removeLocation(photo_id=photo_id)
             status = rsp['stat']
             if status != 'ok':
-                return 'getInfo ' + status
-            if 'location' in rsp['photo']:
-                rsp = self.api.photos.geo.removeLocation(photo_id=photo_id)
-                status = rsp['stat']
-                if status != 'ok':
-                    return 'geo.removeLocation ' + status
-        # add to or remove from sets
-        if 'sets' not in params:
-            return ''
+                return 'geo.removeLocation ' + status
+        return ''
+
+    def update_sets(self, photo_id, sets, new_photo):
         current_sets = {}
-        if params['function'] != 'upload':
+        if not new_photo:
             # get sets existing photo is in
             rsp = self.api.photos.getAllContexts(photo_id=photo_id)
             status = rsp['stat']
@@ -258,34 +372,41 @@ class FlickrSession(UploaderSession):
             if 'set' in rsp:
                 for p_set in rsp['set']:
                     current_sets[p_set['id']] = p_set
-        for widget in params['sets']:
+        for widget in sets:
             photoset_id = widget.property('photoset_id')
             title = widget.text().replace('&&', '&')
             description = widget.toolTip()
             if not photoset_id:
-                # create new set
-                kwargs = {'title'           : title,
-                          'description'     : description,
-                          'primary_photo_id': photo_id}
-                rsp = self.api.photosets.create(**kwargs)
-                status = rsp['stat']
-                if status == 'ok':
-                    widget.setProperty('photoset_id', rsp['photoset']['id'])
-                    continue
-                logger.error(
-                    'Create photoset "%s" failed: %s', title, status)
-            elif photoset_id in current_sets:
+                # creating a new set must not happen in two threads at once
+                with self._sets_lock:
+                    # another thread may have created it while this one
+                    # waited for the lock
+                    photoset_id = widget.property('photoset_id')
+                    if not photoset_id:
+                        # create new set
+                        kwargs = {'title'           : title,
+                                  'description'     : description,
+                                  'primary_photo_id': photo_id}
+                        rsp = self.api.photosets.create(**kwargs)
+                        status = rsp['stat']
+                        if status == 'ok':
+                            widget.setProperty(
+                                'photoset_id', rsp['photoset']['id'])
+                        else:
+                            logger.error(
+                                'Create photoset "%s" failed: %s',
+                                title, status)
+                        continue
+            if photoset_id in current_sets:
                 # photo is already in the set
                 del current_sets[photoset_id]
-            else:
-                # use existing set
-                kwargs = {'photo_id': photo_id, 'photoset_id': photoset_id}
-                rsp = self.api.photosets.addPhoto(**kwargs)
-                status = rsp['stat']
-                if status == 'ok':
-                    continue
-                logger.error(
-                    'Add to photoset "%s" failed: %s', title, status)
+                continue
+            # use existing set
+            kwargs = {'photo_id': photo_id, 'photoset_id': photoset_id}
+            rsp = self.api.photosets.addPhoto(**kwargs)
+            status = rsp['stat']
+            if status != 'ok':
+                logger.error('Add to photoset "%s" failed: %s', title, status)
         # remove from any other sets
         for p_set in current_sets.values():
             kwargs = {'photo_id': photo_id, 'photoset_id': p_set['id']}
@@ -613,10 +734,10 @@ class TabWidget(PhotiniUploader):
             self.replace_prefs[key] = widget[key].isChecked()
         return dict(self.replace_prefs), photo_id
 
-    def _find_on_flickr(self, image):
+    def _date_range(self, image):
         # get possible date range
         if not image.metadata.date_taken:
-            return
+            return None
         precision = min(image.metadata.date_taken.precision, 6)
         min_taken_date = image.metadata.date_taken.truncate_datetime(
             image.metadata.date_taken.datetime, precision)
@@ -633,11 +754,25 @@ class TabWidget(PhotiniUploader):
         else:
             max_taken_date = min_taken_date + timedelta(days=366)
         max_taken_date -= timedelta(seconds=1)
-        # search Flickr
-        for photo in self.session.find_photos(min_taken_date, max_taken_date):
-            yield photo
+        return min_taken_date, max_taken_date
+
+    def _find_on_flickr(self, images):
+        # search Flickr with as few queries as possible, by merging the
+        # date ranges of all the images
+        ranges = sorted(filter(None, [self._date_range(x) for x in images]))
+        merged = []
+        for min_taken_date, max_taken_date in ranges:
+            if merged and min_taken_date - merged[-1][1] <= timedelta(days=1):
+                merged[-1][1] = max(merged[-1][1], max_taken_date)
+            else:
+                merged.append([min_taken_date, max_taken_date])
+        for min_taken_date, max_taken_date in merged:
+            for photo in self.session.find_photos(
+                    min_taken_date, max_taken_date):
+                yield photo
 
-    def _find_local(self, photo, unknowns):
+    def _find_local(self, photo, index):
+        # index is a list of dates and a list of images sorted by date
         granularity = int(photo['datetakengranularity'])
         min_taken_date = datetime.strptime(
             photo['datetaken'], '%Y-%m-%d %H:%M:%S')
@@ -647,14 +782,9 @@ class TabWidget(PhotiniUploader):
             max_taken_date = min_taken_date + timedelta(days=31)
         else:
             max_taken_date = min_taken_date + timedelta(days=366)
-        candidates = []
-        for candidate in unknowns:
-            if not candidate.metadata.date_taken:
-                continue
-            date_taken = candidate.metadata.date_taken.datetime
-            if date_taken < min_taken_date or date_taken > max_taken_date:
-                continue
-            candidates.append(candidate)
+        dates, images = index
+        candidates = images[bisect_left(dates, min_taken_date):
+                            bisect_right(dates, max_taken_date)]
         if not candidates:
             return None
         rsp = requests.get(photo['url_t'])
@@ -681,11 +811,12 @@ class TabWidget(PhotiniUploader):
         buttons = {}
         for candidate in candidates:
             label = QtWidgets.QLabel()
-            pixmap = candidate.image.pixmap()
-            if pixmap:
-                label.setPixmap(pixmap)
+            pixmap = candidate.get_pixmap()
+            if pixmap.isNull():
+                label.setText(
+                    translate('ImageList', 'No\nthumbnail\nin file'))
             else:
-                label.setText(candidate.image.text())
+                label.setPixmap(pixmap)
             button = QtWidgets.QPushButton(
                 os.path.basename(candidate.path))
             button.setToolTip(candidate.path)
@@ -709,10 +840,7 @@ class TabWidget(PhotiniUploader):
         'city':           ('neighbourhood', 'locality'),
         }
 
-    def _merge_metadata(self, photo_id, image):
-        photo = self.session.get_info(photo_id)
-        if not photo:
-            return
+    def _merge_metadata(self, photo, image):
         md = image.metadata
         # sync title
         title = html.unescape(photo['title']['_content'])
@@ -795,22 +923,56 @@ class TabWidget(PhotiniUploader):
                     break
             else:
                 unknowns.append(image)
-        # try to find unknowns on Flickr
-        for image in unknowns:
-            for photo in self._find_on_flickr(image):
-                if photo['id'] in photo_ids:
-                    continue
-                match = self._find_local(photo, unknowns)
+        unknowns = [x for x in unknowns if x.metadata.date_taken]
+        unknowns.sort(key=lambda x: x.metadata.date_taken.datetime)
+        index = [x.metadata.date_taken.datetime for x in unknowns], unknowns
+        # known photos with cached info need their last update time to
+        # check the cached info is still valid. Photos without a date
+        # taken can't be searched for, so their info is always fetched
+        # again.
+        check_ids = set(x for x in photo_ids if x in self.session.info_cache
+                        and photo_ids[x].metadata.date_taken)
+        search = list(unknowns) + [photo_ids[x] for x in check_ids]
+        # search Flickr to find unknowns and get last update times
+        last_updates = {}
+        for photo in self._find_on_flickr(search):
+            last_updates[photo['id']] = photo.get('lastupdate')
+            check_ids.discard(photo['id'])
+            if unknowns and photo['id'] not in photo_ids:
+                match = self._find_local(photo, index)
                 if match:
                     match.metadata.keywords = list(
                         match.metadata.keywords or []) + [
                             '{}={}'.format(ID_TAG, photo['id'])]
                     photo_ids[photo['id']] = match
-                    unknowns.remove(match)
+                    idx = unknowns.index(match)
+                    del index[0][idx]
+                    del unknowns[idx]
+            if not unknowns and not check_ids:
+                # don't fetch any more pages of search results
+                break
         # merge Flickr metadata into file
         with Busy():
+            photos, failed = self.session.get_infos(
+                list(photo_ids), last_updates)
             for photo_id, image in photo_ids.items():
-                self._merge_metadata(photo_id, image)
+                if photo_id in photos:
+                    self._merge_metadata(photos[photo_id], image)
+        if failed:
+            dialog = QtWidgets.QMessageBox(parent=self)
+            dialog.setWindowTitle(
+                translate('FlickrTab', 'Photini: sync failed'))
+            dialog.setText(
+                translate('FlickrTab', '<h3>Flickr sync incomplete.</h3>'))
+            dialog.setInformativeText(
+                translate('FlickrTab', 'Could not get information for {0}'
+                          ' of {1} photos from Flickr.').format(
+                              len(failed), len(photo_ids)))
+            dialog.setDetailedText('\n'.join(
+                [photo_ids[x].path for x in failed]))
+            dialog.setIcon(QtWidgets.QMessageBox.Warning)
+            dialog.setStandardButtons(QtWidgets.QMessageBox.Ok)
+            dialog.exec_()
 
     @QtCore.pyqtSlot()
     @catch_all
@@ -18,14 +18,19 @@
 
 from __future__ import unicode_literals
 
+from collections import defaultdict
+import json
 import logging
 import os
 import six
+import threading
+import time
 import urllib
 
 import requests
 from requests_oauthlib import OAuth2Session
 
+from photini.cachestore import BaseCacheStore, file_stamp
 from photini.configstore import key_store
 from photini.pyqt import catch_all, QtCore, QtWidgets
 from photini.uploader import PhotiniUploader, UploaderSession
@@ -34,15 +39,55 @@ logger = logging.getLogger(__name__)
 translate = QtCore.QCoreApplication.translate
 
 
+class UploadJournal(BaseCacheStore):
+    """Store of unfinished uploads, so an interrupted upload can be
+    resumed instead of starting again.
+
+    """
+    def __init__(self, max_size, *arg, **kw):
+        super(UploadJournal, self).__init__(
+            'googlephotos_uploads', max_size, *arg, **kw)
+
+    def get_upload(self, path, stamp):
+        data = self.get(path, stamp)
+        if data is None:
+            return None
+        return json.loads(data.decode('utf-8'))
+
+    def put_upload(self, path, stamp, upload):
+        self.put(path, stamp, json.dumps(upload).encode('utf-8'))
+        self.evict()
+
+
 class GooglePhotosSession(UploaderSession):
     name       = 'googlephotos'
     oauth_url  = 'https://www.googleapis.com/oauth2/'
     photos_url = 'https://photoslibrary.googleapis.com/'
     scope      = ('profile', 'https://www.googleapis.com/auth/photoslibrary')
+    # initial and maximum upload chunk sizes, rounded down to a
+    # multiple of the size set by google
+    chunk_size = 4 * 1024 * 1024
+    max_chunk_size = 32 * 1024 * 1024
+    _journal = None
+    _journal_lock = threading.Lock()
+    journal_size = 100000
+    # maximum number of media items per API call
+    batch_size = 50
 
     def __init__(self, *arg, **kwds):
         super(GooglePhotosSession, self).__init__(*arg, **kwds)
         self.api = None
+        # (upload token, image, params) waiting for media item creation
+        self.pending = []
+        # (image, error message) of failed media item creations
+        self.failed = []
+
+    @classmethod
+    def get_journal(cls):
+        with cls._journal_lock:
+            if not cls._journal:
+                cls._journal = UploadJournal(cls.journal_size)
+        return cls._journal
 
     def connect(self, token=None):
         self.cached_data = {}
@@ -159,66 +204,168 @@ class GooglePhotosSession(UploaderSession):
         return self.check_response(self.api.post(
             self.photos_url + 'v1/albums', json=body, timeout=5))
 
-    def do_upload(self, fileobj, image_type, image, params):
-        # see https://developers.google.com/photos/library/guides/upload-media
-        # 1/ initiate a resumable upload session (to do file in chunks)
-        headers = {
-            'X-Goog-Upload-Command'     : 'start',
-            'X-Goog-Upload-Content-Type': image_type,
-            'X-Goog-Upload-File-Name'   : os.path.basename(image.path),
-            'X-Goog-Upload-Protocol'    : 'resumable',
-            'X-Goog-Upload-Raw-Size'    : str(fileobj.len),
-            }
-        rsp = self.api.post(self.photos_url + 'v1/uploads', headers=headers)
+    def query_upload(self, upload_url):
+        # get number of bytes received by an unfinished upload session
+        rsp = self.api.post(
+            upload_url, headers={'X-Goog-Upload-Command': 'query'})
         rsp = self.check_response(rsp, decode=False)
-        if not rsp:
-            return 'upload failed'
-        upload_url = rsp.headers['X-Goog-Upload-URL']
-        chunk_size = int(rsp.headers['X-Goog-Upload-Chunk-Granularity'])
-        # 2/ upload data in chunks, size set by google
+        if not rsp or rsp.headers.get('X-Goog-Upload-Status') != 'active':
+            return None
+        return int(rsp.headers['X-Goog-Upload-Size-Received'])
+
+    def upload_data(self, fileobj, image_type, image):
+        # returns upload token and error message
+        journal = self.get_journal()
+        path, stamp = None, None
+        if fileobj.name == image.path:
+            # not a converted copy, so upload can be resumed later
+            path = os.path.abspath(image.path)
+            stamp = '{}:{}'.format(file_stamp(image.path), image_type)
+        # 1/ resume an interrupted upload session, if there is one
+        offset = None
+        upload = path and journal.get_upload(path, stamp)
+        if upload:
+            offset = self.query_upload(upload['url'])
+            if offset is None:
+                journal.remove(path)
+            else:
+                logger.info('%s: resuming upload at %d bytes',
+                            image.path, offset)
+        # 2/ initiate a resumable upload session (to do file in chunks)
+        if offset is None:
+            headers = {
+                'X-Goog-Upload-Command'     : 'start',
+                'X-Goog-Upload-Content-Type': image_type,
+                'X-Goog-Upload-File-Name'   : os.path.basename(image.path),
+                'X-Goog-Upload-Protocol'    : 'resumable',
+                'X-Goog-Upload-Raw-Size'    : str(fileobj.len),
+                }
+            rsp = self.api.post(
+                self.photos_url + 'v1/uploads', headers=headers)
+            rsp = self.check_response(rsp, decode=False)
+            if not rsp:
+                return None, 'upload failed'
+            upload = {
+                'url'        : rsp.headers['X-Goog-Upload-URL'],
+                'granularity': int(
+                    rsp.headers['X-Goog-Upload-Chunk-Granularity']),
+                'offset'     : 0,
+                }
+            offset = 0
+            if path:
+                journal.put_upload(path, stamp, upload)
+        # 3/ upload data in chunks, multiples of the size set by google
+        granularity = upload['granularity']
+        chunk_size = max(self.chunk_size // granularity, 1) * granularity
         headers = {'X-Goog-Upload-Command': 'upload'}
-        offset = 0
-        while offset < fileobj.len:
+        upload_token = None
+        fileobj.seek(offset)
+        # the last request must finalize the upload, even if there is no
+        # data left to send, e.g. when resuming a session that had
+        # received every byte
+        while True:
+            start = time.time()
             chunk = fileobj.read(chunk_size)
             headers['X-Goog-Upload-Offset'] = str(offset)
-            offset += len(chunk)
-            if offset >= fileobj.len:
+            if offset + len(chunk) >= fileobj.len:
                 headers['X-Goog-Upload-Command'] = 'upload, finalize'
-            rsp = self.api.post(upload_url, headers=headers, data=chunk)
+            rsp = self.api.post(upload['url'], headers=headers, data=chunk)
             rsp = self.check_response(rsp, decode=False)
             if not rsp:
-                break
+                return None, 'upload failed at {} bytes'.format(offset)
+            offset += len(chunk)
             if rsp.text:
                 upload_token = rsp.text
+            if offset >= fileobj.len:
+                break
+            if path:
+                upload['offset'] = offset
+                journal.put_upload(path, stamp, upload)
+            # aim for each chunk to take a few seconds
+            duration = time.time() - start
+            if duration < 2.0 and chunk_size * 2 <= self.max_chunk_size:
+                chunk_size *= 2
+            elif duration > 8.0 and chunk_size > granularity:
+                chunk_size = max(
+                    chunk_size // (granularity * 2), 1) * granularity
+        if path:
+            journal.remove(path)
+        return upload_token, None
+
+    def do_upload(self, fileobj, image_type, image, params):
+        # see https://developers.google.com/photos/library/guides/upload-media
+        upload_token, error = self.upload_data(fileobj, image_type, image)
+        if error:
+            return error
         fileobj._callback(100)
         if not upload_token:
             return 'no upload token received'
-        # 3/ convert uploaded bytes to a media item
-        body = {'newMediaItems': [{
-            'description'    : params['description'],
-            'simpleMediaItem': {'uploadToken': upload_token},
-            }]}
-        if params['albums']:
-            body['albumId'] = params['albums'][0]
-        rsp = self.check_response(self.api.post(
-            self.photos_url + 'v1/mediaItems:batchCreate',
-            json=body))
-        if 'newMediaItemResults' not in rsp:
-            return 'failed to create media item'
-        rsp = rsp['newMediaItemResults'][0]
-        if 'status' in rsp:
-            if rsp['status']['message'] != 'Success':
-                return str(rsp['status'])
-        media_id = rsp['mediaItem']['id']
-        # 4/ add media item to more albums
-        if len(params['albums']) > 1:
-            body = {'mediaItemIds': [media_id]}
-            for album_id in params['albums'][1:]:
-                url = (self.photos_url + 'v1/albums/' +
-                       album_id + ':batchAddMediaItems')
-                rsp = self.check_response(self.api.post(url, json=body))
+        # 4/ convert uploaded bytes to a media item later, in a batch
+        self.pending.append((upload_token, image, params))
+        if len(self.pending) >= self.batch_size:
+            self.create_media_items()
         return ''
 
+    def flush_uploads(self):
+        if self.pending:
+            self.create_media_items()
+        failed, self.failed = self.failed, []
+        return failed
+
+    def create_media_items(self):
+        # create media items, one call for each batch of items going
+        # to the same (first) album
+        pending, self.pending = self.pending, []
+        albums = defaultdict(list)
+        for upload_token, image, params in pending:
+            album_id = params['albums'][0] if params['albums'] else None
+            albums[album_id].append((upload_token, image, params))
+        batches = []
+        for album_id, items in albums.items():
+            for n in range(0, len(items), self.batch_size):
+                batches.append((album_id, items[n:n + self.batch_size]))
+        album_items = defaultdict(list)
+        for album_id, items in batches:
+            body = {'newMediaItems': [{
+                'description'    : params['description'],
+                'simpleMediaItem': {'uploadToken': upload_token},
+                } for (upload_token, image, params) in items]}
+            if album_id:
+                body['albumId'] = album_id
+            try:
+                rsp = self.check_response(self.api.post(
+                    self.photos_url + 'v1/mediaItems:batchCreate', json=body))
+            except Exception as ex:
+                rsp = {}
+                logger.error(str(ex))
+            if 'newMediaItemResults' not in rsp:
+                self.failed += [(image, 'failed to create media item')
+                                for (upload_token, image, params) in items]
+                continue
+            # map results back to images
+            items = dict((x[0], x[1:]) for x in items)
+            for result in rsp['newMediaItemResults']:
+                if result.get('uploadToken') not in items:
+                    continue
+                image, params = items.pop(result['uploadToken'])
+                if 'mediaItem' not in result:
+                    self.failed.append((image, str(result.get('status'))))
+                    continue
+                for extra_id in params['albums'][1:]:
+                    album_items[extra_id].append(result['mediaItem']['id'])
+            self.failed += [(image, 'no media item created')
+                            for (image, params) in items.values()]
+        # 5/ add media items to more albums
+        for album_id, media_ids in album_items.items():
+            url = (self.photos_url + 'v1/albums/' +
+                   album_id + ':batchAddMediaItems')
+            for n in range(0, len(media_ids), self.batch_size):
+                body = {'mediaItemIds': media_ids[n:n + self.batch_size]}
+                try:
+                    self.check_response(self.api.post(url, json=body))
+                except Exception as ex:
+                    logger.error(str(ex))
+
 
 class GoogleUploadConfig(QtWidgets.QWidget):
     new_set = QtCore.pyqtSignal()
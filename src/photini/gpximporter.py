@@ -1,6 +1,6 @@
 ##  Photini - a simple photo metadata editor.
 ##  http://github.com/jim-easterbrook/Photini
-##  Copyright (C) 2019  Jim Easterbrook  jim@jim-easterbrook.me.uk
+##  Copyright (C) 2019-20  Jim Easterbrook  jim@jim-easterbrook.me.uk
 ##
 ##  This program is free software: you can redistribute it and/or
 ##  modify it under the terms of the GNU General Public License as
@@ -19,8 +19,9 @@
 import logging
 import os
 
-import gpxpy
+import numpy
 
+from photini.gpxtrack import GpsTrack, to_seconds, TrackPlot
 from photini.pyqt import QtCore, QtWidgets, qt_version_info
 
 
@@ -41,12 +42,12 @@ class GpxImporter(QtCore.QObject):
             args += [None, QtWidgets.QFileDialog.DontUseNativeDialog]
         else:
             args += [QtWidgets.QFileDialog.DontUseNativeDialog]
-        path = QtWidgets.QFileDialog.getOpenFileName(*args)
+        paths = QtWidgets.QFileDialog.getOpenFileNames(*args)
         if qt_version_info >= (5, 0):
-            path = path[0]
-        if not path:
+            paths = paths[0]
+        if not paths:
             return
-        parent.app.config_store.set('paths', 'gpx', os.path.dirname(path))
+        parent.app.config_store.set('paths', 'gpx', os.path.dirname(paths[0]))
         # get user options
         config_store = QtWidgets.QApplication.instance().config_store
         dialog = QtWidgets.QDialog(parent=parent)
@@ -83,86 +84,34 @@ class GpxImporter(QtCore.QObject):
         if plot_track:
             plot_track = plot_track.isChecked()
             config_store.set('gpx_importer', 'plot', plot_track)
-        # make a list of all points in the file
-        points = []
+        # read all points in the files
+        track = GpsTrack()
         discards = 0
-        for p in self.read_file(path):
-            if p.horizontal_dilution and p.horizontal_dilution > max_dilution:
-                discards += 1
-                continue
-            time_stamp = p.time
-            if time_stamp.tzinfo is not None:
-                # convert timestamp to UTC
-                utc_offset = time_stamp.utcoffset()
-                time_stamp = (time_stamp - utc_offset).replace(tzinfo=None)
-            # add point to list
-            points.append((time_stamp, p.latitude, p.longitude))
+        for path in paths:
+            count, discarded = track.add_file(path, max_dilution)
+            discards += discarded
+            if not count:
+                logger.warning('No points found in file "%s"', path)
         if discards:
             logger.warning('Discarded %d low accuracy points', discards)
-        if not points:
-            logger.warning('No points found in file "%s"', path)
+        if not len(track):
             return
-        logger.warning('Using %d points', len(points))
-        # sort points by timestamp
-        points.sort(key=lambda x: x[0])
+        logger.warning('Using %d points', len(track))
         # display on map
         if plot_track:
-            # divide points into contiguous tracks
-            tracks = []
-            t = []
-            for p in points:
-                if t and (p[0] - t[-1][0]).total_seconds() > max_interval:
-                    tracks.append(t)
-                    t = []
-                t.append(p)
-            if t:
-                tracks.append(t)
-            parent.tabs.currentWidget().plot_track(tracks)
+            parent.tabs.currentWidget().plot_track(
+                TrackPlot(track.tracks(max_interval)))
         # set image coordinates
-        max_interval = max_interval / 2.0
+        images = []
         for image in parent.image_list.get_selected_images():
-            if not image.metadata.date_taken:
-                continue
-            time_stamp = image.metadata.date_taken.to_utc()
-            if len(points) < 2:
-                lo, hi = 0, 0
-            elif time_stamp < points[0][0]:
-                lo, hi = 0, 1
-            elif time_stamp > points[-1][0]:
-                lo, hi = -2, -1
-            else:
-                # binary search for points with nearest timestamps
-                lo, hi = 0, len(points) - 1
-                while hi - lo > 1:
-                    mid = (lo + hi) // 2
-                    if time_stamp >= points[mid][0]:
-                        lo = mid
-                    elif time_stamp <= points[mid][0]:
-                        hi = mid
-            # use linear interpolation (or extrapolation) to set lat & long
-            dt_lo = (time_stamp - points[lo][0]).total_seconds()
-            dt_hi = (time_stamp - points[hi][0]).total_seconds()
-            if abs(dt_lo) > max_interval and abs(dt_hi) > max_interval:
+            if image.metadata.date_taken:
+                images.append(image)
+        lats, lngs = track.interpolate(
+            [to_seconds(x.metadata.date_taken.to_utc()) for x in images],
+            max_interval / 2.0)
+        for image, lat, lng in zip(images, lats.tolist(), lngs.tolist()):
+            if numpy.isnan(lat):
                 logger.info('No point for time %s', image.metadata.date_taken)
                 continue
-            if dt_lo == dt_hi:
-                beta = 0.5
-            else:
-                beta = dt_lo / (dt_lo - dt_hi)
-            lat = points[lo][1] + (beta * (points[hi][1] - points[lo][1]))
-            lng = points[lo][2] + (beta * (points[hi][2] - points[lo][2]))
             image.metadata.latlong = lat, lng
         parent.image_list.emit_selection()
-
-    def read_file(self, path):
-        with open(path) as gpx_file:
-            gpx = gpxpy.parse(gpx_file)
-            for track in gpx.tracks:
-                for segment in track.segments:
-                    for point in segment.points:
-                        yield point
-            for route in gpx.routes:
-                for point in route.points:
-                    yield point
-            for point in gpx.waypoints:
-                yield point
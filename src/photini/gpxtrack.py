@@ -0,0 +1,323 @@
+##  Photini - a simple photo metadata editor.
+##  http://github.com/jim-easterbrook/Photini
+##  Copyright (C) 2020  Jim Easterbrook  jim@jim-easterbrook.me.uk
+##
+##  This program is free software: you can redistribute it and/or
+##  modify it under the terms of the GNU General Public License as
+##  published by the Free Software Foundation, either version 3 of the
+##  License, or (at your option) any later version.
+##
+##  This program is distributed in the hope that it will be useful,
+##  but WITHOUT ANY WARRANTY; without even the implied warranty of
+##  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+##  General Public License for more details.
+##
+##  You should have received a copy of the GNU General Public License
+##  along with this program.  If not, see
+##  <http://www.gnu.org/licenses/>.
+
+from __future__ import unicode_literals
+
+from array import array
+import calendar
+import logging
+import math
+import re
+import xml.etree.ElementTree as ET
+
+import numpy
+
+logger = logging.getLogger(__name__)
+
+_point_tags = ('trkpt', 'rtept', 'wpt')
+
+_time_parser = re.compile(
+    r'(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2}):(\d{2})(\.\d+)?'
+    r'(Z|[-+]\d{2}:?\d{2})?$')
+
+_day_start = {}
+
+
+def parse_time(text):
+    # convert GPX (ISO 8601) time string to seconds since 1970 (UTC)
+    text = text.strip()
+    if len(text) == 20 and text[19] == 'Z':
+        # usual format, e.g. 2020-01-01T12:34:56Z
+        day = text[:10]
+        try:
+            if day not in _day_start:
+                _day_start[day] = calendar.timegm(
+                    (int(day[:4]), int(day[5:7]), int(day[8:10]), 0, 0, 0))
+            return float(_day_start[day] + (int(text[11:13]) * 3600) +
+                         (int(text[14:16]) * 60) + int(text[17:19]))
+        except ValueError:
+            # not the usual format after all, try the full parser
+            pass
+    match = _time_parser.match(text)
+    if not match:
+        return None
+    groups = match.groups()
+    result = float(calendar.timegm([int(x) for x in groups[:6]]))
+    if groups[6]:
+        result += float(groups[6])
+    tz = groups[7]
+    if tz and tz != 'Z':
+        offset = (int(tz[1:3]) * 60 + int(tz[-2:])) * 60
+        if tz[0] == '+':
+            result -= offset
+        else:
+            result += offset
+    return result
+
+
+def to_seconds(date_time):
+    # convert naive UTC datetime to seconds since 1970
+    return (calendar.timegm(date_time.timetuple()) +
+            (date_time.microsecond / 1.0e6))
+
+
+def read_gpx(path, max_dilution=None):
+    """Read all track, route and way points from a GPX file.
+
+    The file is parsed incrementally and each point is discarded from
+    the XML tree as soon as it has been read, so memory use is small
+    even with very large files. Returns arrays of time (seconds since
+    1970), latitude & longitude, and the number of points discarded
+    because of high dilution of precision.
+
+    """
+    times = array(str('d'))
+    lats = array(str('d'))
+    lons = array(str('d'))
+    discards = 0
+    stack = []
+    # tag names without namespace
+    tags = {}
+    for event, elem in ET.iterparse(path, events=('start', 'end')):
+        if event == 'start':
+            stack.append(elem)
+            continue
+        stack.pop()
+        if elem.tag not in tags:
+            tags[elem.tag] = elem.tag.rpartition('}')[2]
+        if tags[elem.tag] not in _point_tags:
+            continue
+        time_stamp = None
+        dilution = None
+        for child in elem:
+            tag = tags.get(child.tag)
+            if tag == 'time':
+                time_stamp = parse_time(child.text or '')
+            elif tag == 'hdop' and child.text:
+                dilution = float(child.text)
+        if time_stamp is not None:
+            if max_dilution and dilution and dilution > max_dilution:
+                discards += 1
+            else:
+                times.append(time_stamp)
+                lats.append(float(elem.get('lat')))
+                lons.append(float(elem.get('lon')))
+        # remove this point, and anything before it, from the tree
+        if stack:
+            parent = stack[-1]
+            for idx, child in enumerate(parent):
+                if child is elem:
+                    del parent[:idx + 1]
+                    break
+    return (numpy.frombuffer(times, dtype=numpy.float64),
+            numpy.frombuffer(lats, dtype=numpy.float64),
+            numpy.frombuffer(lons, dtype=numpy.float64), discards)
+
+
+class GpsTrack(object):
+    """Points from one or more GPX files, sorted by time."""
+    def __init__(self):
+        self.times = numpy.empty(0, dtype=numpy.float64)
+        self.lats = numpy.empty(0, dtype=numpy.float64)
+        self.lons = numpy.empty(0, dtype=numpy.float64)
+
+    def __len__(self):
+        return len(self.times)
+
+    def add_file(self, path, max_dilution=None):
+        # returns number of points used and number discarded
+        times, lats, lons, discards = read_gpx(path, max_dilution)
+        self.add_points(times, lats, lons)
+        return len(times), discards
+
+    def add_points(self, times, lats, lons):
+        times = numpy.concatenate((self.times, times))
+        order = numpy.argsort(times, kind='mergesort')
+        self.times = times[order]
+        self.lats = numpy.concatenate((self.lats, lats))[order]
+        self.lons = numpy.concatenate((self.lons, lons))[order]
+
+    def segments(self, max_interval):
+        # return (start, stop) indices of contiguous parts of the track
+        gaps = numpy.flatnonzero(numpy.diff(self.times) > max_interval) + 1
+        bounds = [0] + gaps.tolist() + [len(self.times)]
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def tracks(self, max_interval):
+        # (lats, lons) arrays for each contiguous part
+        return [(self.lats[a:b], self.lons[a:b])
+                for (a, b) in self.segments(max_interval)]
+
+    def interpolate(self, times, max_interval):
+        """Estimate positions at each of an array of times.
+
+        Uses linear interpolation (or extrapolation) between the two
+        nearest points. Returns arrays of latitude & longitude, which
+        are NaN where neither point is within max_interval seconds.
+
+        """
+        times = numpy.asarray(times, dtype=numpy.float64)
+        count = len(self.times)
+        if not count:
+            nan = numpy.full(times.shape, numpy.nan)
+            return nan, nan.copy()
+        if count < 2:
+            lo = hi = numpy.zeros(times.shape, dtype=numpy.intp)
+        else:
+            hi = numpy.clip(numpy.searchsorted(self.times, times, 'right'),
+                            1, count - 1)
+            lo = hi - 1
+        dt_lo = times - self.times[lo]
+        dt_hi = times - self.times[hi]
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            beta = numpy.where(dt_lo == dt_hi, 0.5, dt_lo / (dt_lo - dt_hi))
+        lats = self.lats[lo] + (beta * (self.lats[hi] - self.lats[lo]))
+        lons = self.lons[lo] + (beta * (self.lons[hi] - self.lons[lo]))
+        missing = ((numpy.abs(dt_lo) > max_interval) &
+                   (numpy.abs(dt_hi) > max_interval))
+        lats[missing] = numpy.nan
+        lons[missing] = numpy.nan
+        return lats, lons
+
+
+class TrackPlot(object):
+    """Level of detail control for plotting tracks on a map.
+
+    Points are reduced to at most one per few screen pixels at the
+    current zoom level. When zoomed in, only the part of the track near
+    the visible area is used. The number of points sent to the map is
+    limited to max_points whatever the track length.
+
+    """
+    def __init__(self, tracks, max_points=10000, tolerance=2):
+        self.max_points = max_points
+        self.tolerance = tolerance
+        self.tracks = []
+        for lats, lons in tracks:
+            # convert to Web Mercator "world" coordinates, 0.0 to 1.0
+            x = (lons + 180.0) / 360.0
+            y = numpy.log(numpy.tan(
+                (numpy.radians(numpy.clip(lats, -85.0, 85.0)) / 2.0) +
+                (math.pi / 4.0)))
+            y = (1.0 - (y / math.pi)) / 2.0
+            self.tracks.append((lats, lons, x, y))
+        self.zoom = None
+        self.area = None
+
+    def needs_update(self, zoom, bounds):
+        # is the last plotted data unsuitable for the new view?
+        if zoom != self.zoom:
+            return True
+        if not self.area or not bounds:
+            return False
+        north, east, south, west = bounds
+        return not (self.area[0] >= north and self.area[1] >= east and
+                    self.area[2] <= south and self.area[3] <= west)
+
+    def latlngs(self, zoom, bounds=None):
+        """Get [[lat, lng], ...] lists to plot.
+
+        zoom is the map's zoom level and bounds is the visible area
+        (north, east, south, west). Tracks are clipped to an area three
+        times the size of bounds.
+
+        """
+        self.zoom = zoom
+        self.area = None
+        if bounds and bounds[3] < bounds[1]:
+            north, east, south, west = bounds
+            height = north - south
+            width = east - west
+            self.area = (north + height, east + width,
+                         south - height, west - width)
+        # get parts of tracks near the visible area
+        parts = []
+        for lats, lons, x, y in self.tracks:
+            if not self.area:
+                parts.append((lats, lons, x, y))
+                continue
+            near = ((lats <= self.area[0]) & (lons <= self.area[1]) &
+                    (lats >= self.area[2]) & (lons >= self.area[3]))
+            # include neighbouring points so lines reach the edges
+            near[1:] |= near[:-1].copy()
+            near[:-1] |= near[1:].copy()
+            idx = numpy.flatnonzero(near)
+            breaks = numpy.flatnonzero(numpy.diff(idx) > 1) + 1
+            for run in numpy.split(idx, breaks):
+                if len(run):
+                    a, b = run[0], run[-1] + 1
+                    parts.append((lats[a:b], lons[a:b], x[a:b], y[a:b]))
+        # reduce number of points, more if there are too many
+        tolerance = self.tolerance
+        while True:
+            cell_size = tolerance / (256.0 * (2.0 ** (zoom or 0)))
+            result = []
+            count = 0
+            for lats, lons, x, y in parts:
+                if len(lats) < 2:
+                    continue
+                # keep points that move to a new cell, and the last one
+                cx = numpy.floor(x / cell_size)
+                cy = numpy.floor(y / cell_size)
+                keep = numpy.ones(len(lats), dtype=bool)
+                keep[1:] = (cx[1:] != cx[:-1]) | (cy[1:] != cy[:-1])
+                keep[-1] = True
+                count += numpy.count_nonzero(keep)
+                if count > self.max_points:
+                    break
+                result.append(numpy.round(numpy.column_stack(
+                    (lats[keep], lons[keep])), 6).tolist())
+            else:
+                return result
+            tolerance *= 2
+
+
+def benchmark(points=1000000, images=10000):
+    # time reading and matching a large synthetic GPX file
+    import os
+    import tempfile
+    import time
+    start = calendar.timegm((2020, 1, 1, 0, 0, 0))
+    fd, path = tempfile.mkstemp(suffix='.gpx')
+    with os.fdopen(fd, 'w') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<gpx version="1.1" xmlns="http://www.topografix.com/GPX/1/1">'
+                '<trk><trkseg>\n')
+        for n in range(points):
+            f.write('<trkpt lat="{:.6f}" lon="{:.6f}"><ele>10.0</ele>'
+                    '<time>{}</time><hdop>1.0</hdop></trkpt>\n'.format(
+                        51.0 + (n * 1.0e-6), -1.0 + (n * 1.0e-6),
+                        time.strftime('%Y-%m-%dT%H:%M:%SZ',
+                                      time.gmtime(start + n))))
+        f.write('</trkseg></trk></gpx>\n')
+    try:
+        track = GpsTrack()
+        t0 = time.time()
+        track.add_file(path, 2.5)
+        t1 = time.time()
+        image_times = numpy.random.uniform(start, start + points, images)
+        lats, lons = track.interpolate(image_times, 60.0)
+        t2 = time.time()
+    finally:
+        os.unlink(path)
+    print('read {:d} points in {:.2f} s, matched {:d} images in {:.4f} s'
+          .format(len(track), t1 - t0, images, t2 - t1))
+
+
+if __name__ == '__main__':
+    benchmark()
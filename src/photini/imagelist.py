@@ -20,10 +20,15 @@
 from __future__ import unicode_literals
 
 import six
+import bisect
+from collections import OrderedDict
 from datetime import datetime
 import logging
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
 import os
 from six import BytesIO
+import time
 from six.moves.urllib.parse import unquote
 
 try:
@@ -31,11 +36,13 @@ try:
 except ImportError:
     PIL = None
 
+from photini.cachestore import BaseCacheStore, file_stamp
+from photini.exiv2 import Exiv2Metadata
 from photini.ffmpeg import FFmpeg
 from photini.metadata import Metadata, MultiString
 from photini.pyqt import (
-    Busy, catch_all, image_types, Qt, QtCore, QtGui, QtWidgets, qt_version_info,
-    scale_font, set_symbol_font, video_types)
+    Busy, catch_all, CompactButton, image_types, Qt, QtCore, QtGui,
+    QtWidgets, qt_version_info, scale_font, set_symbol_font, video_types)
 
 logger = logging.getLogger(__name__)
 translate = QtCore.QCoreApplication.translate
@@ -51,47 +58,49 @@ class TableWidget(QtWidgets.QTableWidget):
                             v_hdr.length() + h_hdr.sizeHint().height() + 4)
 
 
-class Image(QtWidgets.QFrame):
-    def __init__(self, path, image_list, thumb_size=80, *arg, **kw):
+class Image(QtCore.QObject):
+    """Per-file state of one image in the image list. Thumbnails are
+    drawn by ThumbnailDelegate, only when they are visible.
+
+    """
+    def __init__(self, path, image_list, metadata=None, *arg, **kw):
         super(Image, self).__init__(*arg, **kw)
         self.path = path
         self.image_list = image_list
         self.name, ext = os.path.splitext(os.path.basename(self.path))
         self.selected = False
-        self.thumb_size = thumb_size
-        # read metadata
-        self.metadata = Metadata(self.path)
+        self.status = ''
+        self._date_key = None
+        # read metadata, unless already read by an ImageLoader
+        if metadata is None:
+            metadata = Metadata(self.path)
+        self.metadata = metadata
         self.metadata.unsaved.connect(self.show_status)
-        self.file_times = (os.path.getatime(self.path),
-                           os.path.getmtime(self.path))
-        # set file type
-        self.file_type = self.metadata.mime_type
-        # sub widgets
-        layout = QtWidgets.QGridLayout()
-        layout.setSpacing(0)
-        layout.setContentsMargins(3, 3, 3, 3)
-        self.setLayout(layout)
-        self.setToolTip(self.path)
-        # label to display image
-        self.image = QtWidgets.QLabel()
-        self.image.setAlignment(Qt.AlignHCenter | Qt.AlignVCenter)
-        layout.addWidget(self.image, 0, 0, 1, 2)
-        # label to display file name
-        self.label = QtWidgets.QLabel()
-        self.label.setAlignment(Qt.AlignRight)
-        scale_font(self.label, 80)
-        layout.addWidget(self.label, 1, 1)
-        # label to display status
-        self.status = QtWidgets.QLabel()
-        self.status.setAlignment(Qt.AlignLeft)
-        set_symbol_font(self.status)
-        scale_font(self.status, 80)
-        layout.addWidget(self.status, 1, 0)
-        self.setFrameStyle(QtWidgets.QFrame.Panel | QtWidgets.QFrame.Plain)
-        self.setObjectName("thumbnail")
-        self.set_selected(False)
+        self.file_times = self.metadata.file_times
         self.show_status(False)
-        self._set_thumb_size(self.thumb_size)
+
+    @property
+    def file_type(self):
+        return self.metadata.mime_type
+
+    def sort_key(self, sort_date):
+        if not sort_date:
+            return self.path
+        if self._date_key is None:
+            result = self.metadata.date_taken
+            if result is None:
+                result = self.metadata.date_digitised
+            if result is None:
+                result = self.metadata.date_modified
+            if result is None:
+                # use file date as last resort
+                result = datetime.fromtimestamp(os.path.getmtime(self.path))
+            else:
+                result = result.datetime
+            # convert result to string and append path so photos with
+            # same time stamp get sorted consistently
+            self._date_key = result.strftime('%Y%m%d%H%M%S%f') + self.path
+        return self._date_key
 
     @QtCore.pyqtSlot()
     @catch_all
@@ -110,7 +119,7 @@ class Image(QtWidgets.QFrame):
     @QtCore.pyqtSlot()
     @catch_all
     def diff_metadata(self):
-        dialog = QtWidgets.QDialog(parent=self)
+        dialog = QtWidgets.QDialog(parent=self.image_list)
         dialog.setWindowTitle(translate('ImageList', 'Metadata differences'))
         dialog.setLayout(QtWidgets.QVBoxLayout())
         table = TableWidget()
@@ -176,7 +185,8 @@ class Image(QtWidgets.QFrame):
         elif changed:
             self.image_list.emit_selection()
 
-    def transform(self, pixmap, orientation, inverse=False):
+    @staticmethod
+    def transform(pixmap, orientation, inverse=False):
         orientation = (orientation or 1) - 1
         if not orientation:
             return pixmap
@@ -201,7 +211,7 @@ class Image(QtWidgets.QFrame):
         # ratios are padded with black
         with Busy():
             # first try using FFmpeg to make thumbnail
-            data, fmt, w, h = self.make_thumb_ffmpeg()
+            data, fmt, w, h = self.make_thumb_ffmpeg(self.path)
             if not data:
                 # use PIL or Qt
                 qt_im = self.get_qt_image()
@@ -216,10 +226,11 @@ class Image(QtWidgets.QFrame):
             # reload thumbnail
             self.load_thumbnail()
 
-    def make_thumb_ffmpeg(self):
+    @staticmethod
+    def make_thumb_ffmpeg(path):
         # get input dimensions
         try:
-            dims = FFmpeg.get_dimensions(self.path)
+            dims = FFmpeg.get_dimensions(path)
         except Exception as ex:
             logger.error(str(ex))
             dims = {}
@@ -236,19 +247,35 @@ class Image(QtWidgets.QFrame):
         w, h = 160, 120
         if width < height:
             w, h = h, w
-        # use ffmpeg to make scaled, padded, single frame JPEG
-        quality = 1
-        while True:
-            try:
-                data = FFmpeg.make_thumbnail(self.path, w, h, skip, quality)
-            except Exception as ex:
-                logger.error(str(ex))
-                return None, 'JPEG', 0, 0
-            if not data or len(data) < 50000:
-                break
-            quality += 1
+        # use ffmpeg to get scaled, padded, single frame
+        try:
+            data = FFmpeg.get_frame(path, w, h, skip)
+        except Exception as ex:
+            logger.error(str(ex))
+            return None, 'JPEG', 0, 0
+        qt_im = QtGui.QImage.fromData(data, 'PPM')
+        if qt_im.isNull():
+            return None, 'JPEG', 0, 0
+        # compress to JPEG, with highest quality that fits in 50 KB
+        lo, hi = 0, 100
+        data = Image.encode_jpeg(qt_im, hi)
+        if len(data) >= 50000:
+            while hi - lo > 1:
+                quality = (lo + hi) // 2
+                if len(Image.encode_jpeg(qt_im, quality)) < 50000:
+                    lo = quality
+                else:
+                    hi = quality
+            data = Image.encode_jpeg(qt_im, lo)
         return data, 'JPEG', w, h
 
+    @staticmethod
+    def encode_jpeg(qt_im, quality):
+        buf = QtCore.QBuffer()
+        buf.open(QtCore.QIODevice.WriteOnly)
+        qt_im.save(buf, 'JPEG', quality)
+        return buf.data().data()
+
     def get_qt_image(self):
         qt_im = QtGui.QImage(self.path)
         if not qt_im or qt_im.isNull():
@@ -321,9 +348,8 @@ class Image(QtWidgets.QFrame):
         qt_im.save(buf, fmt)
         return buf.data().data(), fmt, qt_im.width(), qt_im.height()
 
-    @catch_all
-    def contextMenuEvent(self, event):
-        menu = QtWidgets.QMenu(self)
+    def context_menu(self, parent, pos):
+        menu = QtWidgets.QMenu(parent)
         menu.addAction(translate('ImageList', 'Reload metadata'),
                        self.reload_metadata)
         menu.addAction(translate('ImageList', 'Save metadata'),
@@ -332,29 +358,460 @@ class Image(QtWidgets.QFrame):
                        self.diff_metadata)
         menu.addAction(translate('ImageList', 'Regenerate thumbnail'),
                        self.regenerate_thumbnail)
-        action = menu.exec_(event.globalPos())
+        action = menu.exec_(pos)
+
+    @QtCore.pyqtSlot(bool)
+    @catch_all
+    def show_status(self, changed):
+        # metadata has changed, so date may have changed
+        self._date_key = None
+        status = ''
+        # set 'geotagged' status
+        if self.metadata.latlong:
+            status += six.unichr(0x2690)
+        # set 'unsaved' status
+        if changed:
+            status += six.unichr(0x26A1)
+        self.status = status
+        self.image_list.update_image(self)
+        if changed:
+            self.image_list.new_metadata.emit(True)
+
+    @classmethod
+    def read_thumbnail(cls, metadata, video_frame=False):
+        # QImage (unlike QPixmap) can be used outside the GUI thread,
+        # so this is also used by ImageLoader worker threads
+        qt_im = QtGui.QImage()
+        thumb = metadata.thumbnail
+        if thumb:
+            qt_im.loadFromData(thumb.data)
+        elif video_frame and metadata.mime_type.split('/')[0] == 'video':
+            # make a temporary thumbnail to display
+            data, fmt, w, h = cls.make_thumb_ffmpeg(metadata._path)
+            if data:
+                qt_im.loadFromData(data)
+        if qt_im.isNull():
+            return None
+        return cls.transform(qt_im, metadata.orientation)
+
+    def get_pixmap(self):
+        # called by ThumbnailDelegate when the thumbnail is visible
+        pixmap = self.image_list.pixmap_cache.get(self)
+        if pixmap is None:
+            pixmap = self._make_pixmap()
+        return pixmap
+
+    def load_thumbnail(self, qt_im=None):
+        # called when the thumbnail may have changed
+        self._make_pixmap(qt_im)
+        self.image_list.update_image(self)
+
+    def _make_pixmap(self, qt_im=None):
+        thumb_size = self.image_list.thumb_size
+        thumb_cache = self.image_list.thumb_cache
+        if qt_im is None and not self.metadata.changed():
+            qt_im = thumb_cache.get_thumbnail(self.path, thumb_size)
+        if qt_im is None:
+            qt_im = self.read_thumbnail(self.metadata)
+            if qt_im is not None:
+                if not self.metadata.changed():
+                    thumb_cache.put_thumbnail(self.path, qt_im)
+                qt_im = thumb_cache.scale(qt_im, thumb_size)
+        if qt_im is None or qt_im.isNull():
+            # null pixmap means "no thumbnail"
+            pixmap = QtGui.QPixmap()
+        else:
+            pixmap = QtGui.QPixmap.fromImage(qt_im)
+        self.image_list.pixmap_cache.put(self, pixmap)
+        return pixmap
+
+    def set_selected(self, value):
+        self.selected = value
+        if value:
+            self.image_list.selection.add(self)
+        else:
+            self.image_list.selection.discard(self)
+        self.image_list.update_image(self)
+
+    def get_selected(self):
+        return self.selected
+
+
+class ThumbnailCache(BaseCacheStore):
+    """Store thumbnail images, scaled to each size the user can select,
+    so that they can be displayed without reading the image file's
+    metadata.
+
+    """
+    thumb_sizes = range(80, 181, 20)
+
+    def __init__(self, max_size, *arg, **kw):
+        super(ThumbnailCache, self).__init__('thumbnails', max_size, *arg, **kw)
+
+    @staticmethod
+    def scale(qt_im, thumb_size):
+        return qt_im.scaled(thumb_size, thumb_size,
+                            Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+    def get_thumbnail(self, path, thumb_size):
+        """Return None if nothing is stored, or a (possibly null)
+        QImage.
+
+        """
+        data = self.get('{}:{}'.format(thumb_size, path),
+                        file_stamp(path, sidecar=True))
+        if data is None:
+            return None
+        qt_im = QtGui.QImage()
+        if data:
+            qt_im.loadFromData(data)
+        return qt_im
+
+    def put_thumbnail(self, path, qt_im):
+        # store an empty string if there is no thumbnail
+        stamp = file_stamp(path, sidecar=True)
+        items = []
+        for thumb_size in self.thumb_sizes:
+            data = b''
+            if qt_im is not None:
+                buf = QtCore.QBuffer()
+                buf.open(QtCore.QIODevice.WriteOnly)
+                self.scale(qt_im, thumb_size).save(buf, 'JPEG', 90)
+                data = buf.data().data()
+            items.append(('{}:{}'.format(thumb_size, path), stamp, data))
+        self.put_many(items)
+
+
+class PixmapCache(object):
+    """Least recently used store of thumbnail pixmaps, so that only
+    images that have been displayed recently use any memory.
+
+    """
+    def __init__(self, max_count):
+        self.max_count = max_count
+        self._pixmaps = OrderedDict()
+
+    def get(self, image):
+        pixmap = self._pixmaps.pop(image, None)
+        if pixmap is not None:
+            self._pixmaps[image] = pixmap
+        return pixmap
+
+    def put(self, image, pixmap):
+        self._pixmaps.pop(image, None)
+        self._pixmaps[image] = pixmap
+        while len(self._pixmaps) > self.max_count:
+            self._pixmaps.popitem(last=False)
+
+    def remove(self, image):
+        self._pixmaps.pop(image, None)
+
+    def clear(self):
+        self._pixmaps.clear()
+
+
+class ImageListModel(QtCore.QAbstractListModel):
+    """Read-only Qt model of the ImageList's list of images.
+
+    The model also keeps a path to image dict and an image to position
+    dict, so that looking up an image doesn't need a search of the list.
+    The sort key of each image is stored when it's added, so new images
+    can be inserted in order without sorting the whole list again.
+    Images whose keys change are re-sorted in one go.
+
+    """
+    def __init__(self, images, sort_key, *arg, **kw):
+        super(ImageListModel, self).__init__(*arg, **kw)
+        self.images = images
+        self.sort_key = sort_key
+        self.keys = [sort_key(x) for x in self.images]
+        self.paths = {}
+        self._positions = None
+        self._resort_pending = False
+        self._reindex()
+
+    def _reindex(self):
+        self.paths = dict((x.path, x) for x in self.images)
+        self._positions = None
+
+    def get_image(self, path):
+        return self.paths.get(path)
+
+    def position(self, image):
+        if self._positions is None:
+            self._positions = dict(
+                (x, i) for (i, x) in enumerate(self.images))
+        return self._positions[image]
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.images)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.images):
+            return None
+        image = self.images[index.row()]
+        if role == Qt.DisplayRole:
+            return image.name
+        if role == Qt.ToolTipRole:
+            return image.path
+        return None
+
+    def insert_images(self, images):
+        # keys must be in order before bisecting
+        self._resort()
+        for image in images:
+            key = self.sort_key(image)
+            row = bisect.bisect_right(self.keys, key)
+            self.beginInsertRows(QtCore.QModelIndex(), row, row)
+            self.keys.insert(row, key)
+            self.images.insert(row, image)
+            self.paths[image.path] = image
+            self.endInsertRows()
+        self._positions = None
+
+    def update_image(self, image):
+        # store the image's new sort key if it has changed, e.g. after
+        # its date has been edited. An edit may change many images, so
+        # the list is re-sorted once, after control returns to the
+        # event loop.
+        if self.paths.get(image.path) is not image:
+            return
+        row = self.position(image)
+        key = self.sort_key(image)
+        if key == self.keys[row]:
+            return
+        self.keys[row] = key
+        if not self._resort_pending:
+            self._resort_pending = True
+            QtCore.QTimer.singleShot(0, self._resort)
+
+    @QtCore.pyqtSlot()
+    @catch_all
+    def _resort(self):
+        if not self._resort_pending:
+            return
+        self._resort_pending = False
+        self._set_order(sorted(zip(self.keys, self.images),
+                               key=lambda x: x[0]))
+
+    def _set_order(self, items):
+        # items is a sorted list of (key, image)
+        self.layoutAboutToBeChanged.emit()
+        old_indexes = self.persistentIndexList()
+        old_images = [self.images[x.row()] for x in old_indexes]
+        self.keys[:] = [x[0] for x in items]
+        self.images[:] = [x[1] for x in items]
+        self._positions = None
+        self.changePersistentIndexList(
+            old_indexes, [self.index(self.position(x)) for x in old_images])
+        self.layoutChanged.emit()
+
+    def remove_images(self, images):
+        self.beginResetModel()
+        images = set(images)
+        # modify lists in place, as ImageList has a reference to them
+        keep = [i for (i, x) in enumerate(self.images) if x not in images]
+        self.images[:] = [self.images[i] for i in keep]
+        self.keys[:] = [self.keys[i] for i in keep]
+        self._reindex()
+        self.endResetModel()
+
+    def sort_images(self, sort_key):
+        self.sort_key = sort_key
+        self._resort_pending = False
+        self._set_order(sorted(((sort_key(x), x) for x in self.images),
+                               key=lambda x: x[0]))
+
+
+class ThumbnailDelegate(QtWidgets.QStyledItemDelegate):
+    """Draw an image's thumbnail, file name and status, with a border
+    to show if it's selected.
+
+    """
+    margin = 3
+
+    def __init__(self, image_list, *arg, **kw):
+        super(ThumbnailDelegate, self).__init__(*arg, **kw)
+        self.image_list = image_list
+        # use temporary labels to get fonts
+        label = QtWidgets.QLabel()
+        scale_font(label, 80)
+        self.label_font = label.font()
+        set_symbol_font(label)
+        scale_font(label, 80)
+        self.status_font = label.font()
+        self.label_height = QtGui.QFontMetrics(self.label_font).height()
+        self.no_thumb_text = translate('ImageList', 'No\nthumbnail\nin file')
+
+    def item_size(self):
+        thumb_size = self.image_list.thumb_size
+        return QtCore.QSize(
+            thumb_size + (self.margin * 2),
+            thumb_size + self.label_height + (self.margin * 2))
+
+    @catch_all
+    def sizeHint(self, option, index):
+        return self.item_size()
+
+    @catch_all
+    def paint(self, painter, option, index):
+        image = self.image_list.images[index.row()]
+        thumb_size = self.image_list.thumb_size
+        rect = option.rect
+        x = rect.x() + self.margin
+        y = rect.y() + self.margin
+        painter.save()
+        # border
+        if image.selected:
+            pen = QtGui.QPen(Qt.red)
+        else:
+            pen = QtGui.QPen(Qt.gray)
+        pen.setWidth(2)
+        painter.setPen(pen)
+        painter.drawRect(rect.adjusted(1, 1, -1, -1))
+        # thumbnail
+        thumb_rect = QtCore.QRect(x, y, thumb_size, thumb_size)
+        pixmap = image.get_pixmap()
+        painter.setPen(option.palette.color(QtGui.QPalette.WindowText))
+        if pixmap.isNull():
+            painter.setFont(option.font)
+            painter.drawText(thumb_rect, Qt.AlignCenter, self.no_thumb_text)
+        else:
+            painter.drawPixmap(
+                x + ((thumb_size - pixmap.width()) // 2),
+                y + ((thumb_size - pixmap.height()) // 2), pixmap)
+        # status and file name
+        label_rect = QtCore.QRect(
+            x, y + thumb_size, thumb_size, self.label_height)
+        painter.setFont(self.status_font)
+        status_width = painter.fontMetrics().width(image.status)
+        painter.drawText(label_rect, Qt.AlignLeft, image.status)
+        painter.setFont(self.label_font)
+        elided_name = painter.fontMetrics().elidedText(
+            image.name, Qt.ElideLeft, thumb_size - status_width)
+        painter.drawText(label_rect, Qt.AlignRight, elided_name)
+        painter.restore()
+
+
+class ThumbsView(QtWidgets.QListView):
+    """Multi-row fixed-width or single-row variable-width grid of
+    thumbnails, according to height. Only the visible thumbnails are
+    drawn.
+
+    """
+    dropped_images = QtCore.pyqtSignal(list)
+
+    def __init__(self, image_list, *arg, **kw):
+        super(ThumbsView, self).__init__(*arg, **kw)
+        self.image_list = image_list
+        self.drag_image = None
+        self.drag_start_pos = None
+        self.multi_row = None
+        self.setSelectionMode(QtWidgets.QAbstractItemView.NoSelection)
+        self.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.setUniformItemSizes(True)
+        self.setWrapping(True)
+        self.setResizeMode(QtWidgets.QListView.Adjust)
+        self.setSpacing(0)
+        self.setVerticalScrollMode(QtWidgets.QAbstractItemView.ScrollPerPixel)
+        self.setHorizontalScrollMode(
+            QtWidgets.QAbstractItemView.ScrollPerPixel)
+        self.setAcceptDrops(True)
+        self.viewport().setAcceptDrops(True)
+        self.delegate = ThumbnailDelegate(image_list, parent=self)
+        self.setItemDelegate(self.delegate)
+        self.set_multi_row(True)
+        self.new_thumb_size()
+
+    def new_thumb_size(self):
+        self.setGridSize(self.delegate.item_size())
+        self._adjust_rows(self.size().height())
+
+    def set_multi_row(self, multi_row):
+        if multi_row:
+            self.setMinimumHeight(0)
+        else:
+            scrollbar = self.horizontalScrollBar()
+            self.setMinimumHeight(self.gridSize().height() +
+                                  scrollbar.sizeHint().height() +
+                                  (self.frameWidth() * 2))
+        if multi_row == self.multi_row:
+            return
+        self.multi_row = multi_row
+        if multi_row:
+            self.setFlow(QtWidgets.QListView.LeftToRight)
+            self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+            self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOn)
+        else:
+            # one item per column gives a single horizontal row
+            self.setFlow(QtWidgets.QListView.TopToBottom)
+            self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOn)
+            self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+
+    def _adjust_rows(self, height):
+        height -= self.frameWidth() * 2
+        scrollbar = self.horizontalScrollBar()
+        if scrollbar.isVisible():
+            height += scrollbar.height()
+        self.set_multi_row(height > self.gridSize().height() +
+                           scrollbar.sizeHint().height())
+
+    @catch_all
+    def resizeEvent(self, event):
+        super(ThumbsView, self).resizeEvent(event)
+        self._adjust_rows(event.size().height())
+
+    def image_at(self, pos):
+        index = self.indexAt(pos)
+        if not index.isValid():
+            return None
+        return self.image_list.images[index.row()]
+
+    def scroll_to(self, image):
+        row = self.model().position(image)
+        self.scrollTo(self.model().index(row, 0))
+
+    def update_image(self, image):
+        self.viewport().update()
+
+    @catch_all
+    def contextMenuEvent(self, event):
+        image = self.image_at(event.pos())
+        if image:
+            image.context_menu(self, event.globalPos())
 
     @catch_all
     def mousePressEvent(self, event):
+        image = self.image_at(event.pos())
+        self.drag_image = image
+        if not image:
+            self.image_list.clear_selection()
+            return
         if event.button() == Qt.LeftButton:
             self.drag_start_pos = event.pos()
         if event.modifiers() == Qt.ControlModifier:
-            self.image_list.select_image(self, multiple_selection=True)
+            self.image_list.select_image(image, multiple_selection=True)
         elif event.modifiers() == Qt.ShiftModifier:
-            self.image_list.select_image(self, extend_selection=True)
-        elif not self.get_selected():
+            self.image_list.select_image(image, extend_selection=True)
+        elif not image.get_selected():
             # don't clear selection in case we're about to drag
-            self.image_list.select_image(self)
+            self.image_list.select_image(image)
 
     @catch_all
     def mouseReleaseEvent(self, event):
+        if not self.drag_image:
+            return
         if event.modifiers() not in (Qt.ControlModifier, Qt.ShiftModifier):
             # clear any multiple selection
-            self.image_list.select_image(self)
+            self.image_list.select_image(self.drag_image)
+        self.drag_image = None
 
     @catch_all
     def mouseMoveEvent(self, event):
-        if not self.image_list.drag_icon:
+        if not (self.image_list.drag_icon and self.drag_image and
+                self.drag_start_pos):
             return
         if ((event.pos() - self.drag_start_pos).manhattanLength() <
                                     QtWidgets.QApplication.startDragDistance()):
@@ -389,104 +846,15 @@ class Image(QtWidgets.QFrame):
         mimeData = QtCore.QMimeData()
         mimeData.setData(DRAG_MIMETYPE, repr(paths).encode('utf-8'))
         drag.setMimeData(mimeData)
+        self.drag_image = None
         dropAction = drag.exec_(Qt.CopyAction)
 
     @catch_all
     def mouseDoubleClickEvent(self, event):
-        QtGui.QDesktopServices.openUrl(QtCore.QUrl.fromLocalFile(self.path))
-
-    @QtCore.pyqtSlot(bool)
-    @catch_all
-    def show_status(self, changed):
-        status = ''
-        # set 'geotagged' status
-        if self.metadata.latlong:
-            status += six.unichr(0x2690)
-        # set 'unsaved' status
-        if changed:
-            status += six.unichr(0x26A1)
-        self.status.setText(status)
-        self._elide_name()
-        if changed:
-            self.image_list.new_metadata.emit(True)
-
-    def _elide_name(self):
-        self.status.adjustSize()
-        elided_name = self.label.fontMetrics().elidedText(
-            self.name, Qt.ElideLeft, self.thumb_size - self.status.width())
-        self.label.setText(elided_name)
-
-    def _set_thumb_size(self, thumb_size):
-        self.thumb_size = thumb_size
-        self.image.setFixedSize(self.thumb_size, self.thumb_size)
-        self._elide_name()
-
-    def set_thumb_size(self, thumb_size):
-        self._set_thumb_size(thumb_size)
-        self.load_thumbnail()
-
-    def load_thumbnail(self):
-        pixmap = QtGui.QPixmap()
-        thumb = self.metadata.thumbnail
-        if thumb:
-            pixmap.loadFromData(thumb.data)
-        if pixmap.isNull():
-            self.image.setText(translate('ImageList', 'No\nthumbnail\nin file'))
-            return
-        pixmap = self.transform(pixmap, self.metadata.orientation)
-        self.image.setPixmap(
-            pixmap.scaled(self.thumb_size, self.thumb_size,
-                          Qt.KeepAspectRatio, Qt.SmoothTransformation))
-
-    def set_selected(self, value):
-        self.selected = value
-        if self.selected:
-            self.setStyleSheet("#thumbnail {border: 2px solid red}")
-        else:
-            self.setStyleSheet("#thumbnail {border: 2px solid grey}")
-
-    def get_selected(self):
-        return self.selected
-
-
-class ScrollArea(QtWidgets.QScrollArea):
-    dropped_images = QtCore.pyqtSignal(list)
-
-    def __init__(self, parent=None):
-        super(ScrollArea, self).__init__(parent)
-        self.multi_row = None
-        self.set_multi_row(True)
-        self.setWidgetResizable(True)
-        self.setAcceptDrops(True)
-        widget = QtWidgets.QWidget()
-        self.thumbs = ThumbsLayout(scroll_area=self)
-        widget.setLayout(self.thumbs)
-        self.setWidget(widget)
-        # adopt some layout methods
-        self.add_widget = self.thumbs.addWidget
-        self.remove_widget = self.thumbs.removeWidget
-
-    def set_multi_row(self, multi_row):
-        if multi_row:
-            self.setMinimumHeight(0)
-        else:
-            scrollbar = self.horizontalScrollBar()
-            self.setMinimumHeight(
-                self.thumbs.sizeHint().height() + scrollbar.height())
-        if multi_row == self.multi_row:
-            return
-        self.multi_row = multi_row
-        if multi_row:
-            self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
-            self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOn)
-        else:
-            self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOn)
-            self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
-
-    def ensureWidgetVisible(self, widget):
-        left, top, right, bottom = self.thumbs.getContentsMargins()
-        super(ScrollArea, self).ensureWidgetVisible(
-            widget, max(left, right), max(top, bottom))
+        image = self.image_at(event.pos())
+        if image:
+            QtGui.QDesktopServices.openUrl(
+                QtCore.QUrl.fromLocalFile(image.path))
 
     @catch_all
     def dropEvent(self, event):
@@ -502,101 +870,150 @@ class ScrollArea(QtWidgets.QScrollArea):
             event.acceptProposedAction()
 
     @catch_all
-    def resizeEvent(self, event):
-        super(ScrollArea, self).resizeEvent(event)
-        width = event.size().width()
-        height = event.size().height()
-        if not self.multi_row:
-            scrollbar = self.verticalScrollBar()
-            width -= scrollbar.width()
-        scrollbar = self.horizontalScrollBar()
-        if not scrollbar.isVisible():
-            height -= scrollbar.height()
-        self.thumbs.set_viewport_size(QtCore.QSize(width, height))
-
-
-class ThumbsLayout(QtWidgets.QLayout):
-    """Multi-row fixed-width or single-row variable-width grid of
-    thumbnail widgets, according to height.
-
-    """
-    def __init__(self, scroll_area=None, **kw):
-        super(ThumbsLayout, self).__init__(**kw)
-        self.scroll_area = scroll_area
-        self.item_list = []
-        self.viewport_size = QtCore.QSize()
-        self._do_layout(QtCore.QPoint(0, 0))
+    def dragMoveEvent(self, event):
+        if event.mimeData().hasFormat('text/uri-list'):
+            event.acceptProposedAction()
 
-    def addItem(self, item):
-        self.item_list.append(item)
 
-    def horizontalSpacing(self):
-        return 0
+class ImageLoader(QtCore.QObject):
+    """Read the metadata and thumbnail of each file in a list, using a
+    pool of worker threads.
 
-    def verticalSpacing(self):
-        return 0
+    Results are passed back to the GUI thread in batches, to limit the
+    number of signals. Each result is a (path, metadata, thumbnail)
+    tuple.
 
-    def count(self):
-        return len(self.item_list)
+    """
+    batch_loaded = QtCore.pyqtSignal(list)
+    progress = QtCore.pyqtSignal(int, int)
+    finished = QtCore.pyqtSignal()
+
+    def __init__(self, path_list, thumb_size, thumb_cache, threads,
+                 prefetch=('latlong',), *args, **kwds):
+        super(ImageLoader, self).__init__(*args, **kwds)
+        self.path_list = path_list
+        self.prefetch = prefetch
+        self.thumb_size = thumb_size
+        self.thumb_cache = thumb_cache
+        self.threads = threads
+        self.gui_thread = QtWidgets.QApplication.instance().thread()
+        self.running = True
 
-    def itemAt(self, idx):
-        if idx < 0 or idx >= len(self.item_list):
+    @QtCore.pyqtSlot()
+    @catch_all
+    def start(self):
+        total = len(self.path_list)
+        count = 0
+        batch = []
+        next_batch = time.time() + 0.2
+        pool = ThreadPool(self.threads)
+        try:
+            for result in pool.imap_unordered(self.load, self.path_list):
+                if not self.running:
+                    break
+                count += 1
+                if result:
+                    batch.append(result)
+                if time.time() >= next_batch:
+                    self.batch_loaded.emit(batch)
+                    self.progress.emit(count, total)
+                    batch = []
+                    next_batch = time.time() + 0.2
+        finally:
+            # running tasks are allowed to finish, others are discarded
+            pool.terminate()
+        if batch:
+            self.batch_loaded.emit(batch)
+        self.progress.emit(count, total)
+        self.thumb_cache.evict()
+        self.finished.emit()
+
+    def load(self, path):
+        if not self.running:
             return None
-        return self.item_list[idx]
-
-    def takeAt(self, idx):
-        if idx < 0 or idx >= len(self.item_list):
+        try:
+            metadata = Metadata(path)
+            # read (in this thread) the values needed to display and
+            # sort thumbnails, other metadata is read when it's needed
+            for name in self.prefetch:
+                getattr(metadata, name)
+            thumb = self.thumb_cache.get_thumbnail(path, self.thumb_size)
+            if thumb is None:
+                thumb = Image.read_thumbnail(metadata, video_frame=True)
+                self.thumb_cache.put_thumbnail(path, thumb)
+                if thumb is not None:
+                    thumb = self.thumb_cache.scale(thumb, self.thumb_size)
+        except Exception as ex:
+            logger.exception(ex)
             return None
-        return self.item_list.pop(idx)
+        # metadata object was created in this worker thread
+        metadata.moveToThread(self.gui_thread)
+        return path, metadata, thumb
 
-    def expandingDirections(self):
-        return 0
 
-    def hasHeightForWidth(self):
-        return False
+class ImageSaver(QtCore.QObject):
+    """Save the metadata of a list of images, using a pool of worker
+    threads.
 
-    def setGeometry(self, rect):
-        super(ThumbsLayout, self).setGeometry(rect)
-        self._do_layout(rect.topLeft())
+    Cancelling stops any more files being started, but files already
+    being written are finished so they are left in a consistent state.
 
-    def sizeHint(self):
-        return self.size_hint
-
-    def minimumSize(self):
-        return self.size_hint
-
-    def set_viewport_size(self, size):
-        self.viewport_size = size
-        self._do_layout(QtCore.QPoint(0, 0))
-
-    def _do_layout(self, origin):
-        left, top, right, bottom = self.getContentsMargins()
-        width_hint = left + right
-        height_hint = top + bottom
-        if self.item_list:
-            item_size = self.item_list[0].sizeHint()
-            item_h = item_size.height()
-            item_w = item_size.width()
-            multi_row = self.viewport_size.height() - height_hint > item_h
-            if multi_row:
-                columns = max(
-                    (self.viewport_size.width() - width_hint) // item_w, 1)
-                rows = (len(self.item_list) + columns - 1) // columns
-            else:
-                columns = len(self.item_list)
-                rows = 1
-            width_hint += columns * item_w
-            height_hint += rows * item_h
-        self.size_hint = QtCore.QSize(width_hint, height_hint)
-        if not self.item_list:
-            return
-        x = origin.x() + left
-        y = origin.y() + top
-        for n, item in enumerate(self.item_list):
-            i, j = n % columns, n // columns
-            item.setGeometry(QtCore.QRect(
-                QtCore.QPoint(x + (i * item_w), y + (j * item_h)), item_size))
-        self.scroll_area.set_multi_row(multi_row)
+    """
+    progress = QtCore.pyqtSignal(int, int)
+    finished = QtCore.pyqtSignal(list)
+
+    def __init__(self, jobs, options, threads, *args, **kwds):
+        super(ImageSaver, self).__init__(*args, **kwds)
+        self.jobs = jobs
+        self.options = options
+        self.threads = threads
+        self.running = True
+
+    @QtCore.pyqtSlot()
+    @catch_all
+    def start(self):
+        failed = []
+        count = 0
+        total = len(self.jobs)
+        write_time = 0.0
+        verify_time = 0.0
+        start = time.time()
+        pool = ThreadPool(self.threads)
+        try:
+            for result in pool.imap_unordered(self.save, self.jobs):
+                if result is None:
+                    continue
+                path, OK, times = result
+                count += 1
+                write_time += times[0]
+                verify_time += times[1]
+                if not OK:
+                    failed.append(path)
+                self.progress.emit(count, total)
+        finally:
+            # wait for files being written, remaining jobs do nothing
+            pool.close()
+            pool.join()
+        logger.info(
+            'Saved %d files in %.1fs (write %.1fs, verify %.1fs)',
+            count, time.time() - start, write_time, verify_time)
+        self.finished.emit(failed)
+
+    def save(self, job):
+        if not self.running:
+            return None
+        path, metadata, file_times, verify = job
+        try:
+            OK = metadata.save(
+                file_times=file_times, verify=verify, **self.options)
+        except Exception as ex:
+            logger.exception(ex)
+            OK = False
+        times = (getattr(metadata, 'write_time', 0.0),
+                 getattr(metadata, 'verify_time', 0.0))
+        logger.debug('%s: write %.3fs, verify %.3fs (%s)',
+                     os.path.basename(path), times[0], times[1], verify)
+        return path, OK, times
 
 
 class ImageList(QtWidgets.QWidget):
@@ -608,12 +1025,22 @@ class ImageList(QtWidgets.QWidget):
     def __init__(self, parent=None):
         super(ImageList, self).__init__(parent)
         self.app = QtWidgets.QApplication.instance()
+        self.app.aboutToQuit.connect(self.shutdown)
         self.drag_icon = None
         self.images = []
+        self.selection = set()
+        self.image_loader = None
+        self.image_saver = None
+        self.open_queue = []
+        self.thumb_cache = ThumbnailCache(1000000 * int(
+            self.app.config_store.get('files', 'thumb_cache_size', '200')))
+        FFmpeg.disk_cache_size = 1000000 * int(
+            self.app.config_store.get('files', 'probe_cache_size', '20'))
         self.last_selected = None
         self.selection_anchor = None
         self.thumb_size = int(
             self.app.config_store.get('controls', 'thumb_size', '80'))
+        self.pixmap_cache = PixmapCache(1000)
         layout = QtWidgets.QGridLayout()
         layout.setSpacing(0)
         layout.setRowStretch(0, 1)
@@ -621,23 +1048,26 @@ class ImageList(QtWidgets.QWidget):
         self.setLayout(layout)
         layout.setContentsMargins(0, 0, 0, 0)
         # thumbnail display
-        self.scroll_area = ScrollArea()
-        self.scroll_area.dropped_images.connect(self.open_file_list)
-        layout.addWidget(self.scroll_area, 0, 0, 1, 6)
+        self.model = ImageListModel(
+            self.images, self._sort_key(), parent=self)
+        self.thumbs_view = ThumbsView(self)
+        self.thumbs_view.setModel(self.model)
+        self.thumbs_view.dropped_images.connect(self.open_file_list)
+        layout.addWidget(self.thumbs_view, 0, 0, 1, 6)
         QtWidgets.QShortcut(QtGui.QKeySequence.MoveToPreviousChar,
-                        self.scroll_area, self.move_to_prev_thumb)
+                        self.thumbs_view, self.move_to_prev_thumb)
         QtWidgets.QShortcut(QtGui.QKeySequence.MoveToNextChar,
-                        self.scroll_area, self.move_to_next_thumb)
+                        self.thumbs_view, self.move_to_next_thumb)
         QtWidgets.QShortcut(QtGui.QKeySequence.MoveToStartOfLine,
-                        self.scroll_area, self.move_to_first_thumb)
+                        self.thumbs_view, self.move_to_first_thumb)
         QtWidgets.QShortcut(QtGui.QKeySequence.MoveToEndOfLine,
-                        self.scroll_area, self.move_to_last_thumb)
+                        self.thumbs_view, self.move_to_last_thumb)
         QtWidgets.QShortcut(QtGui.QKeySequence.SelectPreviousChar,
-                        self.scroll_area, self.select_prev_thumb)
+                        self.thumbs_view, self.select_prev_thumb)
         QtWidgets.QShortcut(QtGui.QKeySequence.SelectNextChar,
-                        self.scroll_area, self.select_next_thumb)
+                        self.thumbs_view, self.select_next_thumb)
         QtWidgets.QShortcut(QtGui.QKeySequence.SelectAll,
-                        self.scroll_area, self.select_all)
+                        self.thumbs_view, self.select_all)
         # sort key selector
         layout.addWidget(QtWidgets.QLabel(self.tr('sort by: ')), 1, 0)
         self.sort_name = QtWidgets.QRadioButton(self.tr('file name'))
@@ -650,6 +1080,19 @@ class ImageList(QtWidgets.QWidget):
             self.sort_date.setChecked(True)
         else:
             self.sort_name.setChecked(True)
+        # opening progress & cancel button
+        progress = QtWidgets.QHBoxLayout()
+        progress.setContentsMargins(0, 0, 0, 0)
+        progress.addStretch(1)
+        self.open_progress = QtWidgets.QProgressBar()
+        self.open_progress.setFormat(self.tr('opening %v/%m'))
+        self.open_progress.hide()
+        progress.addWidget(self.open_progress)
+        self.open_cancel = CompactButton(self.tr('cancel'))
+        self.open_cancel.clicked.connect(self.cancel_opening)
+        self.open_cancel.hide()
+        progress.addWidget(self.open_cancel)
+        layout.addLayout(progress, 1, 3)
         # size selector
         layout.addWidget(QtWidgets.QLabel(self.tr('thumbnail size: ')), 1, 4)
         self.size_slider = QtWidgets.QSlider(Qt.Horizontal)
@@ -668,21 +1111,20 @@ class ImageList(QtWidgets.QWidget):
         self.drag_hotspot = hotspot
 
     def get_image(self, path):
-        for image in self.images:
-            if image.path == path:
-                return image
-        return None
+        return self.model.get_image(path)
 
     def get_images(self):
         return self.images
 
-    @catch_all
-    def mousePressEvent(self, event):
-        if self.scroll_area.underMouse():
-            self._clear_selection()
-            self.last_selected = None
-            self.selection_anchor = None
-            self.emit_selection()
+    def update_image(self, image):
+        self.model.update_image(image)
+        self.thumbs_view.update_image(image)
+
+    def clear_selection(self):
+        self._clear_selection()
+        self.last_selected = None
+        self.selection_anchor = None
+        self.emit_selection()
 
     @QtCore.pyqtSlot(bool)
     @catch_all
@@ -715,10 +1157,94 @@ class ImageList(QtWidgets.QWidget):
     @QtCore.pyqtSlot(list)
     @catch_all
     def open_file_list(self, path_list):
-        with Busy():
-            for path in path_list:
-                self.open_file(path)
-        self.done_opening(path_list[-1])
+        queued = set(self.open_queue)
+        for path in path_list:
+            path = os.path.abspath(path)
+            if not os.path.isfile(path):
+                continue
+            if path in queued or self.get_image(path):
+                # already opened (or opening) this path
+                continue
+            self.open_queue.append(path)
+            queued.add(path)
+        if not self.image_loader:
+            self._start_loader()
+
+    def _start_loader(self):
+        if not self.open_queue:
+            return
+        path_list = self.open_queue
+        self.open_queue = []
+        threads = int(self.app.config_store.get(
+            'files', 'open_threads', str(min(cpu_count(), 8))))
+        prefetch = ['latlong']
+        if self.sort_date.isChecked():
+            prefetch += ['date_taken', 'date_digitised', 'date_modified']
+        # read files in a separate thread, so GUI can continue
+        self.image_loader = ImageLoader(
+            path_list, self.thumb_size, self.thumb_cache, max(threads, 1),
+            prefetch=prefetch)
+        self.image_loader_thread = QtCore.QThread(self)
+        self.image_loader.moveToThread(self.image_loader_thread)
+        self.image_loader.batch_loaded.connect(self._images_loaded)
+        self.image_loader.progress.connect(self._loader_progress)
+        self.image_loader.finished.connect(self._loader_finished)
+        self.image_loader_thread.started.connect(self.image_loader.start)
+        self.open_progress.setRange(0, len(path_list))
+        self.open_progress.setValue(0)
+        self.open_progress.show()
+        self.open_cancel.show()
+        self.last_opened = path_list[-1]
+        self.image_loader_thread.start()
+
+    @QtCore.pyqtSlot(list)
+    @catch_all
+    def _images_loaded(self, batch):
+        new_images = []
+        for path, metadata, thumb in batch:
+            if self.get_image(path):
+                continue
+            image = Image(path, self, metadata=metadata)
+            new_images.append(image)
+            if thumb is not None and (
+                    self.thumb_size == self.image_loader.thumb_size):
+                self.pixmap_cache.put(image, QtGui.QPixmap.fromImage(thumb))
+        if new_images:
+            self.model.insert_images(new_images)
+            self.thumbs_view.scroll_to(new_images[-1])
+
+    @QtCore.pyqtSlot(int, int)
+    @catch_all
+    def _loader_progress(self, count, total):
+        self.open_progress.setValue(count)
+
+    @QtCore.pyqtSlot()
+    @catch_all
+    def _loader_finished(self):
+        self.image_loader_thread.quit()
+        self.image_loader_thread.wait()
+        self.image_loader = None
+        if self.open_queue:
+            self._start_loader()
+            return
+        self.open_progress.hide()
+        self.open_cancel.hide()
+        self.done_opening(self.last_opened)
+
+    @QtCore.pyqtSlot()
+    @catch_all
+    def cancel_opening(self):
+        self.open_queue = []
+        if self.image_loader:
+            self.image_loader.running = False
+
+    @QtCore.pyqtSlot()
+    @catch_all
+    def shutdown(self):
+        if self.image_loader:
+            self.image_loader.running = False
+            self.image_loader_thread.quit()
+            self.image_loader_thread.wait()
 
     def open_file(self, path):
         path = os.path.abspath(path)
@@ -727,29 +1253,19 @@ class ImageList(QtWidgets.QWidget):
         if self.get_image(path):
             # already opened this path
             return
-        image = Image(path, self, thumb_size=self.thumb_size)
-        self.images.append(image)
-        self.show_thumbnail(image)
+        image = Image(path, self)
+        self.model.insert_images([image])
+        self.thumbs_view.scroll_to(image)
 
     def done_opening(self, path):
         self.app.config_store.set('paths', 'images', os.path.dirname(path))
-        self._sort_thumbnails()
+        # new images have already been inserted in sort order
+        self.image_list_changed.emit()
 
-    def _date_key(self, image):
-        result = image.metadata.date_taken
-        if result is None:
-            result = image.metadata.date_digitised
-        if result is None:
-            result = image.metadata.date_modified
-        if result is None:
-            # use file date as last resort
-            result = datetime.fromtimestamp(os.path.getmtime(image.path))
-        else:
-            result = result.datetime
-        # convert result to string and append path so photos with same
-        # time stamp get sorted consistently
-        result = result.strftime('%Y%m%d%H%M%S%f') + image.path
-        return result
+    def _sort_key(self):
+        sort_date = eval(
+            self.app.config_store.get('controls', 'sort_date', 'False'))
+        return lambda x: x.sort_key(sort_date)
 
     @QtCore.pyqtSlot()
     @catch_all
@@ -761,27 +1277,11 @@ class ImageList(QtWidgets.QWidget):
         sort_date = self.sort_date.isChecked()
         self.app.config_store.set('controls', 'sort_date', str(sort_date))
         with Busy():
-            if sort_date:
-                self.images.sort(key=self._date_key)
-            else:
-                self.images.sort(key=lambda x: x.path)
-            for image in self.images:
-                self.show_thumbnail(image, False)
+            self.model.sort_images(self._sort_key())
         if self.last_selected:
-            self.app.processEvents()
-            self.scroll_area.ensureWidgetVisible(self.last_selected)
+            self.thumbs_view.scroll_to(self.last_selected)
         self.image_list_changed.emit()
 
-    def show_thumbnail(self, image, live=True):
-        self.scroll_area.add_widget(image)
-        if live:
-            self.app.processEvents()
-        image.load_thumbnail()
-        if live:
-            self.app.processEvents()
-            self.scroll_area.ensureWidgetVisible(image)
-            self.app.processEvents()
-
     def close_files(self, all_files):
         if not self.unsaved_files_dialog(all_files=all_files):
             return
@@ -791,10 +1291,11 @@ class ImageList(QtWidgets.QWidget):
             close_list = self.get_selected_images()
         if not close_list:
             return
-        idx = self.images.index(close_list[0])
+        idx = self.model.position(close_list[0])
+        self.model.remove_images(close_list)
+        self.selection.difference_update(close_list)
         for image in close_list:
-            self.images.remove(image)
-            self.scroll_area.remove_widget(image)
+            self.pixmap_cache.remove(image)
             image.setParent(None)
         if 0 <= idx < len(self.images):
             self.select_image(self.images[idx])
@@ -816,17 +1317,46 @@ class ImageList(QtWidgets.QWidget):
             self.app.config_store.get('files', 'force_iptc', 'False'))
         keep_time = eval(
             self.app.config_store.get('files', 'preserve_timestamps', 'False'))
+        threads = int(self.app.config_store.get(
+            'files', 'save_threads', str(min(cpu_count(), 4))))
+        verify = self.app.config_store.get('files', 'verify', 'full')
+        verify_sample = max(int(self.app.config_store.get(
+            'files', 'verify_sample', '10')), 1)
         if not images:
             images = self.images
-        with Busy():
-            for image in images:
-                if keep_time:
-                    file_times = image.file_times
+        jobs = []
+        for image in images:
+            if not image.metadata.changed():
+                continue
+            if keep_time:
+                file_times = image.file_times
+            else:
+                file_times = None
+            if verify == 'sampled':
+                # fully verify every Nth file, check the rest are rewritten
+                if len(jobs) % verify_sample == 0:
+                    mode = 'full'
                 else:
-                    file_times = None
-                image.metadata.save(
-                    if_mode=if_mode, sc_mode=sc_mode,
-                    force_iptc=force_iptc, file_times=file_times)
+                    mode = 'stat'
+            elif verify in Exiv2Metadata.verify_modes:
+                mode = verify
+            else:
+                mode = 'full'
+            jobs.append((image.path, image.metadata, file_times, mode))
+        if jobs:
+            failed = self._run_saver(jobs, {
+                'if_mode': if_mode, 'sc_mode': sc_mode,
+                'force_iptc': force_iptc}, max(threads, 1))
+            if failed:
+                dialog = QtWidgets.QMessageBox(self)
+                dialog.setWindowTitle(self.tr('Photini: save error'))
+                dialog.setText(self.tr(
+                    '<h3>Metadata could not be saved to some files.</h3>'))
+                dialog.setInformativeText(self.tr(
+                    'See the error log for details.'))
+                dialog.setDetailedText('\n'.join(sorted(failed)))
+                dialog.setIcon(QtWidgets.QMessageBox.Warning)
+                dialog.exec_()
         unsaved = False
         for image in self.images:
             if image.metadata.changed():
@@ -834,6 +1364,53 @@ class ImageList(QtWidgets.QWidget):
                 break
         self.new_metadata.emit(unsaved)
 
+    def _run_saver(self, jobs, options, threads):
+        # save files in a separate thread, with a modal progress dialog
+        # to stop metadata being edited while it's being saved
+        self.image_saver = ImageSaver(jobs, options, threads)
+        thread = QtCore.QThread(self)
+        self.image_saver.moveToThread(thread)
+        self.save_dialog = QtWidgets.QProgressDialog(
+            self.tr('Saving metadata...'), self.tr('Cancel'),
+            0, len(jobs), self)
+        self.save_dialog.setWindowTitle(self.tr('Photini: saving'))
+        self.save_dialog.setWindowModality(Qt.WindowModal)
+        # show the dialog straight away, so nothing can be edited while
+        # the saver is using the metadata
+        self.save_dialog.setMinimumDuration(0)
+        self.save_dialog.setValue(0)
+        self.save_dialog.show()
+        self.save_dialog.canceled.connect(self.cancel_saving)
+        self.image_saver.progress.connect(self._saver_progress)
+        self.image_saver.finished.connect(self._saver_finished)
+        self.save_loop = QtCore.QEventLoop()
+        self.save_failed = []
+        thread.started.connect(self.image_saver.start)
+        thread.start()
+        self.save_loop.exec_()
+        thread.quit()
+        thread.wait()
+        self.save_dialog.reset()
+        self.image_saver = None
+        return self.save_failed
+
+    @QtCore.pyqtSlot(int, int)
+    @catch_all
+    def _saver_progress(self, count, total):
+        self.save_dialog.setValue(count)
+
+    @QtCore.pyqtSlot(list)
+    @catch_all
+    def _saver_finished(self, failed):
+        self.save_failed = failed
+        self.save_loop.quit()
+
+    @QtCore.pyqtSlot()
+    @catch_all
+    def cancel_saving(self):
+        if self.image_saver:
+            self.image_saver.running = False
+
     def unsaved_files_dialog(
             self, all_files=False, with_cancel=True, with_discard=True):
         """Return true if OK to continue with close or quit or whatever"""
@@ -861,11 +1438,7 @@ class ImageList(QtWidgets.QWidget):
         return result == QtWidgets.QMessageBox.Discard
 
     def get_selected_images(self):
-        selection = []
-        for image in self.images:
-            if image.get_selected():
-                selection.append(image)
-        return selection
+        return sorted(self.selection, key=self.model.position)
 
     def emit_selection(self):
         self.selection_changed.emit(self.get_selected_images())
@@ -897,7 +1470,7 @@ class ImageList(QtWidgets.QWidget):
 
     def _inc_selection(self, inc, extend_selection=False):
         if self.last_selected:
-            idx = self.images.index(self.last_selected)
+            idx = self.model.position(self.last_selected)
             idx = (idx + inc) % len(self.images)
         else:
             idx = 0
@@ -908,21 +1481,21 @@ class ImageList(QtWidgets.QWidget):
     def _new_thumb_size(self, value):
         self.thumb_size = value * 20
         self.app.config_store.set('controls', 'thumb_size', str(self.thumb_size))
-        for image in self.images:
-            image.set_thumb_size(self.thumb_size)
+        # thumbnails are remade when next displayed
+        self.pixmap_cache.clear()
+        self.thumbs_view.new_thumb_size()
         if self.last_selected:
-            self.app.processEvents()
-            self.scroll_area.ensureWidgetVisible(self.last_selected)
+            self.thumbs_view.scroll_to(self.last_selected)
 
     def select_image(
             self, image, extend_selection=False, multiple_selection=False):
-        self.scroll_area.ensureWidgetVisible(image)
+        self.thumbs_view.scroll_to(image)
         if extend_selection and self.selection_anchor:
-            idx1 = self.images.index(self.selection_anchor)
-            idx2 = self.images.index(self.last_selected)
+            idx1 = self.model.position(self.selection_anchor)
+            idx2 = self.model.position(self.last_selected)
             for i in range(min(idx1, idx2), max(idx1, idx2) + 1):
                 self.images[i].set_selected(False)
-            idx2 = self.images.index(image)
+            idx2 = self.model.position(image)
             for i in range(min(idx1, idx2), max(idx1, idx2) + 1):
                 self.images[i].set_selected(True)
         elif multiple_selection:
@@ -944,12 +1517,11 @@ class ImageList(QtWidgets.QWidget):
             return
         for image in images:
             image.set_selected(True)
-            self.scroll_area.ensureWidgetVisible(image)
+            self.thumbs_view.scroll_to(image)
         self.selection_anchor = images[0]
         self.last_selected = images[-1]
         self.emit_selection()
 
     def _clear_selection(self):
-        for image in self.images:
-            if image.get_selected():
-                image.set_selected(False)
+        for image in list(self.selection):
+            image.set_selected(False)
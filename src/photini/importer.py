@@ -16,20 +16,29 @@
 ##  along with this program.  If not, see
 ##  <http://www.gnu.org/licenses/>.
 
+import bisect
 from contextlib import contextmanager
 from datetime import datetime
+import hashlib
+import json
 import logging
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
 import os
 import six
 import re
 import shutil
 import sys
+import threading
+import time
 
 try:
     import gphoto2 as gp
 except ImportError:
     gp = None
 
+from photini.cachestore import BaseCacheStore, file_stamp
+from photini.exifheader import read_exif_header
 from photini.metadata import Metadata
 from photini.pyqt import (
     Busy, catch_all, image_types_lower, Qt, QtCore, QtGui,
@@ -39,75 +48,203 @@ logger = logging.getLogger(__name__)
 translate = QtCore.QCoreApplication.translate
 
 
+class ImportIndex(BaseCacheStore):
+    """Store of the camera model and timestamp of files in import
+    source folders, so unchanged files don't need to be read again.
+
+    """
+    def __init__(self, max_size, *arg, **kw):
+        super(ImportIndex, self).__init__('importer', max_size, *arg, **kw)
+
+    def get_info(self, path, stamp):
+        data = self.get(path, stamp)
+        if data is None:
+            return None
+        data = json.loads(data.decode('utf-8'))
+        timestamp = data['timestamp']
+        if len(timestamp) > 19:
+            timestamp = datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S.%f')
+        else:
+            timestamp = datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S')
+        return {
+            'camera'    : data['camera'],
+            'path'      : path,
+            'sc_path'   : data['sc_path'],
+            'name'      : os.path.basename(path),
+            'timestamp' : timestamp,
+            'size'      : data.get('size', 0),
+            }
+
+    def put_info(self, items):
+        # items is a list of (info, stamp)
+        self.put_many([(info['path'], stamp, json.dumps({
+            'camera'    : info['camera'],
+            'sc_path'   : info['sc_path'],
+            'timestamp' : info['timestamp'].isoformat(' '),
+            'size'      : info['size'],
+            }).encode('utf-8')) for (info, stamp) in items])
+        self.evict()
+
+
 class FolderSource(object):
     image_types = ['.' + x for x in image_types_lower() + video_types_lower()]
+    # index of files in all source folders
+    _index = None
+    _index_lock = threading.Lock()
+    index_size = 10000000
 
     def __init__(self, root):
         self.root = root
 
-    def get_file_data(self):
-        if not os.path.isdir(self.root):
-            return None
-        file_list = []
-        for root, dirs, files in os.walk(self.root):
+    @classmethod
+    def get_index(cls):
+        with cls._index_lock:
+            if not cls._index:
+                cls._index = ImportIndex(cls.index_size)
+        return cls._index
+
+    @staticmethod
+    def _walk(root):
+        # like os.walk, but yields (directory, file names) and uses
+        # scandir (where available) to avoid a stat() call per file
+        if not hasattr(os, 'scandir'):
+            for root, dirs, files in os.walk(root):
+                yield root, files
+            return
+        stack = [root]
+        while stack:
+            directory = stack.pop()
+            files = []
+            try:
+                entries = list(os.scandir(directory))
+            except OSError as ex:
+                logger.error('%s: %s', directory, str(ex))
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        stack.append(entry.path)
+                    else:
+                        files.append(entry.name)
+                except OSError:
+                    pass
+            yield directory, files
+
+    def list_files(self):
+        # generate (path, sidecar path) for each image file
+        for root, files in self._walk(self.root):
+            names = set(files)
             for name in files:
                 base, ext = os.path.splitext(name)
-                if ext.lower() in self.image_types:
-                    file_list.append(os.path.join(root, name))
-        file_data = {}
-        for path in file_list:
+                if ext.lower() not in self.image_types:
+                    continue
+                sc_path = None
+                for sc_base in (base, name):
+                    for sc_ext in ('.xmp', '.XMP', '.Xmp'):
+                        if sc_base + sc_ext in names:
+                            sc_path = os.path.join(root, sc_base + sc_ext)
+                            break
+                    if sc_path:
+                        break
+                yield os.path.join(root, name), sc_path
+
+    def get_file_info(self, path, sc_path):
+        # return file info and its index stamp, or None if the info
+        # came from the index
+        stamp = file_stamp(path)
+        if stamp and sc_path:
+            stamp += ';' + (file_stamp(sc_path) or '')
+        info = self.get_index().get_info(path, stamp)
+        if info:
+            return info, None
+        camera = None
+        timestamp = None
+        if not sc_path:
+            # try a quick read of the file's Exif data
+            header = read_exif_header(path)
+            if header and header['camera'] and header['date_taken']:
+                camera = header['camera']
+                timestamp = header['date_taken']
+        if not timestamp:
+            # fall back to full metadata read
             metadata = Metadata(path)
-            timestamp = metadata.date_taken
-            if not timestamp:
-                timestamp = metadata.date_digitised
-            if not timestamp:
-                timestamp = metadata.date_modified
-            if not timestamp:
-                # use file date as last resort
-                timestamp = datetime.fromtimestamp(os.path.getmtime(path))
-            else:
+            camera = metadata.camera_model
+            timestamp = (metadata.date_taken or metadata.date_digitised or
+                         metadata.date_modified)
+            if timestamp:
                 timestamp = timestamp.datetime
             if metadata._sc:
                 sc_path = metadata._sc._path
             else:
                 sc_path = None
-            name = os.path.basename(path)
-            file_data[name] = {
-                'camera'    : metadata.camera_model,
-                'path'      : path,
-                'sc_path'   : sc_path,
-                'name'      : name,
-                'timestamp' : timestamp,
-                }
-        return file_data
+        if not timestamp:
+            # use file date as last resort
+            timestamp = datetime.fromtimestamp(os.path.getmtime(path))
+        info = {
+            'camera'    : camera,
+            'path'      : path,
+            'sc_path'   : sc_path,
+            'name'      : os.path.basename(path),
+            'timestamp' : timestamp,
+            'size'      : os.path.getsize(path),
+            }
+        return info, stamp
 
-    def copy_files(self, info_list, move):
-        for info in info_list:
+    def copy_files(self, info_list, move, copier):
+        # copy several files at once, but yield them in the original
+        # order
+        def copy_file(info):
+            if not copier.running:
+                return None
             dest_path = info['dest_path']
-            dest_dir = os.path.dirname(dest_path)
-            if not os.path.isdir(dest_dir):
-                os.makedirs(dest_dir)
+            _make_dirs(os.path.dirname(dest_path))
+            if not _copy_file(info['path'], dest_path, move, copier):
+                return None
             sc_file = info['sc_path']
-            if move:
-                shutil.move(info['path'], dest_path)
-                if sc_file:
+            if sc_file:
+                if move:
                     shutil.move(sc_file, dest_path + '.xmp')
-            else:
-                shutil.copy2(info['path'], dest_path)
-                if sc_file:
+                else:
                     shutil.copy2(sc_file, dest_path + '.xmp')
-            yield info
+            return info
+
+        pool = ThreadPool(copier.streams)
+        try:
+            for info in pool.imap(copy_file, info_list):
+                if info:
+                    yield info
+        finally:
+            # stop any copies still in progress
+            copier.running = False
+            pool.close()
+            pool.join()
 
 
 class CameraSource(object):
     image_types = ['.' + x for x in image_types_lower() + video_types_lower()]
+    # file info from previous listings, for each camera
+    _info_cache = {}
+    # gphoto2 values used with the camera, so that a stand-in camera
+    # can be used when gphoto2 is not installed
+    if gp:
+        camera_error = gp.GPhoto2Error
+        file_type_normal = gp.GP_FILE_TYPE_NORMAL
+    else:
+        camera_error = EnvironmentError
+        file_type_normal = 1
 
-    def __init__(self, model, port_name):
+    def __init__(self, model, port_name, camera=None):
         self.model = model
         self.port_name = port_name
+        # camera can be an object that stands in for gp.Camera, e.g. for
+        # testing without a real camera
+        self.camera = camera
 
     @contextmanager
     def session(self):
+        if self.camera:
+            yield self.camera
+            return
         # initialise camera
         camera = gp.Camera()
         # search ports for camera port name
@@ -141,67 +278,293 @@ class CameraSource(object):
         return result
 
     def get_file_data(self):
+        cache = self._info_cache.setdefault((self.model, self.port_name), {})
         with self.session() as camera:
             try:
                 file_list = self._list_files(camera)
-            except gp.GPhoto2Error:
+            except self.camera_error:
                 # camera is no longer visible
                 return None
-            file_data = {}
+            # get info of new files in one pass, while the session is open
             for path in file_list:
+                if path in cache:
+                    continue
                 folder, name = os.path.split(path)
                 try:
                     info = camera.file_get_info(str(folder), str(name))
-                except gp.GPhoto2Error:
+                except self.camera_error:
                     return None
-                timestamp = datetime.utcfromtimestamp(info.file.mtime)
-                file_data[name] = {
-                    'camera'    : self.model,
-                    'folder'    : folder,
-                    'name'      : name,
-                    'timestamp' : timestamp,
-                    }
+                cache[path] = info.file.mtime, info.file.size
+        # forget files that are no longer on the camera
+        for path in set(cache) - set(file_list):
+            del cache[path]
+        file_data = {}
+        for path in file_list:
+            folder, name = os.path.split(path)
+            mtime, size = cache[path]
+            file_data[name] = {
+                'camera'    : self.model,
+                'folder'    : folder,
+                'name'      : name,
+                'timestamp' : datetime.utcfromtimestamp(mtime),
+                'size'      : size,
+                }
         return file_data
 
-    def copy_files(self, info_list, move):
+    @staticmethod
+    def _write_file(info, data, mtime, copier):
+        dest_path = info['dest_path']
+        with open(dest_path, 'wb') as f:
+            f.write(data)
+        if mtime:
+            os.utime(dest_path, (mtime, mtime))
+        copier.add_bytes(len(data))
+
+    def copy_files(self, info_list, move, copier):
+        # fetch each file from the camera while the previous one is
+        # being written to disk
+        cache = self._info_cache.get((self.model, self.port_name), {})
+        writer = ThreadPool(1)
+        pending = []
         with self.session() as camera:
-            for info in info_list:
-                dest_dir = os.path.dirname(info['dest_path'])
-                if not os.path.isdir(dest_dir):
-                    os.makedirs(dest_dir)
-                camera_file = camera.file_get(
-                    info['folder'], info['name'], gp.GP_FILE_TYPE_NORMAL)
-                camera_file.save(info['dest_path'])
+            def finish():
+                info, camera_file, result = pending.pop(0)
+                result.get()
                 if move:
                     camera.file_delete(info['folder'], info['name'])
-                yield info
+                    cache.pop(os.path.join(info['folder'], info['name']), None)
+                return info
+
+            try:
+                for info in info_list:
+                    if not copier.running:
+                        break
+                    dest_dir = os.path.dirname(info['dest_path'])
+                    if not os.path.isdir(dest_dir):
+                        os.makedirs(dest_dir)
+                    camera_file = camera.file_get(
+                        info['folder'], info['name'], self.file_type_normal)
+                    data = camera_file.get_data_and_size()
+                    mtime = camera_file.get_mtime()
+                    # keep a reference to camera_file until its data has
+                    # been written
+                    pending.append((info, camera_file, writer.apply_async(
+                        self._write_file, (info, data, mtime, copier))))
+                    if len(pending) > 1:
+                        yield finish()
+                while pending:
+                    yield finish()
+            finally:
+                writer.close()
+                writer.join()
 
 
 class FileCopier(QtCore.QObject):
     output = QtCore.pyqtSignal(dict, six.text_type)
+    progress = QtCore.pyqtSignal(float, float)
 
-    def __init__(self, source, copy_list, move, *args, **kwds):
+    def __init__(self, source, copy_list, move, streams=1, verify=False,
+                 *args, **kwds):
         super(FileCopier, self).__init__(*args, **kwds)
         self.source = source
         self.copy_list = copy_list
         self.move = move
+        self.streams = streams
+        self.verify = verify
         self.running = True
+        self._lock = threading.Lock()
+
+    def add_bytes(self, count):
+        # called from copying threads as data is copied
+        with self._lock:
+            self.bytes_done += count
+            now = time.time()
+            if now < self.next_report:
+                return
+            self.next_report = now + 0.5
+            elapsed = now - self.start_time
+            rate = self.bytes_done / max(elapsed, 0.001)
+            remaining = max(self.bytes_total - self.bytes_done, 0)
+            self.progress.emit(rate, remaining / max(rate, 1.0))
 
     @QtCore.pyqtSlot()
     @catch_all
     def start(self):
         status = 'ok'
+        self.bytes_total = sum(x['size'] for x in self.copy_list)
+        self.bytes_done = 0
+        self.start_time = time.time()
+        self.next_report = self.start_time
         try:
-            for info in self.source.copy_files(self.copy_list, self.move):
+            for info in self.source.copy_files(
+                    self.copy_list, self.move, self):
                 self.output.emit(info, status)
-                if not self.running:
-                    break
         except Exception as ex:
             status = str(ex)
             logger.error(status)
+        elapsed = time.time() - self.start_time
+        logger.info('copied %d bytes in %.1f s (%.1f MB/s)',
+                    self.bytes_done, elapsed,
+                    self.bytes_done / (max(elapsed, 0.001) * 1.0e6))
         self.output.emit({}, status)
 
 
+# large buffer for copying, and zero-copy functions where available
+_copy_chunk = 4 * 1024 * 1024
+
+if hasattr(os, 'copy_file_range'):
+    def _zero_copy(in_fd, out_fd, offset):
+        return os.copy_file_range(in_fd, out_fd, _copy_chunk)
+elif hasattr(os, 'sendfile') and sys.platform.startswith('linux'):
+    def _zero_copy(in_fd, out_fd, offset):
+        return os.sendfile(out_fd, in_fd, offset, _copy_chunk)
+else:
+    _zero_copy = None
+
+
+def _make_dirs(path):
+    # several threads may try to create the same directory
+    if os.path.isdir(path):
+        return
+    try:
+        os.makedirs(path)
+    except OSError:
+        if not os.path.isdir(path):
+            raise
+
+
+def _checksum(path):
+    result = hashlib.sha1()
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(_copy_chunk)
+            if not data:
+                break
+            result.update(data)
+    return result.digest()
+
+
+def _copy_data(fsrc, fdst, copier):
+    # return False if copying is cancelled
+    offset = 0
+    if _zero_copy:
+        in_fd, out_fd = fsrc.fileno(), fdst.fileno()
+        try:
+            while copier.running:
+                count = _zero_copy(in_fd, out_fd, offset)
+                if not count:
+                    return True
+                offset += count
+                copier.add_bytes(count)
+            return False
+        except OSError:
+            # not supported by the file system, use normal copy
+            if offset:
+                raise
+    while copier.running:
+        data = fsrc.read(_copy_chunk)
+        if not data:
+            return True
+        fdst.write(data)
+        copier.add_bytes(len(data))
+    return False
+
+
+def _copy_file(src, dst, move, copier):
+    # copy (or move) one file, return False if copying is cancelled
+    if move:
+        try:
+            os.rename(src, dst)
+            copier.add_bytes(os.path.getsize(dst))
+            return True
+        except OSError:
+            # probably on a different device
+            pass
+    try:
+        with open(src, 'rb') as fsrc:
+            with open(dst, 'wb') as fdst:
+                done = _copy_data(fsrc, fdst, copier)
+        if done and copier.verify and _checksum(src) != _checksum(dst):
+            raise IOError('Copy of {} is corrupt'.format(src))
+    except Exception:
+        if os.path.exists(dst):
+            os.unlink(dst)
+        raise
+    if not done:
+        os.unlink(dst)
+        return False
+    shutil.copystat(src, dst)
+    if move:
+        os.unlink(src)
+    return True
+
+
+class FolderScanner(QtCore.QObject):
+    batch_found = QtCore.pyqtSignal(dict)
+    finished = QtCore.pyqtSignal(bool)
+
+    def __init__(self, source, threads, *args, **kwds):
+        super(FolderScanner, self).__init__(*args, **kwds)
+        self.source = source
+        self.threads = threads
+        self.running = True
+
+    def get_file_info(self, paths):
+        # a file that can't be read, e.g. because it was deleted during
+        # the scan, is left out instead of stopping the whole scan
+        try:
+            return self.source.get_file_info(*paths)
+        except Exception as ex:
+            logger.error('%s: %s', paths[0], str(ex))
+            return None
+
+    @QtCore.pyqtSlot()
+    @catch_all
+    def start(self):
+        ok = False
+        try:
+            if os.path.isdir(self.source.root):
+                self.scan()
+                ok = True
+        finally:
+            self.finished.emit(ok)
+
+    def scan(self):
+        pool = ThreadPool(self.threads)
+        new_items = []
+        try:
+            batch = {}
+            interval = 0.25
+            last_emit = time.time()
+            for result in pool.imap_unordered(
+                    self.get_file_info, self.source.list_files()):
+                if not self.running:
+                    break
+                if not result:
+                    continue
+                info, stamp = result
+                batch[info['name']] = info
+                if stamp:
+                    new_items.append((info, stamp))
+                # send results to GUI, less often as the list gets
+                # longer and takes more time to redisplay
+                if time.time() - last_emit > interval:
+                    self.batch_found.emit(batch)
+                    batch = {}
+                    interval = min(interval * 2, 4.0)
+                    last_emit = time.time()
+            if batch and self.running:
+                self.batch_found.emit(batch)
+        finally:
+            if new_items:
+                self.source.get_index().put_info(new_items)
+            if self.running:
+                pool.close()
+            else:
+                pool.terminate()
+            pool.join()
+
+
 def get_camera_list():
     if not gp:
         return []
@@ -284,8 +647,12 @@ class TabWidget(QtWidgets.QWidget):
         self.nm = NameMangler()
         self.file_data = {}
         self.file_list = []
+        self.file_rows = {}
+        self.timestamps = []
+        self.timestamp_names = []
         self.source = None
         self.file_copier = None
+        self.folder_scanner = None
         # source selector
         box = QtWidgets.QHBoxLayout()
         box.setContentsMargins(0, 0, 0, 0)
@@ -341,6 +708,8 @@ class TabWidget(QtWidgets.QWidget):
         self.copy_button.click_start.connect(self.copy_selected)
         self.copy_button.click_stop.connect(self.stop_copy)
         buttons.addWidget(self.copy_button)
+        self.copy_status = QtWidgets.QLabel()
+        buttons.addWidget(self.copy_status)
         self.layout().addLayout(buttons, 0, 1, 2, 1)
         self.selection_changed()
         # final initialisation
@@ -359,6 +728,7 @@ class TabWidget(QtWidgets.QWidget):
     @QtCore.pyqtSlot(int)
     @catch_all
     def new_source(self, idx):
+        self.stop_scan()
         self.source = None
         item_data = self.source_selector.itemData(idx)
         if not item_data:
@@ -468,7 +838,12 @@ class TabWidget(QtWidgets.QWidget):
     @QtCore.pyqtSlot()
     @catch_all
     def list_files(self):
+        self.stop_scan()
         file_data = {}
+        if isinstance(self.source, FolderSource):
+            self._new_file_list()
+            self.start_scan()
+            return
         if self.source:
             with Busy():
                 file_data = self.source.get_file_data()
@@ -477,11 +852,53 @@ class TabWidget(QtWidgets.QWidget):
                     return
         self._new_file_list(file_data)
 
+    def start_scan(self):
+        # read folder contents in a separate thread
+        threads = int(self.config_store.get(
+            'files', 'open_threads', str(min(cpu_count(), 8))))
+        self.folder_scanner = FolderScanner(self.source, threads)
+        self.folder_scanner_thread = QtCore.QThread(self)
+        self.folder_scanner.moveToThread(self.folder_scanner_thread)
+        self.folder_scanner.batch_found.connect(self.files_found)
+        self.folder_scanner.finished.connect(self.scan_finished)
+        self.folder_scanner_thread.started.connect(self.folder_scanner.start)
+        self.folder_scanner_thread.start()
+
+    def stop_scan(self):
+        if not self.folder_scanner:
+            return
+        self.folder_scanner.running = False
+        self.folder_scanner_thread.quit()
+        self.folder_scanner_thread.wait()
+        self.folder_scanner = None
+
+    @QtCore.pyqtSlot(dict)
+    @catch_all
+    def files_found(self, file_data):
+        if self.sender() is not self.folder_scanner:
+            # left over from a cancelled scan
+            return
+        self.file_data.update(file_data)
+        self.file_list = list(self.file_data.keys())
+        self.sort_file_list()
+
+    @QtCore.pyqtSlot(bool)
+    @catch_all
+    def scan_finished(self, ok):
+        if self.sender() is not self.folder_scanner:
+            return
+        self.folder_scanner_thread.quit()
+        self.folder_scanner_thread.wait()
+        self.folder_scanner = None
+        if not ok:
+            self._fail()
+
     def _fail(self):
         self.source_selector.setCurrentIndex(0)
         self.refresh()
 
-    def _new_file_list(self, file_data={}):
+    def _new_file_list(self, file_data=None):
+        file_data = file_data or {}
         self.file_list = list(file_data.keys())
         self.file_data = file_data
         self.sort_file_list()
@@ -491,8 +908,14 @@ class TabWidget(QtWidgets.QWidget):
     def sort_file_list(self):
         if eval(self.config_store.get('controls', 'sort_date', 'False')):
             self.file_list.sort(key=lambda x: self.file_data[x]['timestamp'])
+            names = list(self.file_list)
         else:
             self.file_list.sort()
+            names = sorted(self.file_data,
+                           key=lambda x: self.file_data[x]['timestamp'])
+        # sorted timestamps for select_files
+        self.timestamps = [self.file_data[x]['timestamp'] for x in names]
+        self.timestamp_names = names
         self.show_file_list()
         if self.file_list:
             example = self.file_data[self.file_list[-1]]
@@ -506,9 +929,11 @@ class TabWidget(QtWidgets.QWidget):
 
     def show_file_list(self):
         self.file_list_widget.clear()
+        self.file_rows = {}
         first_active = None
         item = None
-        for name in self.file_list:
+        for row, name in enumerate(self.file_list):
+            self.file_rows[name] = row
             file_data = self.file_data[name]
             dest_path = self.nm.transform(file_data)
             file_data['dest_path'] = dest_path
@@ -558,20 +983,24 @@ class TabWidget(QtWidgets.QWidget):
         count = self.file_list_widget.count()
         if not count:
             return
+        # get files newer than 'since' from the sorted timestamps
+        idx = bisect.bisect_right(self.timestamps, since)
+        rows = []
+        for name in self.timestamp_names[idx:]:
+            row = self.file_rows[name]
+            if self.file_list_widget.item(row).flags() & Qt.ItemIsSelectable:
+                rows.append(row)
+        # select items without a selection_changed call for each one
+        was_blocked = self.file_list_widget.blockSignals(True)
         self.file_list_widget.clearSelection()
-        first_active = None
-        for row in range(count):
-            item = self.file_list_widget.item(row)
-            if not (item.flags() & Qt.ItemIsSelectable):
-                continue
-            name = item.data(Qt.UserRole)
-            timestamp = self.file_data[name]['timestamp']
-            if timestamp > since:
-                if not first_active:
-                    first_active = item
-                item.setSelected(True)
-        if not first_active:
-            first_active = item
+        for row in rows:
+            self.file_list_widget.item(row).setSelected(True)
+        self.file_list_widget.blockSignals(was_blocked)
+        self.selection_changed()
+        if rows:
+            first_active = self.file_list_widget.item(min(rows))
+        else:
+            first_active = self.file_list_widget.item(count - 1)
         self.file_list_widget.scrollToItem(
             first_active, QtWidgets.QAbstractItemView.PositionAtTop)
 
@@ -604,18 +1033,33 @@ class TabWidget(QtWidgets.QWidget):
             self.move_button.setEnabled(False)
         self.last_file_copied = None, datetime.min
         # start file copier in a separate thread
-        self.file_copier = FileCopier(self.source, copy_list, move)
+        streams = int(self.config_store.get('importer', 'copy_streams', '4'))
+        verify = eval(self.config_store.get('importer', 'copy_verify', 'False'))
+        self.file_copier = FileCopier(
+            self.source, copy_list, move, streams=streams, verify=verify)
         self.file_copier_thread = QtCore.QThread(self)
         self.file_copier.moveToThread(self.file_copier_thread)
         self.file_copier.output.connect(self.file_copied)
+        self.file_copier.progress.connect(self.copy_progress)
         self.file_copier_thread.started.connect(self.file_copier.start)
         self.file_copier_thread.start()
 
+    @QtCore.pyqtSlot(float, float)
+    @catch_all
+    def copy_progress(self, rate, remaining):
+        if not self.file_copier:
+            return
+        remaining = int(remaining)
+        self.copy_status.setText(
+            translate('ImporterTab', '{0:.1f} MB/s\n{1:d}:{2:02d} left').format(
+                rate / 1.0e6, remaining // 60, remaining % 60))
+
     @QtCore.pyqtSlot(dict, six.text_type)
     @catch_all
     def file_copied(self, info, status):
         if not info:
             # copier thread has finished
+            self.copy_status.clear()
             self.move_button.set_checked(False)
             self.copy_button.set_checked(False)
             self.file_copier = None
@@ -632,14 +1076,12 @@ class TabWidget(QtWidgets.QWidget):
         self.image_list.open_file(info['dest_path'])
         if self.last_file_copied[1] < info['timestamp']:
             self.last_file_copied = info['dest_path'], info['timestamp']
-        for n in range(self.file_list_widget.count()):
-            item = self.file_list_widget.item(n)
-            if item.data(Qt.UserRole) == info['name']:
-                item.setFlags(Qt.NoItemFlags)
-                self.file_list_widget.scrollToItem(
-                    item, QtWidgets.QAbstractItemView.PositionAtTop)
-                self.selection_changed()
-                break
+        if info['name'] in self.file_rows:
+            item = self.file_list_widget.item(self.file_rows[info['name']])
+            item.setFlags(Qt.NoItemFlags)
+            self.file_list_widget.scrollToItem(
+                item, QtWidgets.QAbstractItemView.PositionAtTop)
+            self.selection_changed()
 
     @QtCore.pyqtSlot()
     @catch_all
@@ -650,6 +1092,7 @@ class TabWidget(QtWidgets.QWidget):
     @QtCore.pyqtSlot()
     @catch_all
     def shutdown(self):
+        self.stop_scan()
         if self.file_copier:
             self.file_copier.running = False
             self.file_copier_thread.quit()
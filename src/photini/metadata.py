@@ -68,7 +68,7 @@ class FFMPEGMetadata(object):
     def __init__(self, path):
         self._path = path
         self.md = {}
-        raw = FFmpeg.ffprobe(path)
+        raw = FFmpeg.probe(path)
         if 'format' in raw and 'tags' in raw['format']:
             self.md.update(self.read_tags('format', raw['format']['tags']))
         if 'streams' in raw:
@@ -1088,19 +1088,54 @@ class Metadata(QtCore.QObject):
 
     def __init__(self, path, *args, **kw):
         super(Metadata, self).__init__(*args, **kw)
-        # create metadata handlers for image file, video file, and sidecar
         self._path = path
-        self._vf = None
-        self._sc = SidecarMetadata.open_old(path)
-        self._if = ImageMetadata.open_old(path)
-        self.mime_type = self.get_mime_type()
+        stat = os.stat(path)
+        self.file_times = (stat.st_atime, stat.st_mtime)
+        # metadata handlers are not created until they're needed
+        self._handlers = None
+        self._mime_type = None
+        self.dirty = False
+        # incremented whenever a data value is changed
+        self.change_count = 0
+
+    def _open_handlers(self):
+        # create metadata handlers for image file, video file, and sidecar
+        if self._handlers is not None:
+            return self._handlers
+        path = self._path
+        handlers = {'vf': None}
+        handlers['sc'] = SidecarMetadata.open_old(path)
+        handlers['if'] = ImageMetadata.open_old(path)
+        self._handlers = handlers
         if self.mime_type.split('/')[0] == 'video':
             vhm = VideoHeaderMetadata.open_old(path)
-            if vhm and self._if:
-                vhm.merge_segment(self._if)
-            self._if = vhm
-            self._vf = FFMPEGMetadata.open_old(path)
-        self.dirty = False
+            if vhm and handlers['if']:
+                vhm.merge_segment(handlers['if'])
+            handlers['if'] = vhm
+            handlers['vf'] = FFMPEGMetadata.open_old(path)
+        return handlers
+
+    @property
+    def _if(self):
+        return self._open_handlers()['if']
+
+    @property
+    def _sc(self):
+        return self._open_handlers()['sc']
+
+    @_sc.setter
+    def _sc(self, value):
+        self._open_handlers()['sc'] = value
+
+    @property
+    def _vf(self):
+        return self._open_handlers()['vf']
+
+    @property
+    def mime_type(self):
+        if not self._mime_type:
+            self._mime_type = self.get_mime_type()
+        return self._mime_type
 
     @classmethod
     def clone(cls, path, other, *args, **kw):
@@ -1114,9 +1149,12 @@ class Metadata(QtCore.QObject):
         return self
 
     def save(self, if_mode=True, sc_mode='auto',
-             force_iptc=False, file_times=None):
+             force_iptc=False, file_times=None, verify='full'):
+        # returns False if the metadata could not be saved
+        self.write_time = 0.0
+        self.verify_time = 0.0
         if not self.dirty:
-            return
+            return True
         if (sc_mode == 'always' or not self._if) and not self._sc:
             self._sc = SidecarMetadata.open_new(self._path, self._if)
         self.software = 'Photini editor v' + __version__
@@ -1134,22 +1172,34 @@ class Metadata(QtCore.QObject):
                     handler.write(name, value)
             OK = False
             if self._if and if_mode:
-                OK = self._if.save(file_times=file_times, force_iptc=force_iptc)
+                OK = self._if.save(file_times=file_times,
+                                   force_iptc=force_iptc, verify=verify)
+                self._add_times(self._if)
                 if not OK and not self._sc:
                     # can't write to image so create side car
-                    self.save(if_mode=False, sc_mode='always',
-                              force_iptc=force_iptc, file_times=file_times)
-                    return
+                    write_time, verify_time = self.write_time, self.verify_time
+                    OK = self.save(if_mode=False, sc_mode='always',
+                                   force_iptc=force_iptc,
+                                   file_times=file_times, verify=verify)
+                    self.write_time += write_time
+                    self.verify_time += verify_time
+                    return OK
             if sc_mode == 'delete' and self._sc and OK:
                 self._sc = self._sc.delete()
             if self._sc:
-                OK = self._sc.save(file_times=file_times)
+                OK = self._sc.save(file_times=file_times, verify=verify)
+                self._add_times(self._sc)
         except Exception as ex:
             logger.exception(ex)
-            return
+            return False
         if OK:
             self.dirty = False
             self.unsaved.emit(self.dirty)
+        return OK
+
+    def _add_times(self, handler):
+        self.write_time += getattr(handler, 'write_time', 0.0)
+        self.verify_time += getattr(handler, 'verify_time', 0.0)
 
     def get_mime_type(self):
         result = None
@@ -1210,6 +1260,7 @@ class Metadata(QtCore.QObject):
         if getattr(self, name) == value:
             return
         super(Metadata, self).__setattr__(name, value)
+        self.change_count += 1
         if not self.dirty:
             self.dirty = True
         self.unsaved.emit(self.dirty)
@@ -18,8 +18,10 @@
 
 from __future__ import unicode_literals
 
+from collections import defaultdict, OrderedDict
 import locale
 import logging
+import math
 import os
 
 import pkg_resources
@@ -32,6 +34,7 @@ from photini.pyqt import (
     catch_all, ComboBox, Qt, QtCore, QtGui, QtWebChannel,
     QWebPage, QWebSettings, QWebView, QtWidgets, qt_version_info,
     SingleLineEdit, using_qtwebengine)
+from photini.selection import SelectionValues, ValueCounter
 from photini.technical import DoubleSpinBox
 
 logger = logging.getLogger(__name__)
@@ -196,6 +199,8 @@ class LatLongDisplay(SingleLineEdit):
         self.setFixedWidth(170)
         self.setEnabled(False)
         self.editingFinished.connect(self.editing_finished)
+        self.selection_values = SelectionValues(
+            {'latlong': lambda image: image.metadata.latlong})
 
     @QtCore.pyqtSlot()
     @catch_all
@@ -215,17 +220,17 @@ class LatLongDisplay(SingleLineEdit):
         self.refresh()
         self.changed.emit()
 
-    def refresh(self):
-        images = self.image_list.get_selected_images()
-        if not images:
+    def refresh(self, selection=None):
+        if selection is None:
+            # metadata may have changed, so read all selected images
+            self.selection_values.reset()
+            selection = self.image_list.get_selected_images()
+        self.selection_values.set_selection(selection)
+        if not selection:
             self.set_value(None)
             self.setEnabled(False)
             return
-        values = []
-        for image in images:
-            value = image.metadata.latlong
-            if value not in values:
-                values.append(value)
+        values = self.selection_values.values('latlong')
         if len(values) > 1:
             self.set_multiple(choices=filter(None, values))
         else:
@@ -234,6 +239,9 @@ class LatLongDisplay(SingleLineEdit):
 
 
 class PhotiniMap(QtWidgets.QWidget):
+    # markers closer than this many pixels are shown as one cluster
+    cluster_size = 40
+
     def __init__(self, image_list, parent=None):
         super(PhotiniMap, self).__init__(parent)
         self.app = QtWidgets.QApplication.instance()
@@ -246,8 +254,22 @@ class PhotiniMap(QtWidgets.QWidget):
         self.drag_hotspot = 11, 35
         self.search_string = None
         self.map_loaded = False
+        # marker id -> marker info
         self.marker_info = {}
+        # quantised coordinates -> marker id
+        self.marker_index = {}
+        # image -> marker id
+        self.image_markers = {}
+        self.next_marker_id = 0
+        self.last_selection = set()
+        # markers (single locations or clusters) currently on the map
+        # display key -> [id, (lat, lng, count), selected]
+        self.shown_markers = {}
+        # displayed marker id -> list of location marker ids
+        self.shown_ids = {}
+        self.shown_area = None
         self.map_status = {}
+        self.track_plot = None
         self.dropped_images = []
         self.geocoder = self.get_geocoder()
         self.setLayout(QtWidgets.QHBoxLayout())
@@ -372,6 +394,8 @@ class PhotiniMap(QtWidgets.QWidget):
 
     def refresh(self):
         self.image_list.set_drag_to_map(self.drag_icon, self.drag_hotspot)
+        # metadata may have been changed by another tab
+        self.coords.refresh()
         if not self.map_loaded:
             self.initialise()
             return
@@ -389,6 +413,15 @@ class PhotiniMap(QtWidgets.QWidget):
             if key in status:
                 self.app.config_store.set(
                     'map', key, repr(self.map_status[key]))
+        if 'zoom' in status and self.needs_display_update():
+            self.update_display()
+        if self.track_plot and 'zoom' in status:
+            # plot track with appropriate detail for new view
+            zoom = self.map_status['zoom']
+            bounds = self.map_status.get('bounds')
+            if self.track_plot.needs_update(zoom, bounds):
+                latlngs = self.track_plot.latlngs(zoom, bounds)
+                self.JavaScript('plotTrack({!r},false)'.format(latlngs))
 
     @QtCore.pyqtSlot(int, int, six.text_type)
     @catch_all
@@ -398,18 +431,20 @@ class PhotiniMap(QtWidgets.QWidget):
 
     @catch_all
     def marker_drop(self, lat, lng):
+        images = []
         for path in self.dropped_images:
             image = self.image_list.get_image(path)
             image.metadata.latlong = lat, lng
+            images.append(image)
         self.dropped_images = []
-        self.redraw_markers()
+        self.redraw_markers(images)
         self.coords.refresh()
         self.see_selection()
 
     @QtCore.pyqtSlot()
     @catch_all
     def new_coords(self):
-        self.redraw_markers()
+        self.redraw_markers(self.image_list.get_selected_images())
         self.update_altitude()
         self.see_selection()
 
@@ -428,11 +463,10 @@ class PhotiniMap(QtWidgets.QWidget):
             if self.altitude_button:
                 self.altitude_button.setEnabled(False)
             return
-        values = []
+        values = ValueCounter()
         for image in images:
-            value = image.metadata.altitude
-            if value not in values:
-                values.append(value)
+            values.add(image.metadata.altitude)
+        values = values.values()
         if len(values) > 1:
             self.altitude.set_multiple(choices=filter(None, values))
         else:
@@ -442,66 +476,191 @@ class PhotiniMap(QtWidgets.QWidget):
             self.altitude_button.setEnabled(bool(self.coords.get_value()))
 
     def see_selection(self):
-        locations = []
+        locations = OrderedDict()
         for image in self.image_list.get_selected_images():
             latlong = image.metadata.latlong
-            if not latlong:
-                continue
-            location = [latlong.lat, latlong.lon]
-            if location not in locations:
-                locations.append(location)
+            if latlong:
+                locations[latlong.lat, latlong.lon] = None
         if not locations:
             return
-        self.JavaScript('fitPoints({})'.format(repr(locations)))
+        self.JavaScript('fitPoints({})'.format(
+            repr([list(x) for x in locations])))
 
     @QtCore.pyqtSlot(list)
     @catch_all
     def new_selection(self, selection):
-        self.redraw_markers()
-        self.coords.refresh()
+        # only selected (possibly edited elsewhere) or deselected images
+        # need checking
+        selection = set(selection)
+        self.redraw_markers(selection | self.last_selection)
+        self.last_selection = selection
+        self.coords.refresh(selection)
         self.update_altitude()
         self.see_selection()
 
-    def redraw_markers(self):
+    @staticmethod
+    def marker_key(latlong):
+        # LatLon values are rounded to 6 decimal places
+        return int(round(latlong.lat * 1.0e6)), int(round(latlong.lon * 1.0e6))
+
+    def redraw_markers(self, images=None):
+        # update markers of images (default all images) that may have
+        # changed location or selected state
         if not self.map_loaded:
             return
-        for info in self.marker_info.values():
-            info['images'] = []
-        for image in self.image_list.get_images():
+        changed = set()
+        if images is None:
+            images = list(self.image_list.get_images())
+            # forget images that are no longer in the image list
+            current = set(images)
+            for image in [x for x in self.image_markers if x not in current]:
+                changed.add(self._remove_marker_image(image))
+            self.last_selection = set(x for x in images if x.selected)
+        for image in images:
             latlong = image.metadata.latlong
-            if not latlong:
+            key = latlong and self.marker_key(latlong)
+            marker_id = self.image_markers.get(image)
+            if marker_id is not None:
+                changed.add(marker_id)
+                if self.marker_info[marker_id]['key'] == key:
+                    continue
+                self._remove_marker_image(image)
+            if not key:
                 continue
-            for info in self.marker_info.values():
-                if info['latlong'] == latlong:
-                    info['images'].append(image)
-                    break
-            else:
-                for i in range(len(self.marker_info) + 2):
-                    marker_id = i
-                    if marker_id not in self.marker_info:
-                        break
+            marker_id = self.marker_index.get(key)
+            if marker_id is None:
+                marker_id = self.next_marker_id
+                self.next_marker_id += 1
+                self.marker_index[key] = marker_id
                 self.marker_info[marker_id] = {
-                    'images'  : [image],
+                    'images'  : [],
+                    'key'     : key,
                     'latlong' : LatLon(latlong),
-                    'selected': image.selected,
+                    'xy'      : self.world_xy(latlong),
+                    'selected': False,
                     }
-                self.JavaScript('addMarker({:d},{!r},{!r},{:d})'.format(
-                    marker_id, latlong.lat, latlong.lon, image.selected))
-        for marker_id in list(self.marker_info.keys()):
+            self.marker_info[marker_id]['images'].append(image)
+            self.image_markers[image] = marker_id
+            changed.add(marker_id)
+        for marker_id in changed:
             info = self.marker_info[marker_id]
             if not info['images']:
-                self.JavaScript('delMarker({:d})'.format(marker_id))
                 del self.marker_info[marker_id]
-            elif info['selected'] != any([x.selected for x in info['images']]):
-                info['selected'] = not info['selected']
-                self.JavaScript(
-                    'enableMarker({:d},{:d})'.format(marker_id, info['selected']))
-
-    def plot_track(self, tracks):
-        latlngs = []
-        for t in tracks:
-            latlngs.append([[x[1], x[2]] for x in t])
-        self.JavaScript('plotTrack({!r})'.format(latlngs))
+                if self.marker_index.get(info['key']) == marker_id:
+                    del self.marker_index[info['key']]
+                continue
+            info['selected'] = any([x.selected for x in info['images']])
+        if changed:
+            self.update_display()
+
+    def _remove_marker_image(self, image):
+        marker_id = self.image_markers.pop(image)
+        self.marker_info[marker_id]['images'].remove(image)
+        return marker_id
+
+    @staticmethod
+    def world_xy(latlong):
+        # Web Mercator "world" coordinates, 0.0 to 1.0
+        lat = max(min(latlong.lat, 85.0), -85.0)
+        y = math.log(math.tan((math.radians(lat) / 2.0) + (math.pi / 4.0)))
+        return (latlong.lon + 180.0) / 360.0, (1.0 - (y / math.pi)) / 2.0
+
+    def display_area(self):
+        # visible area plus half its size on each side, or None for
+        # the whole world
+        bounds = self.map_status.get('bounds')
+        if not bounds:
+            return None
+        north, east, south, west = bounds
+        if west >= east:
+            # map spans the antimeridian
+            return None
+        height = (north - south) / 2.0
+        width = (east - west) / 2.0
+        return (north + height, east + width, south - height, west - width)
+
+    def needs_display_update(self):
+        if not self.shown_area:
+            return True
+        if self.shown_area[0] != self.map_status.get('zoom'):
+            return True
+        area = self.shown_area[1]
+        if not area:
+            return False
+        bounds = self.map_status.get('bounds')
+        if not bounds:
+            return True
+        north, east, south, west = bounds
+        return not (area[0] >= north and area[1] >= east and
+                    area[2] <= south and area[3] <= west)
+
+    def update_display(self):
+        # Group location markers into clusters of nearby markers at
+        # the current zoom level, then send any changes to the map in
+        # one call. Markers well outside the visible area are omitted.
+        zoom = self.map_status.get('zoom')
+        if zoom is None:
+            zoom = int(eval(self.app.config_store.get('map', 'zoom', '11')))
+        area = self.display_area()
+        self.shown_area = zoom, area
+        scale = 256.0 * (2.0 ** zoom) / self.cluster_size
+        cells = defaultdict(list)
+        for marker_id, info in self.marker_info.items():
+            if area:
+                lat, lng = info['latlong'].lat, info['latlong'].lon
+                if not (area[2] <= lat <= area[0] and
+                        area[3] <= lng <= area[1]):
+                    continue
+            x, y = info['xy']
+            cells[int(x * scale), int(y * scale)].append(marker_id)
+        wanted = {}
+        for cell, marker_ids in cells.items():
+            if len(marker_ids) == 1:
+                info = self.marker_info[marker_ids[0]]
+                key = 'm', marker_ids[0]
+                state = info['latlong'].lat, info['latlong'].lon, 1
+                selected = info['selected']
+            else:
+                marker_ids.sort()
+                infos = [self.marker_info[x] for x in marker_ids]
+                key = 'c', zoom, cell
+                lat = sum([x['latlong'].lat for x in infos]) / len(infos)
+                lng = sum([x['latlong'].lon for x in infos]) / len(infos)
+                state = (round(lat, 6), round(lng, 6),
+                         sum([len(x['images']) for x in infos]))
+                selected = any([x['selected'] for x in infos])
+            wanted[key] = marker_ids, state, selected
+        added, deleted, enabled = [], [], []
+        for key in list(self.shown_markers):
+            if key in wanted and wanted[key][1] == self.shown_markers[key][1]:
+                continue
+            shown_id = self.shown_markers.pop(key)[0]
+            del self.shown_ids[shown_id]
+            deleted.append(shown_id)
+        for key, (marker_ids, state, selected) in wanted.items():
+            if key in self.shown_markers:
+                shown = self.shown_markers[key]
+                self.shown_ids[shown[0]] = marker_ids
+                if shown[2] != selected:
+                    enabled.append([shown[0], int(selected)])
+                    shown[2] = selected
+                continue
+            shown_id = self.next_marker_id
+            self.next_marker_id += 1
+            self.shown_markers[key] = [shown_id, state, selected]
+            self.shown_ids[shown_id] = marker_ids
+            added.append(
+                [shown_id, state[0], state[1], int(selected), state[2]])
+        if added or deleted or enabled:
+            self.JavaScript('updateMarkers({!r},{!r},{!r})'.format(
+                added, deleted, enabled))
+
+    def plot_track(self, track_plot):
+        # start with a low detail plot of the whole track, the map will
+        # zoom to fit it and then call new_status
+        self.track_plot = track_plot
+        latlngs = track_plot.latlngs(self.map_status.get('zoom'))
+        self.JavaScript('plotTrack({!r},true)'.format(latlngs))
 
     @QtCore.pyqtSlot()
     @catch_all
@@ -562,19 +721,41 @@ class PhotiniMap(QtWidgets.QWidget):
             self.JavaScript('adjustBounds({},{},{},{})'.format(*data))
 
     @catch_all
-    def marker_click(self, marker_id):
-        self.image_list.select_images(self.marker_info[marker_id]['images'])
+    def marker_click(self, shown_id):
+        # select all images at the marker's location(s)
+        images = []
+        for marker_id in self.shown_ids[shown_id]:
+            images += self.marker_info[marker_id]['images']
+        self.image_list.select_images(images)
 
     @catch_all
     def marker_drag(self, lat, lng):
         self.coords.set_value('{:.6f}, {:.6f}'.format(lat, lng))
 
     @catch_all
-    def marker_drag_end(self, lat, lng, marker_id):
+    def marker_drag_end(self, lat, lng, shown_id):
+        # only single location markers are draggable
+        marker_id = self.shown_ids[shown_id][0]
         info = self.marker_info[marker_id]
         for image in info['images']:
             image.metadata.latlong = lat, lng
         info['latlong'] = LatLon((lat, lng))
+        info['xy'] = self.world_xy(info['latlong'])
+        key = self.marker_key(info['latlong'])
+        if key not in self.marker_index:
+            # marker has been moved to an unused location
+            if self.marker_index.get(info['key']) == marker_id:
+                del self.marker_index[info['key']]
+            self.marker_index[key] = marker_id
+            info['key'] = key
+            # the map marker is already in the right place
+            shown = self.shown_markers.get(('m', marker_id))
+            if shown:
+                shown[1] = info['latlong'].lat, info['latlong'].lon, 1
+            self.update_display()
+        else:
+            # merge with marker already at the new location
+            self.redraw_markers(list(info['images']))
         self.coords.refresh()
 
     def JavaScript(self, command):
@@ -0,0 +1,141 @@
+##  Photini - a simple photo metadata editor.
+##  http://github.com/jim-easterbrook/Photini
+##  Copyright (C) 2020  Jim Easterbrook  jim@jim-easterbrook.me.uk
+##
+##  This program is free software: you can redistribute it and/or
+##  modify it under the terms of the GNU General Public License as
+##  published by the Free Software Foundation, either version 3 of the
+##  License, or (at your option) any later version.
+##
+##  This program is distributed in the hope that it will be useful,
+##  but WITHOUT ANY WARRANTY; without even the implied warranty of
+##  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+##  General Public License for more details.
+##
+##  You should have received a copy of the GNU General Public License
+##  along with this program.  If not, see
+##  <http://www.gnu.org/licenses/>.
+
+from __future__ import unicode_literals
+
+from collections import OrderedDict
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ValueCounter(object):
+    """Count how many times each distinct value occurs.
+
+    Metadata values such as dates and locations are dicts, which are
+    not hashable, so they are counted under a hashable equivalent.
+
+    """
+    def __init__(self):
+        # hashable key -> [value, count]
+        self._counts = OrderedDict()
+
+    @classmethod
+    def _key(cls, value):
+        try:
+            hash(value)
+            return value
+        except TypeError:
+            pass
+        if isinstance(value, dict):
+            return dict, tuple(sorted(
+                [(k, cls._key(v)) for (k, v) in value.items()]))
+        if isinstance(value, (list, tuple)):
+            return list, tuple([cls._key(x) for x in value])
+        return type(value), repr(value)
+
+    def add(self, value):
+        key = self._key(value)
+        if key in self._counts:
+            self._counts[key][1] += 1
+        else:
+            self._counts[key] = [value, 1]
+
+    def remove(self, value):
+        key = self._key(value)
+        if key not in self._counts:
+            return
+        self._counts[key][1] -= 1
+        if self._counts[key][1] <= 0:
+            del self._counts[key]
+
+    def values(self):
+        return [x[0] for x in self._counts.values()]
+
+    def items(self):
+        return [tuple(x) for x in self._counts.values()]
+
+    def __len__(self):
+        return len(self._counts)
+
+
+class SelectionValues(object):
+    """Distinct values of some metadata fields of the selected images.
+
+    Each field has a function that gets its value from an image. When
+    the selection changes only images that have been added or removed
+    (or whose metadata has been reloaded or changed) are read, so
+    updating a tab after shift-clicking one more image doesn't read
+    every selected image again.
+
+    """
+    def __init__(self, getters):
+        self.getters = getters
+        self.reset()
+
+    def reset(self):
+        self.images = {}
+        self.counters = dict((key, ValueCounter()) for key in self.getters)
+
+    def set_selection(self, selection):
+        selected = set(selection)
+        for image in [x for x in self.images if x not in selected]:
+            self._remove(image)
+        for image in selection:
+            if image not in self.images:
+                self._add(image)
+            elif not self._is_current(image):
+                # metadata has been reloaded or changed
+                self._remove(image)
+                self._add(image)
+
+    def _is_current(self, image):
+        metadata, change_count, values = self.images[image]
+        return (metadata is image.metadata and
+                change_count == image.metadata.change_count)
+
+    def recount(self, *keys):
+        keys = keys or list(self.getters)
+        for key in keys:
+            counter = ValueCounter()
+            getter = self.getters[key]
+            for image, (metadata, change_count, values) in self.images.items():
+                value = getter(image)
+                values[key] = value
+                counter.add(value)
+            self.counters[key] = counter
+
+    def values(self, key):
+        return self.counters[key].values()
+
+    def items(self, key):
+        return self.counters[key].items()
+
+    def _add(self, image):
+        values = {}
+        for key, getter in self.getters.items():
+            value = getter(image)
+            values[key] = value
+            self.counters[key].add(value)
+        self.images[image] = (
+            image.metadata, image.metadata.change_count, values)
+
+    def _remove(self, image):
+        metadata, change_count, values = self.images.pop(image)
+        for key, value in values.items():
+            self.counters[key].remove(value)
@@ -32,6 +32,7 @@ from photini.pyqt import (
     catch_all, ComboBox, multiple, multiple_values, Qt, QtCore, QtGui,
     QtWidgets, scale_font, set_symbol_font, Slider, SquareButton,
     width_for_text)
+from photini.selection import SelectionValues, ValueCounter
 
 logger = logging.getLogger(__name__)
 translate = QtCore.QCoreApplication.translate
@@ -809,6 +810,24 @@ class TabWidget(QtWidgets.QWidget):
         other_group.layout().addRow(translate(
             'TechnicalTab', 'Aperture'), self.widgets['aperture'])
         self.layout().addWidget(other_group, stretch=1)
+        # values of selected images
+        getters = {
+            'lens_model': lambda image: (image.metadata.lens_model,
+                                         image.metadata.lens_make,
+                                         image.metadata.lens_serial),
+            }
+        for key in ('aperture', 'focal_length', 'focal_length_35',
+                    'lens_spec', 'orientation'):
+            getters[key] = lambda image, key=key: getattr(image.metadata, key)
+        for master, slave in self._master_slave.items():
+            getters['date_' + master] = (
+                lambda image, key='date_' + master: getattr(image.metadata, key))
+            if slave:
+                getters['link_' + master] = (
+                    lambda image, master='date_' + master, slave='date_' + slave:
+                        getattr(image.metadata, master) ==
+                        getattr(image.metadata, slave))
+        self.selection_values = SelectionValues(getters)
         # disable until an image is selected
         self.setEnabled(False)
 
@@ -819,7 +838,8 @@ class TabWidget(QtWidgets.QWidget):
         }
 
     def refresh(self):
-        pass
+        # metadata may have been changed by another tab
+        self.selection_values.reset()
 
     def do_not_close(self):
         return False
@@ -957,70 +977,71 @@ class TabWidget(QtWidgets.QWidget):
                 break
             master = slave
 
-    def _update_datetime(self):
-        images = self.image_list.get_selected_images()
+    def _update_datetime(self, recount=True):
+        if recount:
+            # links depend on dates, so recount them as well
+            self.selection_values.recount(
+                *(['date_' + name for name in self.date_widget] +
+                  ['link_' + master for master, slave in self.link_widget]))
         for name in self.date_widget:
             attribute = 'date_' + name
             widget = self.date_widget[name]
-            values = defaultdict(list)
-            for image in images:
-                image_datetime = getattr(image.metadata, attribute) or {}
+            counters = defaultdict(ValueCounter)
+            for image_datetime in self.selection_values.values(attribute):
+                image_datetime = image_datetime or {}
                 for key in widget.members:
                     value = None
                     if key in image_datetime:
                         value = image_datetime[key]
-                    if value not in values[key]:
-                        values[key].append(value)
+                    counters[key].add(value)
             for key in widget.members:
-                if len(values[key]) > 1:
-                    widget.members[key].set_multiple(choices=values[key])
+                values = counters[key].values()
+                if len(values) > 1:
+                    widget.members[key].set_multiple(choices=values)
                 else:
-                    widget.members[key].set_value(values[key][0])
+                    widget.members[key].set_value(values[0])
 
-    def _update_links(self):
-        images = self.image_list.get_selected_images()
+    def _update_links(self, recount=True):
+        if recount:
+            self.selection_values.recount(
+                *['link_' + master for master, slave in self.link_widget])
         for master, slave in self.link_widget:
-            for image in images:
-                if (getattr(image.metadata, 'date_' + master) !=
-                        getattr(image.metadata, 'date_' + slave)):
-                    self.link_widget[master, slave].setChecked(False)
-                    self.date_widget[slave].set_enabled(True)
-                    break
+            if False in self.selection_values.values('link_' + master):
+                self.link_widget[master, slave].setChecked(False)
+                self.date_widget[slave].set_enabled(True)
             else:
                 self.link_widget[master, slave].setChecked(True)
                 self.date_widget[slave].set_enabled(False)
 
-    def _update_orientation(self):
-        images = self.image_list.get_selected_images()
-        if not images:
+    def _update_orientation(self, recount=True):
+        if not self.selection_values.images:
             return
-        value = images[0].metadata.orientation
-        for image in images[1:]:
-            if image.metadata.orientation != value:
-                # multiple values
-                self.widgets['orientation'].set_multiple()
-                return
-        self.widgets['orientation'].set_value(value)
+        if recount:
+            self.selection_values.recount('orientation')
+        values = self.selection_values.values('orientation')
+        if len(values) > 1:
+            # multiple values
+            self.widgets['orientation'].set_multiple()
+            return
+        self.widgets['orientation'].set_value(values[0])
 
-    def _update_lens_model(self):
-        images = self.image_list.get_selected_images()
-        if not images:
+    def _update_lens_model(self, recount=True):
+        if not self.selection_values.images:
             return
-        model = images[0].metadata.lens_model
-        make = images[0].metadata.lens_make
-        serial = images[0].metadata.lens_serial
-        for image in images[1:]:
-            if (image.metadata.lens_model != model or
-                    image.metadata.lens_make != make or
-                    image.metadata.lens_serial != serial):
-                # multiple values
-                self.widgets['lens_model'].set_multiple()
-                self.widgets['lens_model'].setToolTip('')
-                return
+        if recount:
+            self.selection_values.recount('lens_model')
+        values = self.selection_values.values('lens_model')
+        if len(values) > 1:
+            # multiple values
+            self.widgets['lens_model'].set_multiple()
+            self.widgets['lens_model'].setToolTip('')
+            return
+        model, make, serial = values[0]
         lens_id = self.lens_data.get_id(model, make, serial)
         if not self.widgets['lens_model'].known_value(lens_id):
             # new lens
-            self.lens_data.load_from_image(lens_id, images[0])
+            image = next(iter(self.selection_values.images))
+            self.lens_data.load_from_image(lens_id, image)
             self.widgets['lens_model'].add_item(
                 self.lens_data.get_name(lens_id), lens_id)
         self.widgets['lens_model'].set_value(lens_id)
@@ -1029,21 +1050,22 @@ class TabWidget(QtWidgets.QWidget):
             tool_tip = 'Serial number: ' + serial
         self.widgets['lens_model'].setToolTip(tool_tip)
 
-    def _update_lens_spec(self, adjust_afl=False):
-        images = self.image_list.get_selected_images()
-        if not images:
+    def _update_lens_spec(self, adjust_afl=False, recount=True):
+        if not self.selection_values.images:
             return
-        spec = images[0].metadata.lens_spec
-        for image in images[1:]:
-            if image.metadata.lens_spec != spec:
-                # multiple values
-                self.widgets['lens_spec'].set_multiple()
-                return
+        if recount:
+            self.selection_values.recount('lens_spec')
+        values = self.selection_values.values('lens_spec')
+        if len(values) > 1:
+            # multiple values
+            self.widgets['lens_spec'].set_multiple()
+            return
+        spec = values[0]
         self.widgets['lens_spec'].set_value(spec)
         if not (adjust_afl and spec):
             return
         make_changes = False
-        for image in images:
+        for image in self.image_list.get_selected_images():
             new_aperture = image.metadata.aperture or 0
             new_fl = image.metadata.focal_length or 0
             if new_fl <= spec.min_fl:
@@ -1085,45 +1107,36 @@ class TabWidget(QtWidgets.QWidget):
             self._update_focal_length()
             self._update_focal_length_35()
 
-    def _update_aperture(self):
-        images = self.image_list.get_selected_images()
-        if not images:
+    def _update_aperture(self, recount=True):
+        if not self.selection_values.images:
             return
-        values = []
-        for image in images:
-            value = image.metadata.aperture
-            if value not in values:
-                values.append(value)
+        if recount:
+            self.selection_values.recount('aperture')
+        values = self.selection_values.values('aperture')
         if len(values) > 1:
             self.widgets['aperture'].set_multiple(choices=values)
         else:
             self.widgets['aperture'].set_value(values[0])
 
-    def _update_focal_length(self):
-        images = self.image_list.get_selected_images()
-        if not images:
+    def _update_focal_length(self, recount=True):
+        if not self.selection_values.images:
             return
-        values = []
-        for image in images:
-            value = image.metadata.focal_length
-            if value not in values:
-                values.append(value)
+        if recount:
+            self.selection_values.recount('focal_length')
+        values = self.selection_values.values('focal_length')
         if len(values) > 1:
             self.widgets['focal_length'].set_multiple(choices=values)
         else:
             self.widgets['focal_length'].set_value(values[0])
 
-    def _update_focal_length_35(self):
-        images = self.image_list.get_selected_images()
-        if not images:
+    def _update_focal_length_35(self, recount=True):
+        if not self.selection_values.images:
             return
+        if recount:
+            self.selection_values.recount('focal_length_35')
         self.widgets['focal_length_35'].set_faint(False)
         # display real value if it exists
-        values = []
-        for image in images:
-            value = image.metadata.focal_length_35
-            if value not in values:
-                values.append(value)
+        values = self.selection_values.values('focal_length_35')
         if len(values) > 1:
             self.widgets['focal_length_35'].set_multiple(choices=values)
         else:
@@ -1131,11 +1144,10 @@ class TabWidget(QtWidgets.QWidget):
         if values[0]:
             return
         # otherwise display calculated value
-        values = []
-        for image in images:
-            value = self.calc_35(image.metadata)
-            if value not in values:
-                values.append(value)
+        counter = ValueCounter()
+        for image in self.selection_values.images:
+            counter.add(self.calc_35(image.metadata))
+        values = counter.values()
         if len(values) > 1:
             self.widgets['focal_length_35'].set_multiple(choices=values)
         elif values[0]:
@@ -1190,6 +1202,7 @@ class TabWidget(QtWidgets.QWidget):
     @QtCore.pyqtSlot(list)
     @catch_all
     def new_selection(self, selection):
+        self.selection_values.set_selection(selection)
         if not selection:
             self.setEnabled(False)
             for widget in self.date_widget.values():
@@ -1198,12 +1211,12 @@ class TabWidget(QtWidgets.QWidget):
             for widget in self.widgets.values():
                 widget.set_value(None)
             return
-        self._update_datetime()
-        self._update_links()
-        self._update_orientation()
-        self._update_lens_model()
-        self._update_aperture()
-        self._update_focal_length()
-        self._update_focal_length_35()
-        self._update_lens_spec()
+        self._update_datetime(recount=False)
+        self._update_links(recount=False)
+        self._update_orientation(recount=False)
+        self._update_lens_model(recount=False)
+        self._update_aperture(recount=False)
+        self._update_focal_length(recount=False)
+        self._update_focal_length_35(recount=False)
+        self._update_lens_spec(recount=False)
         self.setEnabled(True)
@@ -22,7 +22,9 @@ from __future__ import unicode_literals
 import imghdr
 import logging
 import os
+from multiprocessing.pool import ThreadPool
 import shutil
+import tempfile
 import threading
 import time
 
@@ -56,6 +58,12 @@ class UploaderSession(QtCore.QObject):
     def set_password(self, password):
         keyring.set_password('photini', self.name, password)
 
+    def flush_uploads(self):
+        # Complete any uploads that were deferred to be done in a
+        # batch. Returns a list of (image, error message) for any that
+        # failed.
+        return []
+
 
 class UploadAborted(Exception):
     pass
@@ -90,63 +98,166 @@ class UploadWorker(QtCore.QObject):
     upload_error = QtCore.pyqtSignal(six.text_type, six.text_type)
     upload_progress = QtCore.pyqtSignal(float, six.text_type)
 
-    def __init__(self, session_factory, upload_list, *args, **kwds):
+    def __init__(self, session_factory, upload_list, slots=1, *args, **kwds):
         super(UploadWorker, self).__init__(*args, **kwds)
         self.session_factory = session_factory
         self.upload_list = upload_list
-        self.fileobj = None
+        self.upload_items = dict((x[0], x) for x in upload_list)
+        self.slots = max(min(slots, len(upload_list)), 1)
+        self.lock = threading.Lock()
+        # only one error dialog is shown at a time
+        self.error_lock = threading.Lock()
+        self.running = True
+        self.retry = None
+        self.next_upload = 0
+        self.upload_count = 0
+        # slot number -> file object, name and percentage uploaded
+        self.fileobjs = {}
+        self.slot_progress = {}
 
     @QtCore.pyqtSlot()
     @catch_all
     def start(self):
+        # each upload slot has its own session and uploads one file at
+        # a time, so several files are uploaded at once
+        pool = ThreadPool(self.slots)
+        try:
+            pool.map(self.upload_slot, range(self.slots))
+        finally:
+            pool.close()
+            pool.join()
+        self.upload_progress.emit(0.0, '%p%')
+        self.finished.emit()
+
+    def upload_slot(self, slot):
         session = self.session_factory()
-        session.connect()
-        upload_count = 0
-        while upload_count < len(self.upload_list):
-            image, convert, params = self.upload_list[upload_count]
-            name = os.path.basename(image.path)
-            self.upload_progress.emit(0.0, '{} ({}/{}) %p%'.format(
-                name, 1 + upload_count, len(self.upload_list)))
-            if convert:
-                path = convert(image)
-            else:
-                path = image.path
-            with open(path, 'rb') as f:
-                self.fileobj = FileObjWithCallback(f, self.progress)
-                try:
-                    error = session.do_upload(
-                        self.fileobj, imghdr.what(path), image, params)
-                except UploadAborted:
+        try:
+            session.connect()
+            while self.running:
+                with self.lock:
+                    if self.next_upload >= len(self.upload_list):
+                        break
+                    image, convert, params = self.upload_list[self.next_upload]
+                    self.next_upload += 1
+                if not self.upload_file(slot, session, image, convert, params):
                     break
-                except Exception as ex:
-                    error = str(ex)
-                self.fileobj = None
-            if convert:
-                os.unlink(path)
-            if error:
-                self.retry = None
-                self.upload_error.emit(name, error)
-                # wait for response from user dialog
-                while self.retry is None:
-                    QtWidgets.QApplication.processEvents()
-                if not self.retry:
+            self.flush_uploads(slot, session)
+        except Exception as ex:
+            logger.exception(ex)
+            self.running = False
+        finally:
+            session.disconnect()
+
+    def upload_file(self, slot, session, image, convert, params):
+        # upload one file, retrying if the user wants to. Returns False
+        # if the upload is to be abandoned.
+        name = os.path.basename(image.path)
+        try:
+            while self.running:
+                self.progress(slot, name, 0)
+                if convert:
+                    path = convert(image)
+                else:
+                    path = image.path
+                with open(path, 'rb') as f:
+                    fileobj = FileObjWithCallback(
+                        f, lambda x: self.progress(slot, name, x))
+                    with self.lock:
+                        self.fileobjs[slot] = fileobj
+                    try:
+                        error = session.do_upload(
+                            fileobj, imghdr.what(path), image, params)
+                    except UploadAborted:
+                        error = None
+                        self.running = False
+                    except Exception as ex:
+                        error = str(ex)
+                    with self.lock:
+                        del self.fileobjs[slot]
+                if convert:
+                    os.unlink(path)
+                if not self.running:
+                    break
+                if not error:
+                    with self.lock:
+                        self.slot_progress.pop(slot, None)
+                        self.upload_count += 1
+                    return True
+                with self.error_lock:
+                    if not self.running:
+                        break
+                    self.retry = None
+                    # blocks until user has responded
+                    self.upload_error.emit(name, error)
+                    if not self.retry:
+                        break
+            return False
+        finally:
+            # this slot is now idle, however the upload ended
+            with self.lock:
+                self.slot_progress.pop(slot, None)
+            self.show_progress()
+
+    def flush_uploads(self, slot, session):
+        # finish this slot's deferred uploads, retrying any that fail
+        while True:
+            failed = session.flush_uploads()
+            if not failed:
+                return
+            with self.lock:
+                self.upload_count -= len(failed)
+            self.show_progress()
+            retry_list = []
+            for image, error in failed:
+                name = os.path.basename(image.path)
+                with self.error_lock:
+                    if not self.running:
+                        logger.error('%s: %s', name, error)
+                        continue
+                    self.retry = None
+                    # blocks until user has responded
+                    self.upload_error.emit(name, error)
+                    if self.retry:
+                        retry_list.append(self.upload_items[image])
+            for image, convert, params in retry_list:
+                if not self.upload_file(slot, session, image, convert, params):
                     break
-            else:
-                upload_count += 1
-        self.upload_progress.emit(0.0, '%p%')
-        session.disconnect()
-        self.finished.emit()
 
-    def progress(self, value):
-        self.upload_progress.emit(value, '')
+    def progress(self, slot, name, value):
+        with self.lock:
+            if self.slot_progress.get(slot) == (name, value):
+                return
+            self.slot_progress[slot] = name, value
+        self.show_progress()
+
+    def show_progress(self):
+        with self.lock:
+            total = len(self.upload_list)
+            done = self.upload_count
+            slots = [self.slot_progress[x] for x in sorted(self.slot_progress)]
+        value = (done * 100.0) + sum([x[1] for x in slots])
+        if total > 1:
+            value /= total
+        if total == 1:
+            format_ = ' '.join([x[0] for x in slots] + ['%p%'])
+        else:
+            # show each slot's progress as well as the total
+            format_ = '({}/{}) {}, total %p%'.format(
+                done, total, ', '.join(['{} {}%'.format(*x) for x in slots]))
+        self.upload_progress.emit(value, format_)
 
     @QtCore.pyqtSlot(bool)
     @catch_all
     def abort_upload(self, retry):
         self.retry = retry
-        if self.fileobj:
+        if retry:
+            return
+        self.running = False
+        with self.lock:
+            fileobjs = list(self.fileobjs.values())
+        for fileobj in fileobjs:
             # brutal way to interrupt an upload
-            self.fileobj.abort()
+            fileobj.abort()
 
 
 class AuthRequestHandler(BaseHTTPRequestHandler):
@@ -321,7 +432,11 @@ class PhotiniUploader(QtWidgets.QWidget):
         temp_dir = appdirs.user_cache_dir('photini')
         if not os.path.isdir(temp_dir):
             os.makedirs(temp_dir)
-        return os.path.join(temp_dir, os.path.basename(image.path) + ext)
+        # several files may be converted at once, so make names unique
+        fd, path = tempfile.mkstemp(
+            suffix=os.path.basename(image.path) + ext, dir=temp_dir)
+        os.close(fd)
+        return path
 
     def copy_metadata(self, image, path):
         # copy metadata
@@ -421,7 +536,9 @@ class PhotiniUploader(QtWidgets.QWidget):
         self.upload_config.setEnabled(False)
         self.user_connect.setEnabled(False)
         # do uploading in separate thread, so GUI can continue
-        self.upload_worker = UploadWorker(self.session_factory, upload_list)
+        slots = int(self.app.config_store.get('uploader', 'upload_slots', '3'))
+        self.upload_worker = UploadWorker(
+            self.session_factory, upload_list, slots=slots)
         thread = QtCore.QThread(self)
         self.upload_worker.moveToThread(thread)
         self.upload_worker.upload_error.connect(
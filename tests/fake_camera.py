@@ -0,0 +1,96 @@
+##  Photini - a simple photo metadata editor.
+##  http://github.com/jim-easterbrook/Photini
+##  Copyright (C) 2020  Jim Easterbrook  jim@jim-easterbrook.me.uk
+##
+##  This program is free software: you can redistribute it and/or
+##  modify it under the terms of the GNU General Public License as
+##  published by the Free Software Foundation, either version 3 of the
+##  License, or (at your option) any later version.
+##
+##  This program is distributed in the hope that it will be useful,
+##  but WITHOUT ANY WARRANTY; without even the implied warranty of
+##  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+##  General Public License for more details.
+##
+##  You should have received a copy of the GNU General Public License
+##  along with this program.  If not, see
+##  <http://www.gnu.org/licenses/>.
+
+from __future__ import unicode_literals
+
+from collections import defaultdict
+import posixpath
+
+
+class FakeCameraFile(object):
+    def __init__(self, data, mtime):
+        self.data = data
+        self.mtime = mtime
+
+    def get_data_and_size(self):
+        return memoryview(self.data)
+
+    def get_mtime(self):
+        return self.mtime
+
+
+class FakeFileInfo(object):
+    class file(object):
+        pass
+
+    def __init__(self, data, mtime):
+        self.file = FakeFileInfo.file()
+        self.file.mtime = mtime
+        self.file.size = len(data)
+
+
+class FakeCamera(object):
+    """Stand-in for gphoto2.Camera, with files held in memory.
+
+    ``files`` is a dict of {path: (data, mtime)}. Method calls are
+    counted in ``calls``. If ``error`` is set it is raised by every
+    method, as if the camera had been disconnected.
+
+    """
+    def __init__(self, files):
+        self.files = dict(files)
+        self.calls = defaultdict(int)
+        self.error = None
+
+    def _call(self, name):
+        self.calls[name] += 1
+        if self.error:
+            raise self.error
+
+    def folder_list_files(self, path):
+        self._call('folder_list_files')
+        result = []
+        for file_path in sorted(self.files):
+            folder, name = posixpath.split(file_path)
+            if folder == path:
+                result.append((name, None))
+        return result
+
+    def folder_list_folders(self, path):
+        self._call('folder_list_folders')
+        result = []
+        for file_path in sorted(self.files):
+            rel_path = posixpath.relpath(file_path, path)
+            if rel_path.startswith('..'):
+                continue
+            parts = rel_path.split('/')
+            if len(parts) > 1 and parts[0] not in result:
+                result.append(parts[0])
+        return [(name, None) for name in result]
+
+    def file_get_info(self, folder, name):
+        self._call('file_get_info')
+        return FakeFileInfo(*self.files[posixpath.join(folder, name)])
+
+    def file_get(self, folder, name, file_type):
+        self._call('file_get')
+        return FakeCameraFile(*self.files[posixpath.join(folder, name)])
+
+    def file_delete(self, folder, name):
+        self._call('file_delete')
+        del self.files[posixpath.join(folder, name)]
@@ -0,0 +1,193 @@
+##  Photini - a simple photo metadata editor.
+##  http://github.com/jim-easterbrook/Photini
+##  Copyright (C) 2020  Jim Easterbrook  jim@jim-easterbrook.me.uk
+##
+##  This program is free software: you can redistribute it and/or
+##  modify it under the terms of the GNU General Public License as
+##  published by the Free Software Foundation, either version 3 of the
+##  License, or (at your option) any later version.
+##
+##  This program is distributed in the hope that it will be useful,
+##  but WITHOUT ANY WARRANTY; without even the implied warranty of
+##  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+##  General Public License for more details.
+##
+##  You should have received a copy of the GNU General Public License
+##  along with this program.  If not, see
+##  <http://www.gnu.org/licenses/>.
+
+from __future__ import unicode_literals
+
+import json
+import re
+import threading
+import time
+
+import flickrapi
+from six.moves.BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from six.moves.socketserver import ThreadingMixIn
+from six.moves.urllib import parse
+
+
+class StandInFlickrHandler(BaseHTTPRequestHandler):
+    def log_message(self, format_, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers['Content-Length'])
+        body = self.rfile.read(length)
+        # every call costs one round trip
+        time.sleep(server.latency)
+        if self.path.startswith('/services/rest'):
+            params = dict((k, v[0]) for (k, v) in parse.parse_qs(
+                body.decode('utf-8'), keep_blank_values=True).items())
+            data = json.dumps(server.rest_call(params))
+            content_type = 'application/json'
+        else:
+            match = re.search(br'name="photo_id"\r\n\r\n(\d+)\r\n', body)
+            photo_id = server.upload(match and match.group(1).decode('ascii'))
+            data = ('<?xml version="1.0" encoding="utf-8" ?>\n'
+                    '<rsp stat="ok">\n<photoid>{}</photoid>\n</rsp>\n'
+                    ).format(photo_id)
+            content_type = 'text/xml'
+        data = data.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class StandInFlickr(ThreadingMixIn, HTTPServer):
+    """Local stand-in for the parts of the Flickr REST and upload API
+    used by FlickrSession. Each call is delayed by ``latency`` seconds.
+
+    Photo state is kept in ``photos`` and ``photosets``, and every call
+    is logged in ``calls``. Methods named in ``fail`` return an error
+    that many times.
+
+    """
+    daemon_threads = True
+
+    def __init__(self, latency=0.0):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), StandInFlickrHandler)
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.next_id = 1000
+        self.photos = {}
+        self.photosets = {}
+        self.calls = []
+        self.fail = {}
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def api(self):
+        """Return a FlickrAPI object that talks to this server."""
+        token = flickrapi.auth.FlickrAccessToken('token', 'secret', 'write')
+        api = flickrapi.FlickrAPI('key', 'secret', token=token,
+                                  store_token=False, format='parsed-json')
+        url = 'http://127.0.0.1:{}/services/'.format(self.server_port)
+        api.REST_URL = url + 'rest/'
+        api.UPLOAD_URL = url + 'upload/'
+        api.REPLACE_URL = url + 'replace/'
+        return api
+
+    def new_id(self):
+        self.next_id += 1
+        return str(self.next_id)
+
+    def add_photo(self, location=None):
+        with self.lock:
+            photo_id = self.new_id()
+            self.photos[photo_id] = {
+                'location': location, 'lastupdate': '1600000000'}
+        return photo_id
+
+    def add_photoset(self, title, photo_ids=[]):
+        with self.lock:
+            photoset_id = self.new_id()
+            self.photosets[photoset_id] = {
+                'title': title, 'photos': list(photo_ids)}
+        return photoset_id
+
+    def count(self, method):
+        return len([x for x in self.calls if x[0] == method])
+
+    def upload(self, photo_id):
+        with self.lock:
+            if photo_id:
+                self.calls.append(('replace', {'photo_id': photo_id}))
+            else:
+                photo_id = self.new_id()
+                self.photos[photo_id] = {
+                    'location': None, 'lastupdate': '1600000000'}
+                self.calls.append(('upload', {'photo_id': photo_id}))
+        return photo_id
+
+    def rest_call(self, params):
+        method = params.pop('method')[len('flickr.'):]
+        for key in ('api_key', 'format', 'nojsoncallback'):
+            params.pop(key, None)
+        with self.lock:
+            self.calls.append((method, params))
+            if self.fail.get(method):
+                self.fail[method] -= 1
+                return {'stat': 'fail', 'code': 1,
+                        'message': 'Stand-in failure'}
+            function = getattr(self, 'do_' + method.replace('.', '_'), None)
+            if function:
+                result = function(**params)
+            else:
+                # photos.setMeta etc. are stored as they are
+                self.photos[params['photo_id']][method] = params
+                result = {}
+        result['stat'] = 'ok'
+        return result
+
+    def do_photos_getInfo(self, photo_id):
+        photo = {'id'   : photo_id,
+                 'dates': {'lastupdate': self.photos[photo_id]['lastupdate']}}
+        location = self.photos[photo_id]['location']
+        if location:
+            photo['location'] = {
+                'latitude': location[0], 'longitude': location[1]}
+        return {'photo': photo}
+
+    def do_photos_geo_setLocation(self, photo_id, lat, lon, **kw):
+        self.photos[photo_id]['location'] = lat, lon
+        return {}
+
+    def do_photos_geo_removeLocation(self, photo_id):
+        self.photos[photo_id]['location'] = None
+        return {}
+
+    def do_photos_getAllContexts(self, photo_id):
+        result = []
+        for photoset_id, photoset in self.photosets.items():
+            if photo_id in photoset['photos']:
+                result.append({'id': photoset_id, 'title': photoset['title']})
+        if result:
+            return {'set': result}
+        return {}
+
+    def do_photosets_create(self, title, description, primary_photo_id):
+        photoset_id = self.new_id()
+        self.photosets[photoset_id] = {
+            'title': title, 'photos': [primary_photo_id]}
+        return {'photoset': {'id': photoset_id}}
+
+    def do_photosets_addPhoto(self, photo_id, photoset_id):
+        self.photosets[photoset_id]['photos'].append(photo_id)
+        return {}
+
+    def do_photosets_removePhoto(self, photo_id, photoset_id):
+        self.photosets[photoset_id]['photos'].remove(photo_id)
+        return {}
@@ -0,0 +1,93 @@
+##  Photini - a simple photo metadata editor.
+##  http://github.com/jim-easterbrook/Photini
+##  Copyright (C) 2020  Jim Easterbrook  jim@jim-easterbrook.me.uk
+##
+##  This program is free software: you can redistribute it and/or
+##  modify it under the terms of the GNU General Public License as
+##  published by the Free Software Foundation, either version 3 of the
+##  License, or (at your option) any later version.
+##
+##  This program is distributed in the hope that it will be useful,
+##  but WITHOUT ANY WARRANTY; without even the implied warranty of
+##  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+##  General Public License for more details.
+##
+##  You should have received a copy of the GNU General Public License
+##  along with this program.  If not, see
+##  <http://www.gnu.org/licenses/>.
+
+from __future__ import unicode_literals
+
+import os
+
+import appdirs
+import pytest
+
+from photini.cachestore import BaseCacheStore
+
+
+@pytest.fixture
+def cache_dir(tmpdir, monkeypatch):
+    path = os.path.join(str(tmpdir), 'cache')
+    monkeypatch.setattr(appdirs, 'user_cache_dir', lambda name: path)
+    return path
+
+
+def test_get_put(cache_dir):
+    store = BaseCacheStore('test', 1000)
+    assert store.enabled
+    store.put('a', 'stamp1', b'data')
+    assert store.get('a', 'stamp1') == b'data'
+    # a different stamp discards the entry
+    assert store.get('a', 'stamp2') is None
+    assert store.get('a', 'stamp1') is None
+
+
+def test_read_does_not_write(cache_dir):
+    store = BaseCacheStore('test', 1000)
+    store.put('a', 'stamp', b'data')
+    connection = store._connection()
+    changes = connection.total_changes
+    for n in range(10):
+        assert store.get('a', 'stamp') == b'data'
+    assert connection.total_changes == changes
+    # a stale "last used" time is refreshed
+    connection.execute('UPDATE cache SET used = 0')
+    connection.commit()
+    changes = connection.total_changes
+    assert store.get('a', 'stamp') == b'data'
+    assert connection.total_changes == changes + 1
+
+
+def test_evict(cache_dir):
+    store = BaseCacheStore('test', 1000)
+    for n in range(5):
+        store.put(str(n), 'stamp', b'x' * 300)
+        connection = store._connection()
+        connection.execute('UPDATE cache SET used = ? WHERE key = ?',
+                           (n, str(n)))
+        connection.commit()
+    store.evict()
+    assert [store.get(str(n), 'stamp') is not None
+            for n in range(5)] == [False, False, True, True, True]
+
+
+def test_unusable_database(cache_dir):
+    os.makedirs(cache_dir)
+    with open(os.path.join(cache_dir, 'test.db'), 'wb') as f:
+        f.write(b'this is not an SQLite database' * 100)
+    store = BaseCacheStore('test', 1000)
+    assert not store.enabled
+    store.put('a', 'stamp', b'data')
+    assert store.get('a', 'stamp') is None
+    store.remove('a')
+    store.evict()
+
+
+def test_unusable_directory(cache_dir):
+    # cache "directory" is a file, so can't be created
+    with open(cache_dir, 'wb') as f:
+        f.write(b'data')
+    store = BaseCacheStore('test', 1000)
+    assert not store.enabled
+    assert store.get('a', 'stamp') is None
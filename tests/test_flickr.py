@@ -0,0 +1,237 @@
+##  Photini - a simple photo metadata editor.
+##  http://github.com/jim-easterbrook/Photini
+##  Copyright (C) 2020  Jim Easterbrook  jim@jim-easterbrook.me.uk
+##
+##  This program is free software: you can redistribute it and/or
+##  modify it under the terms of the GNU General Public License as
+##  published by the Free Software Foundation, either version 3 of the
+##  License, or (at your option) any later version.
+##
+##  This program is distributed in the hope that it will be useful,
+##  but WITHOUT ANY WARRANTY; without even the implied warranty of
+##  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+##  General Public License for more details.
+##
+##  You should have received a copy of the GNU General Public License
+##  along with this program.  If not, see
+##  <http://www.gnu.org/licenses/>.
+
+from __future__ import unicode_literals
+
+import os
+import time
+
+import pytest
+
+from fake_flickr import StandInFlickr
+
+try:
+    from photini.flickr import FlickrSession
+    from photini.uploader import FileObjWithCallback
+except ImportError as ex:
+    pytest.skip(str(ex), allow_module_level=True)
+
+
+class StandInMetadata(object):
+    keywords = None
+
+
+class StandInImage(object):
+    def __init__(self, path):
+        self.path = path
+        self.metadata = StandInMetadata()
+
+
+class StandInSetWidget(object):
+    # the parts of the QCheckBox used by FlickrSession.update_sets
+    def __init__(self, title, photoset_id=None):
+        self.title = title
+        self.photoset_id = photoset_id
+
+    def property(self, name):
+        return self.photoset_id
+
+    def setProperty(self, name, value):
+        self.photoset_id = value
+
+    def text(self):
+        return self.title
+
+    def toolTip(self):
+        return ''
+
+
+@pytest.fixture
+def server():
+    server = StandInFlickr(latency=0.01)
+    server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def session(server):
+    session = FlickrSession()
+    session.api = server.api()
+    yield session
+    session.disconnect()
+
+
+def make_image(tmpdir, n):
+    path = os.path.join(str(tmpdir), 'image{}.jpg'.format(n))
+    with open(path, 'wb') as f:
+        f.write(os.urandom(20000))
+    return StandInImage(path)
+
+
+def make_params(function, photo_id=None, location=True, sets=[]):
+    params = {
+        'function'    : function,
+        'photo_id'    : photo_id,
+        'permissions' : {'is_public': '1', 'is_friend': '0', 'is_family': '0'},
+        'hidden'      : {'hidden': '1'},
+        'content_type': {'content_type': '1'},
+        'meta'        : {'title': 'title', 'description': 'description'},
+        'tags'        : {'tags': 'uploaded:by=photini'},
+        'dates'       : {'date_taken': '2020-06-01 12:00:00'},
+        'location'    : None,
+        'sets'        : sets,
+        }
+    if location:
+        params['location'] = {'lat': '51.500000', 'lon': '-0.100000'}
+    return params
+
+
+def upload(session, image, params):
+    with open(image.path, 'rb') as f:
+        fileobj = FileObjWithCallback(f, lambda x: None)
+        return session.do_upload(fileobj, 'jpeg', image, params)
+
+
+def test_new_photos(server, session, tmpdir):
+    old_set = server.add_photoset('old set')
+    new_set_widget = StandInSetWidget('new set')
+    sets = [new_set_widget, StandInSetWidget('old set', old_set)]
+    images = [make_image(tmpdir, n) for n in range(4)]
+    for image in images:
+        assert upload(session, image, make_params('upload', sets=sets)) == ''
+    assert session.flush_uploads() == []
+    photo_ids = []
+    for image in images:
+        tag, photo_id = image.metadata.keywords[0].split('=')
+        assert tag == 'flickr:photo_id'
+        photo_ids.append(photo_id)
+        photo = server.photos[photo_id]
+        assert photo['location'] == ('51.500000', '-0.100000')
+        assert photo['photos.setDates']['date_taken'] == '2020-06-01 12:00:00'
+    assert server.count('upload') == 4
+    # each upload slot's calls run in several threads, but the new set
+    # is only created once
+    assert server.count('photosets.create') == 1
+    new_set = new_set_widget.photoset_id
+    assert sorted(server.photosets[new_set]['photos']) == sorted(photo_ids)
+    assert sorted(server.photosets[old_set]['photos']) == sorted(photo_ids)
+
+
+def test_replace(server, session, tmpdir):
+    photo_id = server.add_photo(location=('1.0', '2.0'))
+    old_set = server.add_photoset('old set', [photo_id])
+    new_set = server.add_photoset('new set')
+    image = make_image(tmpdir, 0)
+    params = make_params('replace', photo_id=photo_id, location=False,
+                         sets=[StandInSetWidget('new set', new_set)])
+    assert upload(session, image, params) == ''
+    assert session.flush_uploads() == []
+    assert server.count('replace') == 1
+    assert server.count('photos.geo.removeLocation') == 1
+    assert server.photos[photo_id]['location'] is None
+    assert server.photosets[old_set]['photos'] == []
+    assert server.photosets[new_set]['photos'] == [photo_id]
+    assert image.metadata.keywords == ['flickr:photo_id=' + photo_id]
+
+
+def test_retry_skips_upload(server, session, tmpdir):
+    image = make_image(tmpdir, 0)
+    params = make_params('upload')
+    server.fail['photos.setDates'] = 1
+    assert upload(session, image, params) == ''
+    failed = session.flush_uploads()
+    assert len(failed) == 1
+    assert failed[0][0] is image
+    assert 'Stand-in failure' in failed[0][1]
+    # retry only repeats the metadata calls
+    assert upload(session, image, params) == ''
+    assert session.flush_uploads() == []
+    assert server.count('upload') == 1
+    photo_id = params['photo_id']
+    assert 'photos.setDates' in server.photos[photo_id]
+
+
+def test_round_trips(tmpdir):
+    # Replacing a photo with full metadata and one set makes ten calls
+    # (replace, seven set* calls, getAllContexts and addPhoto). With a
+    # fixed latency per call, the elapsed time shows how many round
+    # trips each file costs.
+    latency = 0.1
+    count = 8
+    server = StandInFlickr(latency=latency)
+    server.start()
+    session = FlickrSession()
+    session.api = server.api()
+    try:
+        photoset_id = server.add_photoset('set')
+        images = []
+        for n in range(count):
+            images.append((make_image(tmpdir, n), server.add_photo()))
+        start = time.time()
+        for image, photo_id in images:
+            params = make_params(
+                'replace', photo_id=photo_id,
+                sets=[StandInSetWidget('set', photoset_id)])
+            upload(session, image, params)
+        assert session.flush_uploads() == []
+        elapsed = time.time() - start
+    finally:
+        session.disconnect()
+        server.stop()
+    calls = len(server.calls) / float(count)
+    round_trips = elapsed / (latency * count)
+    print('{:.1f} calls, {:.1f} round trips per file'.format(
+        calls, round_trips))
+    assert calls == 10
+    assert round_trips < 3.5
+
+
+def test_get_infos(server, session):
+    photo_ids = [server.add_photo() for n in range(3)]
+    last_updates = dict((x, '1600000000') for x in photo_ids)
+    photos, failed = session.get_infos(photo_ids, last_updates)
+    assert sorted(photos) == sorted(photo_ids)
+    assert failed == []
+    assert server.count('photos.getInfo') == 3
+    # unchanged photos come from the cache
+    server.photos[photo_ids[0]]['lastupdate'] = '1600000001'
+    last_updates[photo_ids[0]] = '1600000001'
+    photos, failed = session.get_infos(photo_ids, last_updates)
+    assert sorted(photos) == sorted(photo_ids)
+    assert server.count('photos.getInfo') == 4
+    # failures are reported, and stale cached info isn't returned
+    for photo_id in photo_ids:
+        server.photos[photo_id]['lastupdate'] = '1600000002'
+        last_updates[photo_id] = '1600000002'
+    server.fail['photos.getInfo'] = 2
+    photos, failed = session.get_infos(photo_ids, last_updates)
+    assert len(failed) == 2
+    assert sorted(list(photos) + failed) == sorted(photo_ids)
+
+
+def test_disconnect_clears_pending(server, session, tmpdir):
+    server.fail['photos.setDates'] = 1
+    image = make_image(tmpdir, 0)
+    assert upload(session, image, make_params('upload')) == ''
+    session.disconnect()
+    assert session.pending == []
+    assert session.failed == []
+    # a new connection starts with nothing outstanding
+    session.api = server.api()
+    assert session.flush_uploads() == []
@@ -0,0 +1,43 @@
+##  Photini - a simple photo metadata editor.
+##  http://github.com/jim-easterbrook/Photini
+##  Copyright (C) 2020  Jim Easterbrook  jim@jim-easterbrook.me.uk
+##
+##  This program is free software: you can redistribute it and/or
+##  modify it under the terms of the GNU General Public License as
+##  published by the Free Software Foundation, either version 3 of the
+##  License, or (at your option) any later version.
+##
+##  This program is distributed in the hope that it will be useful,
+##  but WITHOUT ANY WARRANTY; without even the implied warranty of
+##  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+##  General Public License for more details.
+##
+##  You should have received a copy of the GNU General Public License
+##  along with this program.  If not, see
+##  <http://www.gnu.org/licenses/>.
+
+from __future__ import unicode_literals
+
+import pytest
+
+try:
+    from photini.gpxtrack import parse_time
+except ImportError as ex:
+    pytest.skip(str(ex), allow_module_level=True)
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('2020-01-01T12:34:56Z', 1577882096.0),
+    (' 2020-01-01T12:34:56Z\n', 1577882096.0),
+    ('2020-01-01T12:34:56.5Z', 1577882096.5),
+    ('2020-01-01T13:34:56+01:00', 1577882096.0),
+    ('2020-01-01T11:34:56-01:00', 1577882096.0),
+    ])
+def test_parse_time(text, expected):
+    assert parse_time(text) == expected
+
+
+@pytest.mark.parametrize('text', [
+    '2020-0x-01T12:34:56Z', '2020-01-01T12:3x:56Z', 'not a time stamp'])
+def test_parse_bad_time(text):
+    assert parse_time(text) is None
@@ -0,0 +1,152 @@
+##  Photini - a simple photo metadata editor.
+##  http://github.com/jim-easterbrook/Photini
+##  Copyright (C) 2020  Jim Easterbrook  jim@jim-easterbrook.me.uk
+##
+##  This program is free software: you can redistribute it and/or
+##  modify it under the terms of the GNU General Public License as
+##  published by the Free Software Foundation, either version 3 of the
+##  License, or (at your option) any later version.
+##
+##  This program is distributed in the hope that it will be useful,
+##  but WITHOUT ANY WARRANTY; without even the implied warranty of
+##  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+##  General Public License for more details.
+##
+##  You should have received a copy of the GNU General Public License
+##  along with this program.  If not, see
+##  <http://www.gnu.org/licenses/>.
+
+from __future__ import unicode_literals
+
+from datetime import datetime
+import os
+
+import pytest
+
+from fake_camera import FakeCamera
+
+try:
+    from photini import importer
+except ImportError as ex:
+    pytest.skip(str(ex), allow_module_level=True)
+
+FILES = {
+    '/store_00010001/DCIM/100CANON/IMG_0001.JPG': (b'first image', 1600000000),
+    '/store_00010001/DCIM/100CANON/IMG_0002.CR2': (b'second', 1600000060),
+    '/store_00010001/DCIM/100CANON/README.TXT': (b'not an image', 1600000000),
+    '/store_00010001/DCIM/101CANON/MVI_0003.MOV': (b'a video', 1600000120),
+    }
+
+
+class FakeCopier(object):
+    def __init__(self):
+        self.running = True
+        self.streams = 1
+        self.bytes_done = 0
+
+    def add_bytes(self, count):
+        self.bytes_done += count
+
+
+@pytest.fixture
+def camera(monkeypatch):
+    monkeypatch.setattr(importer.CameraSource, '_info_cache', {})
+    return FakeCamera(FILES)
+
+
+def copy_list(source, root):
+    result = []
+    file_data = source.get_file_data()
+    for name in sorted(file_data):
+        info = dict(file_data[name])
+        info['dest_path'] = os.path.join(root, 'dest', name)
+        result.append(info)
+    return result
+
+
+def test_get_file_data(camera):
+    source = importer.CameraSource('Fake', 'usb:001,001', camera=camera)
+    file_data = source.get_file_data()
+    assert sorted(file_data) == ['IMG_0001.JPG', 'IMG_0002.CR2', 'MVI_0003.MOV']
+    info = file_data['IMG_0002.CR2']
+    assert info['folder'] == '/store_00010001/DCIM/100CANON'
+    assert info['size'] == len(b'second')
+    assert info['timestamp'] == datetime.utcfromtimestamp(1600000060)
+    assert camera.calls['file_get_info'] == 3
+    # unchanged files are not queried again
+    del camera.files['/store_00010001/DCIM/101CANON/MVI_0003.MOV']
+    file_data = source.get_file_data()
+    assert sorted(file_data) == ['IMG_0001.JPG', 'IMG_0002.CR2']
+    assert camera.calls['file_get_info'] == 3
+
+
+def test_camera_error(camera):
+    source = importer.CameraSource('Fake', 'usb:001,001', camera=camera)
+    camera.error = source.camera_error('camera disconnected')
+    assert source.get_file_data() is None
+
+
+@pytest.mark.parametrize('move', [False, True])
+def test_copy_files(camera, tmpdir, move):
+    source = importer.CameraSource('Fake', 'usb:001,001', camera=camera)
+    info_list = copy_list(source, str(tmpdir))
+    copier = FakeCopier()
+    result = list(source.copy_files(info_list, move, copier))
+    assert result == info_list
+    for info in info_list:
+        data, mtime = FILES[info['folder'] + '/' + info['name']]
+        with open(info['dest_path'], 'rb') as f:
+            assert f.read() == data
+        assert os.path.getmtime(info['dest_path']) == mtime
+    assert copier.bytes_done == sum(x['size'] for x in info_list)
+    if move:
+        assert list(camera.files) == [
+            '/store_00010001/DCIM/100CANON/README.TXT']
+    else:
+        assert camera.files == FILES
+
+
+def test_stop_copy(camera, tmpdir):
+    source = importer.CameraSource('Fake', 'usb:001,001', camera=camera)
+    info_list = copy_list(source, str(tmpdir))
+    copier = FakeCopier()
+    result = []
+    for info in source.copy_files(info_list, False, copier):
+        result.append(info)
+        copier.running = False
+    # the file being fetched when copying stopped is still completed
+    assert result == info_list[:2]
+    assert not os.path.exists(info_list[2]['dest_path'])
+
+
+def test_folder_scan_skips_bad_file(tmpdir, monkeypatch):
+    root = str(tmpdir)
+    for name in ('IMG_0001.JPG', 'IMG_0002.JPG', 'IMG_0003.JPG'):
+        with open(os.path.join(root, name), 'wb') as f:
+            f.write(b'data')
+
+    def get_file_info(self, path, sc_path):
+        name = os.path.basename(path)
+        if name == 'IMG_0002.JPG':
+            # e.g. file deleted during the scan
+            raise OSError('No such file or directory')
+        return {'name': name}, None
+
+    monkeypatch.setattr(importer.FolderSource, 'get_file_info', get_file_info)
+    scanner = importer.FolderScanner(importer.FolderSource(root), 2)
+    found = {}
+    finished = []
+    scanner.batch_found.connect(found.update, importer.Qt.DirectConnection)
+    scanner.finished.connect(finished.append, importer.Qt.DirectConnection)
+    scanner.start()
+    assert sorted(found) == ['IMG_0001.JPG', 'IMG_0003.JPG']
+    assert finished == [True]
+
+
+def test_folder_scan_missing_root(tmpdir):
+    scanner = importer.FolderScanner(
+        importer.FolderSource(os.path.join(str(tmpdir), 'missing')), 2)
+    finished = []
+    scanner.finished.connect(finished.append, importer.Qt.DirectConnection)
+    scanner.start()
+    assert finished == [False]
@@ -0,0 +1,210 @@
+##  Photini - a simple photo metadata editor.
+##  http://github.com/jim-easterbrook/Photini
+##  Copyright (C) 2020  Jim Easterbrook  jim@jim-easterbrook.me.uk
+##
+##  This program is free software: you can redistribute it and/or
+##  modify it under the terms of the GNU General Public License as
+##  published by the Free Software Foundation, either version 3 of the
+##  License, or (at your option) any later version.
+##
+##  This program is distributed in the hope that it will be useful,
+##  but WITHOUT ANY WARRANTY; without even the implied warranty of
+##  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+##  General Public License for more details.
+##
+##  You should have received a copy of the GNU General Public License
+##  along with this program.  If not, see
+##  <http://www.gnu.org/licenses/>.
+
+from __future__ import unicode_literals
+
+import os
+import threading
+import time
+
+import pytest
+import requests
+from six.moves.BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from six.moves.socketserver import ThreadingMixIn
+
+try:
+    from photini.pyqt import Qt
+    from photini.uploader import UploadWorker
+except ImportError as ex:
+    pytest.skip(str(ex), allow_module_level=True)
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    def log_message(self, format_, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        name = self.path.strip('/')
+        with server.lock:
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            length = int(self.headers['Content-Length'])
+            data = b''
+            while len(data) < length:
+                chunk = self.rfile.read(min(length - len(data), 65536))
+                if not chunk:
+                    # client gave up
+                    return
+                data += chunk
+            # give other upload slots time to overlap with this one
+            time.sleep(server.delay)
+            with server.lock:
+                fail = server.fail.get(name, 0)
+                if fail:
+                    server.fail[name] = fail - 1
+                else:
+                    server.received[name] = data
+            self.send_response(500 if fail else 200)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        finally:
+            with server.lock:
+                server.active -= 1
+
+
+class StandInServer(ThreadingMixIn, HTTPServer):
+    """Local stand-in for an upload service. Each POST stores its
+    body under the URL's path, unless the name is in ``fail``.
+
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), StandInHandler)
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.delay = 0.0
+        # name -> number of times to return an error
+        self.fail = {}
+        self.received = {}
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}/'.format(self.server_port)
+
+
+class StandInSession(object):
+    def __init__(self, url):
+        self.url = url
+
+    def connect(self):
+        self.session = requests.Session()
+
+    def disconnect(self):
+        self.session.close()
+
+    def do_upload(self, fileobj, image_type, image, params):
+        rsp = self.session.post(
+            self.url + os.path.basename(image.path), data=fileobj)
+        if rsp.status_code != 200:
+            return 'HTTP error {}'.format(rsp.status_code)
+        return ''
+
+    def flush_uploads(self):
+        return []
+
+
+class StandInImage(object):
+    def __init__(self, path):
+        self.path = path
+
+
+@pytest.fixture
+def server():
+    server = StandInServer()
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_worker(server, tmpdir, count, size, slots):
+    upload_list = []
+    for n in range(count):
+        path = os.path.join(str(tmpdir), 'image{}.jpg'.format(n))
+        with open(path, 'wb') as f:
+            f.write(os.urandom(size))
+        upload_list.append((StandInImage(path), None, {}))
+    sessions = []
+
+    def session_factory():
+        sessions.append(StandInSession(server.url))
+        return sessions[-1]
+
+    worker = UploadWorker(session_factory, upload_list, slots=slots)
+    worker.sessions = sessions
+    worker.progress_log = []
+    worker.upload_progress.connect(
+        lambda value, format_: worker.progress_log.append(value),
+        Qt.DirectConnection)
+    return worker
+
+
+def check_received(server, worker):
+    for image, convert, params in worker.upload_list:
+        name = os.path.basename(image.path)
+        with open(image.path, 'rb') as f:
+            assert server.received[name] == f.read()
+
+
+def test_concurrent_slots(server, tmpdir):
+    server.delay = 0.2
+    worker = make_worker(server, tmpdir, 6, 100000, 3)
+    worker.start()
+    assert len(worker.sessions) == 3
+    assert server.max_active == 3
+    assert worker.upload_count == 6
+    check_received(server, worker)
+    assert worker.slot_progress == {}
+    assert worker.fileobjs == {}
+    assert max(worker.progress_log) <= 100.0
+
+
+@pytest.mark.parametrize('retry', [True, False])
+def test_retry(server, tmpdir, retry):
+    worker = make_worker(server, tmpdir, 4, 10000, 2)
+    server.fail['image2.jpg'] = 1
+    errors = []
+
+    def upload_error(name, error):
+        errors.append((name, error))
+        worker.abort_upload(retry)
+
+    worker.upload_error.connect(upload_error, Qt.DirectConnection)
+    worker.start()
+    assert errors == [('image2.jpg', 'HTTP error 500')]
+    if retry:
+        assert worker.upload_count == 4
+        check_received(server, worker)
+    else:
+        assert not worker.running
+        assert 'image2.jpg' not in server.received
+    assert worker.slot_progress == {}
+
+
+def test_abort(server, tmpdir):
+    worker = make_worker(server, tmpdir, 4, 8000000, 2)
+
+    def upload_progress(value, format_):
+        if worker.running and value > 1.0:
+            worker.abort_upload(False)
+
+    worker.upload_progress.connect(upload_progress, Qt.DirectConnection)
+    worker.start()
+    assert not worker.running
+    assert worker.upload_count < 4
+    assert len(server.received) < 4
+    # aborted uploads don't leave stale progress behind
+    assert worker.slot_progress == {}
+    assert worker.fileobjs == {}
+    assert worker.progress_log[-1] == 0.0